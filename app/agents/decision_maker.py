@@ -1,17 +1,26 @@
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from app.agents.base import BaseAgent
-from app.ml.model_inference import predict_action
+from app.ml.model_inference import is_model_ready, predict_action
+from app.ml.model_warmup import ModelWarmup
+from app.services.compute_executor import ComputeExecutor
 
 logger = logging.getLogger(__name__)
 
 
 class DecisionMakingAgent(BaseAgent):
     
+    def __init__(self, executor: Optional[ComputeExecutor] = None, model_warmup: Optional[ModelWarmup] = None):
+        self.executor = executor
+        self.model_warmup = model_warmup
+    
     async def process(self, market_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Принять решение на основе данных рынка.
         
+        Пока модель прогревается в фоне, возвращается HOLD с нулевой
+        уверенностью и причиной "Model warming up".
+        
         Args:
             market_data: Данные от MarketMonitoringAgent
             
@@ -24,9 +33,24 @@ class DecisionMakingAgent(BaseAgent):
             }
         """
         try:
+            if self.model_warmup is not None and self.model_warmup.in_progress and not is_model_ready():
+                status = self.model_warmup.get_status()
+                logger.info(f"DecisionMakingAgent: модель прогревается ({status['state']}), решение - HOLD")
+                return {
+                    "action": "HOLD",
+                    "confidence": 0.0,
+                    "reason": (
+                        f"Model warming up (state: {status['state']}, stage: {status['stage'] or '-'}, "
+                        f"{status['elapsed_seconds']:.1f}s elapsed)"
+                    )
+                }
+            
             features = market_data.get("features", {})
             
-            prediction = predict_action(features)
+            if self.executor is not None:
+                prediction = await self.executor.run_inference(predict_action, features)
+            else:
+                prediction = predict_action(features)
             
             logger.info(
                 f"DecisionMakingAgent: решение - {prediction['action']} "
@@ -42,4 +66,3 @@ class DecisionMakingAgent(BaseAgent):
                 "confidence": 0.5,
                 "reason": f"Error in decision making: {str(e)}"
             }
-
@@ -1,18 +1,25 @@
 import logging
 import uuid
 from datetime import datetime
-from typing import Dict, Any
-from sqlalchemy.orm import Session
+from typing import Dict, Any, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.agents.base import BaseAgent
 from app.db_models.trade_entity import Trade
+from app.services.trade_writer import TradeWriter
 
 logger = logging.getLogger(__name__)
 
+# Правила исполнения (их же использует бэктест app/ml/backtest.py)
+MIN_CONFIDENCE = 0.6
+SLIPPAGE = 0.0001
+
 
 class ExecutionAgent(BaseAgent):
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession, trade_writer: Optional[TradeWriter] = None):
         self.db = db
+        # Если задан, сделки пишутся пакетами в фоне, а не commit на каждую
+        self.trade_writer = trade_writer
     
     def _generate_order_id(self) -> str:
         """Сгенерировать уникальный ID ордера."""
@@ -55,29 +62,31 @@ class ExecutionAgent(BaseAgent):
                 status = "SKIPPED"
                 executed = False
                 execution_price = price
-            elif confidence < 0.6:
+            elif confidence < MIN_CONFIDENCE:
                 status = "REJECTED"
                 executed = False
                 execution_price = price
             else:
                 status = "FILLED"
                 executed = True
-                slippage = price * 0.0001
+                slippage = price * SLIPPAGE
                 execution_price = price + slippage if action == "BUY" else price - slippage
             
-            trade = Trade(
-                order_id=order_id,
-                symbol=symbol,
-                action=action,
-                price=price,
-                execution_price=execution_price,
-                status=status,
-                timestamp=execution_time
-            )
+            row = {
+                "order_id": order_id,
+                "symbol": symbol,
+                "action": action,
+                "price": price,
+                "execution_price": execution_price,
+                "status": status,
+                "timestamp": execution_time
+            }
             
-            self.db.add(trade)
-            self.db.commit()
-            self.db.refresh(trade)
+            if self.trade_writer is not None:
+                await self.trade_writer.submit(row)
+            else:
+                self.db.add(Trade(**row))
+                await self.db.commit()
             
             result = {
                 "executed": executed,
@@ -96,7 +105,8 @@ class ExecutionAgent(BaseAgent):
             
         except Exception as e:
             logger.error(f"Ошибка в ExecutionAgent: {e}")
-            self.db.rollback()
+            if self.trade_writer is None:
+                await self.db.rollback()
             return {
                 "executed": False,
                 "execution_price": market_data.get("price", 0.0),
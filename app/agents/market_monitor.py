@@ -1,61 +1,68 @@
 import logging
 import pandas as pd
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from app.agents.base import BaseAgent
+from app.ml.features import FEATURE_COLUMNS, compute_extra_features, compute_latest_features
+from app.services.candles import Candles
+from app.services.indicator_engine import IndicatorEngine
+from app.services.kline_aggregator import BASE_INTERVAL, KlineAggregator
 from app.services.market_data_client import BinanceMarketDataClient
+from app.services.market_stream import BinanceMarketStream
 
 logger = logging.getLogger(__name__)
 
 
 class MarketMonitoringAgent(BaseAgent):
     
-    def __init__(self, market_client: BinanceMarketDataClient):
+    def __init__(
+        self,
+        market_client: BinanceMarketDataClient,
+        market_stream: Optional[BinanceMarketStream] = None,
+        indicator_engine: Optional[IndicatorEngine] = None,
+        feature_columns: Optional[List[str]] = None,
+        kline_aggregator: Optional[KlineAggregator] = None,
+        interval: str = BASE_INTERVAL
+    ):
         self.market_client = market_client
+        self.market_stream = market_stream
+        self.indicator_engine = indicator_engine
+        self.feature_columns = feature_columns or FEATURE_COLUMNS
+        self.kline_aggregator = kline_aggregator
+        self.interval = interval
     
-    def _calculate_sma(self, prices: List[float], window: int) -> float:
-        """Вычислить Simple Moving Average."""
-        if len(prices) < window:
-            return prices[-1] if prices else 0.0
-        return sum(prices[-window:]) / window
-    
-    def _calculate_rsi(self, prices: List[float], period: int = 14) -> float:
-        """Вычислить RSI (упрощенная версия)."""
-        if len(prices) < period + 1:
-            return 50.0
-        
-        deltas = [prices[i] - prices[i-1] for i in range(1, len(prices))]
-        recent_deltas = deltas[-period:]
-        
-        gains = [d for d in recent_deltas if d > 0]
-        losses = [-d for d in recent_deltas if d < 0]
-        
-        avg_gain = sum(gains) / period if gains else 0.0
-        avg_loss = sum(losses) / period if losses else 0.0
-        
-        if avg_loss == 0:
-            return 100.0
-        
-        rs = avg_gain / avg_loss
-        rsi = 100 - (100 / (1 + rs))
-        return rsi
-    
-    def _extract_features_from_klines(self, klines: List[List]) -> Dict[str, float]:
-        """Извлечь фичи из свечей."""
-        if not klines:
-            return {}
-        
-        closes = [float(k[4]) for k in klines]
-        
-        features = {
-            "sma_10": self._calculate_sma(closes, 10),
-            "sma_50": self._calculate_sma(closes, 50),
-            "rsi_14": self._calculate_rsi(closes, 14),
-            "current_price": closes[-1],
-            "price_change_1m": (closes[-1] - closes[-2]) / closes[-2] * 100 if len(closes) >= 2 else 0.0,
-        }
+    def _extract_features(self, symbol: str, candles: Candles) -> Dict[str, float]:
+        """
+        Извлечь фичи из свечей.
         
+        Базовые фичи считаются инкрементально, если есть общий движок индикаторов;
+        остальные индикаторы набора модели - по окну последних свечей.
+        """
+        if self.indicator_engine is None:
+            features = compute_latest_features(candles)
+        else:
+            features = self.indicator_engine.update(symbol, self.interval, candles)
+        features.update(compute_extra_features(candles, self.feature_columns))
         return features
     
+    def _minute_series(self, symbol: str, klines: List[List[Any]]) -> List[List[Any]]:
+        """Минутная серия для агрегации: весь буфер кэша, если он есть (меньше пропусков)."""
+        cache = self.market_client.kline_cache
+        buffer = cache.get(symbol, BASE_INTERVAL) if cache is not None else None
+        return list(buffer) if buffer else klines
+    
+    async def _interval_klines(self, symbol: str, limit: int) -> List[List[Any]]:
+        """Свечи интервала монитора: собранные локально, а если истории мало - через REST."""
+        klines = None
+        if self.kline_aggregator is not None and self.kline_aggregator.supports(self.interval):
+            klines = self.kline_aggregator.get_klines(symbol, self.interval, limit)
+        if klines is None:
+            klines = await self.market_client.get_recent_klines(
+                symbol=symbol,
+                interval=self.interval,
+                limit=limit
+            )
+        return klines
+    
     async def process(self, symbol: str = "BTCUSDT") -> Dict[str, Any]:
         """
         Получить данные рынка и рассчитать индикаторы.
@@ -67,15 +74,28 @@ class MarketMonitoringAgent(BaseAgent):
             Словарь с данными рынка и фичами
         """
         try:
-            current_price = await self.market_client.get_current_price(symbol)
+            current_price = None
+            klines = None
+            if self.market_stream is not None:
+                current_price = self.market_stream.get_price(symbol)
+                klines = self.market_stream.get_klines(symbol, interval="1m", limit=100)
             
-            klines = await self.market_client.get_recent_klines(
-                symbol=symbol,
-                interval="1m",
-                limit=100
-            )
+            if current_price is None:
+                current_price = await self.market_client.get_current_price(symbol)
+            
+            if klines is None:
+                klines = await self.market_client.get_recent_klines(
+                    symbol=symbol,
+                    interval="1m",
+                    limit=100
+                )
+            
+            if self.kline_aggregator is not None:
+                self.kline_aggregator.update(symbol, self._minute_series(symbol, klines))
+            if self.interval != BASE_INTERVAL:
+                klines = await self._interval_klines(symbol, limit=100)
             
-            features = self._extract_features_from_klines(klines)
+            features = self._extract_features(symbol, Candles.from_klines(klines))
             
             result = {
                 "symbol": symbol,
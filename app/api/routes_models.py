@@ -0,0 +1,61 @@
+import secrets
+from fastapi import APIRouter, Depends, Header, HTTPException
+from typing import Dict, Any, Optional
+from app.api.routes_trading import get_model_registry
+from app.config import settings
+from app.ml.model_registry import ModelRegistry
+
+router = APIRouter(prefix="/admin/models", tags=["models"])
+
+
+def require_model_registry(
+    model_registry: Optional[ModelRegistry] = Depends(get_model_registry)
+) -> ModelRegistry:
+    if model_registry is None:
+        raise HTTPException(status_code=404, detail="Реестр моделей не настроен (MODEL_REGISTRY_PATH)")
+    return model_registry
+
+
+def require_admin_key(x_api_key: Optional[str] = Header(None)):
+    """Пропустить запрос только с ключом ADMIN_API_KEY в заголовке X-API-Key."""
+    if not settings.ADMIN_API_KEY:
+        raise HTTPException(status_code=403, detail="Управление моделями выключено (ADMIN_API_KEY не задан)")
+    if x_api_key is None or not secrets.compare_digest(x_api_key.encode(), settings.ADMIN_API_KEY.encode()):
+        raise HTTPException(status_code=401, detail="Неверный ключ администратора")
+
+
+@router.get("")
+async def list_models(model_registry: ModelRegistry = Depends(require_model_registry)) -> Dict[str, Any]:
+    """Версии модели в реестре, активная версия и версии в памяти."""
+    return {
+        **model_registry.get_stats(),
+        "versions": model_registry.list_versions()
+    }
+
+
+@router.post("/rollback", dependencies=[Depends(require_admin_key)])
+async def rollback_model(model_registry: ModelRegistry = Depends(require_model_registry)) -> Dict[str, Any]:
+    """Вернуть версию модели, активную до текущей."""
+    try:
+        return await model_registry.rollback()
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.post("/{version}/activate", dependencies=[Depends(require_admin_key)])
+async def activate_model(
+    version: str,
+    model_registry: ModelRegistry = Depends(require_model_registry)
+) -> Dict[str, Any]:
+    """
+    Сделать версию модели активной без рестарта.
+    
+    Версия загружается в фоне, предсказания продолжают работать на текущей
+    модели до момента замены.
+    """
+    try:
+        return await model_registry.activate(version)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except (ValueError, KeyError) as e:
+        raise HTTPException(status_code=422, detail=f"Версия модели не может быть загружена: {e}")
@@ -1,29 +1,96 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import List
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Dict, Any, Optional
 from app.db_models.schemas import (
     TradingCycleResponse,
     TradeResponse,
     MarketLatestResponse
 )
-from app.db_models.db import get_db
+from app.db_models.db import get_async_db
 from app.db_models.trade_entity import Trade
 from app.services.trading_engine import TradingEngine
 from app.services.market_data_client import BinanceMarketDataClient
+from app.services.market_stream import BinanceMarketStream
+from app.services.indicator_engine import IndicatorEngine
+from app.services.kline_aggregator import KlineAggregator
+from app.services.compute_executor import ComputeExecutor
+from app.services.trade_writer import TradeWriter
 from app.agents.market_monitor import MarketMonitoringAgent
 from app.agents.decision_maker import DecisionMakingAgent
 from app.agents.execution_agent import ExecutionAgent
+from app.ml.model_inference import get_cascade_stats, get_feature_columns, get_prediction_cache_stats
+from app.ml.model_registry import ModelRegistry
+from app.ml.model_warmup import ModelWarmup
 from app.config import settings
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/trading", tags=["trading"])
 
 
-def get_trading_engine(db: Session = Depends(get_db)) -> TradingEngine:
-    market_client = BinanceMarketDataClient()
-    market_agent = MarketMonitoringAgent(market_client)
-    decision_agent = DecisionMakingAgent()
-    execution_agent = ExecutionAgent(db)
+def get_market_client(request: Request) -> BinanceMarketDataClient:
+    """Общий клиент Binance с пулом соединений, созданный в lifespan."""
+    return request.app.state.market_client
+
+
+def get_market_stream(request: Request) -> Optional[BinanceMarketStream]:
+    """Поток рыночных данных (только в режиме streaming)."""
+    return request.app.state.market_stream
+
+
+def get_indicator_engine(request: Request) -> IndicatorEngine:
+    """Общий движок индикаторов с состоянием по сериям."""
+    return request.app.state.indicator_engine
+
+
+def get_kline_aggregator(request: Request) -> Optional[KlineAggregator]:
+    """Локальная сборка свечей старших интервалов (если включена)."""
+    return request.app.state.kline_aggregator
+
+
+def get_compute_executor(request: Request) -> ComputeExecutor:
+    """Пулы для инференса и обучения вне event loop."""
+    return request.app.state.compute_executor
+
+
+def get_model_registry(request: Request) -> Optional[ModelRegistry]:
+    """Реестр версий модели (если задан MODEL_REGISTRY_PATH)."""
+    return request.app.state.model_registry
+
+
+def get_model_warmup(request: Request) -> Optional[ModelWarmup]:
+    """Ход фоновой инициализации модели."""
+    return request.app.state.model_warmup
+
+
+def get_trade_writer(request: Request) -> Optional[TradeWriter]:
+    """Пакетная запись сделок (если TRADE_WRITER_ENABLED)."""
+    return request.app.state.trade_writer
+
+
+def get_trading_engine(
+    db: AsyncSession = Depends(get_async_db),
+    market_client: BinanceMarketDataClient = Depends(get_market_client),
+    market_stream: Optional[BinanceMarketStream] = Depends(get_market_stream),
+    indicator_engine: IndicatorEngine = Depends(get_indicator_engine),
+    kline_aggregator: Optional[KlineAggregator] = Depends(get_kline_aggregator),
+    compute_executor: ComputeExecutor = Depends(get_compute_executor),
+    model_warmup: Optional[ModelWarmup] = Depends(get_model_warmup),
+    trade_writer: Optional[TradeWriter] = Depends(get_trade_writer)
+) -> TradingEngine:
+    market_agent = MarketMonitoringAgent(
+        market_client,
+        market_stream,
+        indicator_engine,
+        feature_columns=get_feature_columns(),
+        kline_aggregator=kline_aggregator,
+        interval=settings.MONITOR_INTERVAL
+    )
+    decision_agent = DecisionMakingAgent(compute_executor, model_warmup)
+    execution_agent = ExecutionAgent(db, trade_writer)
     
     return TradingEngine(
         market_agent=market_agent,
@@ -55,21 +122,38 @@ async def run_trading_cycle(
 @router.get("/trades", response_model=List[TradeResponse])
 async def get_trades(
     limit: int = Query(default=50, ge=1, le=100, description="Количество трейдов"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    trade_writer: Optional[TradeWriter] = Depends(get_trade_writer)
 ):
     """Получить список последних сделок."""
-    trades = db.query(Trade).order_by(Trade.timestamp.desc()).limit(limit).all()
+    if trade_writer is not None:
+        # Сделки, уже возвращенные клиентам, должны быть видны в списке; ждем
+        # только поставленные до запроса и не дольше TRADE_WRITER_FLUSH_TIMEOUT
+        if not await trade_writer.flush(timeout=settings.TRADE_WRITER_FLUSH_TIMEOUT):
+            logger.warning("Не все сделки из очереди записаны, список может быть неполным")
+    result = await db.execute(select(Trade).order_by(Trade.timestamp.desc()).limit(limit))
+    trades = result.scalars().all()
     return [TradeResponse.model_validate(trade) for trade in trades]
 
 
 @router.get("/market/latest", response_model=MarketLatestResponse)
 async def get_market_latest(
-    symbol: str = Query(default="BTCUSDT", description="Торговая пара")
+    symbol: str = Query(default="BTCUSDT", description="Торговая пара"),
+    market_client: BinanceMarketDataClient = Depends(get_market_client),
+    market_stream: Optional[BinanceMarketStream] = Depends(get_market_stream),
+    indicator_engine: IndicatorEngine = Depends(get_indicator_engine),
+    kline_aggregator: Optional[KlineAggregator] = Depends(get_kline_aggregator)
 ):
     """Получить последние данные рынка."""
     try:
-        market_client = BinanceMarketDataClient()
-        market_agent = MarketMonitoringAgent(market_client)
+        market_agent = MarketMonitoringAgent(
+            market_client,
+            market_stream,
+            indicator_engine,
+            feature_columns=get_feature_columns(),
+            kline_aggregator=kline_aggregator,
+            interval=settings.MONITOR_INTERVAL
+        )
         
         market_data = await market_agent.process(symbol)
         
@@ -82,3 +166,26 @@ async def get_market_latest(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка получения данных рынка: {str(e)}")
 
+
+@router.get("/metrics")
+async def get_metrics(
+    market_client: BinanceMarketDataClient = Depends(get_market_client),
+    market_stream: Optional[BinanceMarketStream] = Depends(get_market_stream),
+    kline_aggregator: Optional[KlineAggregator] = Depends(get_kline_aggregator),
+    compute_executor: ComputeExecutor = Depends(get_compute_executor),
+    model_registry: Optional[ModelRegistry] = Depends(get_model_registry),
+    model_warmup: Optional[ModelWarmup] = Depends(get_model_warmup),
+    trade_writer: Optional[TradeWriter] = Depends(get_trade_writer)
+) -> Dict[str, Any]:
+    """Получить метрики работы сервисов."""
+    return {
+        "market_client": market_client.get_stats(),
+        "market_stream": market_stream.get_stats() if market_stream else None,
+        "kline_aggregator": kline_aggregator.get_stats() if kline_aggregator else None,
+        "compute_executor": compute_executor.get_stats(),
+        "prediction_cache": get_prediction_cache_stats(),
+        "cascade": get_cascade_stats(),
+        "model_registry": model_registry.get_stats() if model_registry else None,
+        "model_warmup": model_warmup.get_status() if model_warmup else None,
+        "trade_writer": trade_writer.get_stats() if trade_writer else None
+    }
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Dict, List, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -7,18 +7,142 @@ class Settings(BaseSettings):
     # Binance API
     BINANCE_BASE_URL: str = "https://api.binance.com"
     
+    # HTTP пул соединений к Binance
+    HTTP_TIMEOUT: float = 10.0
+    HTTP_CONNECT_TIMEOUT: float = 5.0
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP2_ENABLED: bool = False
+    
+    # Кэш свечей (инкрементальная догрузка)
+    KLINE_CACHE_ENABLED: bool = True
+    KLINE_CACHE_MAX_CANDLES: int = 1000
+    KLINE_CACHE_MAX_SERIES: int = 64
+    
+    # Объединение одинаковых одновременных запросов (single-flight)
+    SINGLE_FLIGHT_TTL: float = 0.0
+    
+    # Лимиты веса запросов Binance и повторы
+    BINANCE_WEIGHT_LIMIT: int = 6000
+    BINANCE_WEIGHT_SAFETY_MARGIN: float = 0.9
+    RATE_LIMIT_MAX_QUEUE: int = 100
+    RATE_LIMIT_MAX_WAIT: float = 10.0
+    BINANCE_MAX_RETRIES: int = 3
+    BINANCE_BACKOFF_BASE: float = 0.5
+    BINANCE_BACKOFF_MAX: float = 8.0
+    
+    # Режим получения рыночных данных: polling (REST) или streaming (WebSocket)
+    MARKET_DATA_MODE: str = "polling"
+    BINANCE_WS_URL: str = "wss://stream.binance.com:9443"
+    STREAM_SYMBOLS: List[str] = ["BTCUSDT"]
+    STREAM_STALE_AFTER: float = 10.0
+    STREAM_RECONNECT_MAX_DELAY: float = 30.0
+    
+    # Снимок состояния индикаторов (чтобы не прогревать их после рестарта)
+    INDICATOR_STATE_PATH: Optional[str] = None
+    
     # Торговые параметры
     DEFAULT_SYMBOL: str = "BTCUSDT"
     DEFAULT_INTERVAL: str = "1m"
     DEFAULT_KLINES_LIMIT: int = 100
+    MONITOR_INTERVAL: str = "1m"
+    
+    # Локальная сборка свечей 5m/15m/1h/4h из минутных
+    KLINE_AGGREGATION_ENABLED: bool = True
+    KLINE_AGGREGATION_MAX_CANDLES: int = 1000
     
     # ML Model
     MODEL_THRESHOLD_PERCENT: float = 0.5
+    MODEL_N_ESTIMATORS: int = 50
+    MODEL_MAX_DEPTH: int = 10
     MODEL_PATH: Optional[str] = None
+    MODEL_FEATURES: List[str] = ["sma_10", "sma_50", "rsi", "price_change", "volume"]
+    MODEL_COMPILE_FOREST: bool = True
+    
+    # Каскад: неглубокое дерево отвечает само, если уверено, иначе решает лес
+    CASCADE_ENABLED: bool = False
+    CASCADE_CONFIDENCE: float = 0.8
+    CASCADE_MAX_DEPTH: int = 4
+    CASCADE_AUDIT_RATE: float = 0.05
+    
+    # Формат сохраняемой модели: arrays (буферы NumPy, mmap) или pickle
+    MODEL_ARTIFACT_FORMAT: str = "arrays"
+    MODEL_ARTIFACT_MMAP: bool = True
+    MODEL_ARTIFACT_VERIFY: bool = True
+    # Загрузка моделей в pickle (выполняет код из файла - только для доверенных файлов)
+    MODEL_ALLOW_PICKLE: bool = False
+    
+    # Реестр версий модели (замена и откат без рестарта)
+    MODEL_REGISTRY_PATH: Optional[str] = None
+    MODEL_REGISTRY_RESIDENT: int = 3
+    MODEL_REGISTRY_WATCH_INTERVAL: float = 5.0
+    # Ключ для POST /admin/models/* (заголовок X-API-Key); без ключа эндпоинты выключены
+    ADMIN_API_KEY: Optional[str] = None
+    
+    # Фоновая инициализация модели: пауза перед повтором после ошибки (0 - без повторов)
+    MODEL_WARMUP_RETRY_INTERVAL: float = 60.0
+    
+    # Инкрементальное обновление модели на новых свечах (0 - выключено):
+    # деревья на последних свечах добавляются, самые старые удаляются
+    MODEL_UPDATE_INTERVAL: float = 0.0
+    MODEL_UPDATE_WINDOW: int = 500
+    MODEL_UPDATE_TREES: int = 10
+    MODEL_MAX_TREES: int = 200
+    MODEL_MAX_MEMORY_MB: float = 256.0
+    
+    # Кэш предсказаний по квантованным признакам (число значащих цифр по признаку)
+    PREDICTION_CACHE_ENABLED: bool = True
+    PREDICTION_CACHE_MAX_ENTRIES: int = 10000
+    PREDICTION_CACHE_TTL: float = 30.0
+    PREDICTION_CACHE_SIGNIFICANT_DIGITS: Dict[str, int] = {
+        "sma_10": 7,
+        "sma_50": 7,
+        "rsi": 3,
+        "price_change": 3,
+        "volume": 4
+    }
+    PREDICTION_CACHE_DEFAULT_SIGNIFICANT_DIGITS: int = 6
+    
+    # Пулы для CPU-задач вне event loop
+    INFERENCE_WORKERS: int = 4
+    INFERENCE_MAX_QUEUE: int = 100
+    TRAINING_WORKERS: int = 1
+    TRAINING_MAX_QUEUE: int = 2
+    TRAINING_EXECUTOR: str = "process"
+    
+    # Локальное хранилище исторических свечей
+    HISTORY_STORE_PATH: str = "./data/klines"
+    MODEL_TRAIN_INTERVAL: str = "1h"
+    MODEL_TRAIN_MIN_CANDLES: int = 500
+    
+    # Построение обучающей выборки по блокам (каталог для X/y на диске, если история длиннее блока)
+    TRAINING_CHUNK_SIZE: int = 1000000
+    TRAINING_SCRATCH_PATH: Optional[str] = None
     
     # Database
     DATABASE_URL: str = "sqlite:///./trading.db"
     
+    # Пулы асинхронного движка (драйвер выбирается по DATABASE_URL: aiosqlite или asyncpg)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_SQLITE_POOL_SIZE: int = 20
+    DB_SQLITE_BUSY_TIMEOUT: float = 30.0
+    DB_SQLITE_WAL: bool = True
+    
+    # Отложенная пакетная запись сделок (иначе commit на каждую сделку)
+    TRADE_WRITER_ENABLED: bool = True
+    TRADE_WRITER_MAX_QUEUE: int = 10000
+    TRADE_WRITER_BATCH_SIZE: int = 500
+    TRADE_WRITER_FLUSH_INTERVAL: float = 0.2
+    TRADE_WRITER_MAX_RETRIES: int = 3
+    # Пакеты, не записанные после повторов, сохраняются сюда и дописываются при старте (пусто - отбрасываются)
+    TRADE_WRITER_SPILL_PATH: Optional[str] = "./data/trade_spill.jsonl"
+    # Сколько GET /trading/trades ждет записи уже поставленных в очередь сделок
+    TRADE_WRITER_FLUSH_TIMEOUT: float = 2.0
+    
     # Logging
     LOG_LEVEL: str = "INFO"
     
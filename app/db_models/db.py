@@ -1,22 +1,96 @@
-from sqlalchemy import create_engine
+from typing import Any, AsyncIterator, Dict
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
 from app.config import settings
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
-)
-
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Асинхронные драйверы для DATABASE_URL с синхронным драйвером
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+}
 
 Base = declarative_base()
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+def async_database_url(url: str) -> str:
+    """
+    URL с асинхронным драйвером: sqlite -> sqlite+aiosqlite, postgresql -> postgresql+asyncpg.
+    
+    URL с уже указанным асинхронным драйвером возвращается как есть.
+    """
+    parsed = make_url(url)
+    backend = "postgresql" if parsed.get_backend_name() in ("postgresql", "postgres") else parsed.get_backend_name()
+    driver = ASYNC_DRIVERS.get(backend)
+    if driver is None:
+        raise ValueError(f"Нет асинхронного драйвера для {parsed.drivername}. Поддерживаются: {list(ASYNC_DRIVERS)}")
+    # Драйвер берется из строки: get_driver_name() загружает диалект, а для "postgres" его нет
+    if parsed.drivername.partition("+")[2] in (driver, "aiosqlite", "asyncpg"):
+        return url
+    return parsed.set(drivername=f"{backend}+{driver}").render_as_string(hide_password=False)
+
+
+def _async_engine_options(url: str) -> Dict[str, Any]:
+    """
+    Параметры пула под драйвер.
+    
+    SQLite в режиме WAL читает параллельно, а пишет одним писателем: пул
+    без переполнения рассчитан на параллельные запросы (вместо NullPool
+    aiosqlite по умолчанию, который открывает файл на каждый запрос),
+    ожидание блокировки записи ограничено DB_SQLITE_BUSY_TIMEOUT; база в
+    памяти живет в одном соединении. Для Postgres пул рассчитан на
+    параллельные запросы, соединения проверяются перед выдачей и
+    пересоздаются раз в DB_POOL_RECYCLE секунд.
+    """
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        connect_args = {"timeout": settings.DB_SQLITE_BUSY_TIMEOUT}
+        if parsed.database in (None, "", ":memory:"):
+            return {"poolclass": StaticPool, "connect_args": connect_args}
+        return {
+            "poolclass": AsyncAdaptedQueuePool,
+            "pool_size": settings.DB_SQLITE_POOL_SIZE,
+            "max_overflow": 0,
+            "pool_timeout": settings.DB_POOL_TIMEOUT,
+            "connect_args": connect_args
+        }
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": True
+    }
+
+
+def create_async_db_engine(url: str):
+    """Асинхронный движок с пулом под драйвер (для SQLite в файле - журнал WAL)."""
+    url = async_database_url(url)
+    async_engine = create_async_engine(url, **_async_engine_options(url))
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database not in (None, "", ":memory:") and settings.DB_SQLITE_WAL:
+        @event.listens_for(async_engine.sync_engine, "connect")
+        def _enable_wal(dbapi_connection, connection_record):
+            # Чтения не ждут пишущую транзакцию
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.close()
+    return async_engine
+
+
+async_engine = create_async_db_engine(settings.DATABASE_URL)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
+
+async def init_db():
+    """Создать таблицы через асинхронный движок."""
+    async with async_engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
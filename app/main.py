@@ -1,12 +1,26 @@
+import asyncio
 import logging
+import time
 from contextlib import asynccontextmanager
+from typing import Optional
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.db_models.db import Base, engine
+from app.db_models.db import async_engine, init_db
 from app.api.routes_trading import router as trading_router
+from app.api.routes_models import router as models_router
 from app.services.market_data_client import BinanceMarketDataClient
-from app.ml.model_loader import ModelLoader
-from app.ml.model_inference import initialize_model
+from app.services.market_stream import BinanceMarketStream
+from app.services.kline_store import KlineStore
+from app.services.kline_aggregator import BASE_INTERVAL, KlineAggregator, count_candles
+from app.services.indicator_engine import IndicatorEngine
+from app.services.candles import Candles
+from app.services.compute_executor import ComputeExecutor
+from app.services.trade_writer import TradeWriter
+from app.ml.model_loader import UPDATE_WARMUP, ModelLoader, train_loader, train_loader_from_store, update_loader
+from app.ml.model_inference import get_model_loader, initialize_model, is_model_ready
+from app.ml.model_registry import ModelRegistry
+from app.ml.model_warmup import ModelWarmup
 from app.config import settings
 
 logging.basicConfig(
@@ -16,59 +30,350 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+async def train_model(
+    model_loader: ModelLoader,
+    market_client: BinanceMarketDataClient,
+    executor: ComputeExecutor,
+    model_warmup: Optional[ModelWarmup] = None
+) -> ModelLoader:
+    """
+    Обучить модель на локальной истории, а если ее недостаточно - на свечах Binance.
+    
+    Обучение выполняется в пуле обучения, event loop в это время свободен.
+    
+    Returns:
+        Загрузчик с обученной моделью
+    """
+    store = KlineStore()
+    symbol = settings.DEFAULT_SYMBOL
+    interval = settings.MODEL_TRAIN_INTERVAL
+    
+    if count_candles(store, symbol, interval) >= settings.MODEL_TRAIN_MIN_CANDLES:
+        _enter_stage(model_warmup, "train")
+        return await executor.run_training(train_loader_from_store, model_loader, store, symbol, interval)
+    
+    _enter_stage(model_warmup, "fetch_candles")
+    klines = await market_client.get_recent_klines(
+        symbol=symbol,
+        interval=interval,
+        limit=settings.MODEL_TRAIN_MIN_CANDLES
+    )
+    _enter_stage(model_warmup, "train")
+    return await executor.run_training(train_loader, model_loader, klines)
+
+
+async def load_or_train_model(
+    market_client: BinanceMarketDataClient,
+    executor: ComputeExecutor,
+    model_warmup: Optional[ModelWarmup] = None
+) -> ModelLoader:
+    """
+    Загрузить модель из MODEL_PATH, а если это невозможно - обучить новую.
+    
+    Returns:
+        Загрузчик с готовой моделью
+    """
+    model_loader = ModelLoader()
+    
+    if settings.MODEL_PATH:
+        try:
+            _enter_stage(model_warmup, "load_file")
+            # Чтение и проверка артефакта блокируют, поэтому выполняются в потоке
+            await asyncio.to_thread(model_loader.load_model, settings.MODEL_PATH)
+            if len(model_loader.classes_) < 3:
+                logger.warning("Загруженная модель имеет недостаточно классов. Переобучаем...")
+                raise ValueError("Model has insufficient classes")
+            logger.info("Модель загружена из файла")
+        except (FileNotFoundError, ValueError, KeyError) as e:
+            logger.info(f"Модель не может быть использована ({e}), обучение новой модели...")
+            model_loader = await train_model(model_loader, market_client, executor, model_warmup)
+            try:
+                await asyncio.to_thread(model_loader.save_model, settings.MODEL_PATH)
+            except Exception as e:
+                # Обученная модель остается в памяти и обслуживает запросы
+                logger.error(f"Не удалось сохранить модель в {settings.MODEL_PATH}: {e}")
+    else:
+        logger.info("Обучение модели на исторических данных...")
+        model_loader = await train_model(model_loader, market_client, executor, model_warmup)
+    
+    return model_loader
+
+
+def _enter_stage(model_warmup: Optional[ModelWarmup], stage: str):
+    if model_warmup is not None:
+        model_warmup.enter(stage)
+
+
+async def initialize_model_state(
+    model_warmup: ModelWarmup,
+    model_registry: Optional[ModelRegistry],
+    market_client: BinanceMarketDataClient,
+    executor: ComputeExecutor
+):
+    """
+    Подготовить модель и сделать ее текущей для инференса.
+    
+    Активная версия реестра, иначе MODEL_PATH или обучение (новая модель
+    регистрируется и активируется, если реестр задан). Если сохранить или
+    зарегистрировать обученную модель не удалось, она все равно становится
+    текущей, а ошибка пишется в лог.
+    """
+    active_version = model_registry.read_active() if model_registry is not None else None
+    if active_version is not None:
+        try:
+            model_warmup.enter("registry")
+            await model_registry.activate(active_version)
+            logger.info(f"Модель загружена из реестра, версия {active_version}")
+            return
+        except (FileNotFoundError, ValueError, KeyError) as e:
+            logger.info(f"Активная версия {active_version} не может быть использована ({e})")
+    
+    model_loader = await load_or_train_model(market_client, executor, model_warmup)
+    if model_registry is not None:
+        model_warmup.enter("register")
+        try:
+            version = await asyncio.to_thread(model_registry.register, model_loader, {
+                "symbol": settings.DEFAULT_SYMBOL,
+                "interval": settings.MODEL_TRAIN_INTERVAL
+            })
+        except Exception as e:
+            # Без версии в реестре модель все равно обслуживает запросы до перезапуска
+            logger.error(f"Не удалось зарегистрировать модель в реестре: {e}")
+            initialize_model(model_loader)
+            return
+        await model_registry.activate(version)
+    else:
+        initialize_model(model_loader)
+
+
+async def warm_up_model(
+    model_warmup: ModelWarmup,
+    model_registry: Optional[ModelRegistry],
+    market_client: BinanceMarketDataClient,
+    executor: ComputeExecutor
+):
+    """
+    Фоновая инициализация модели, запускаемая из lifespan.
+    
+    Приложение принимает запросы сразу; пока модели нет, DecisionMakingAgent
+    отвечает HOLD "Model warming up". После ошибки попытка повторяется через
+    MODEL_WARMUP_RETRY_INTERVAL секунд (если модель не появилась иначе,
+    например через реестр). Когда модель готова, задача продолжает работу
+    как наблюдатель ACTIVE реестра.
+    """
+    retry_interval = settings.MODEL_WARMUP_RETRY_INTERVAL
+    while True:
+        model_warmup.start()
+        logger.info(f"Инициализация ML модели (попытка {model_warmup.attempts})...")
+        try:
+            await initialize_model_state(model_warmup, model_registry, market_client, executor)
+            model_warmup.finish()
+            logger.info(f"ML модель готова к использованию за {model_warmup.elapsed:.1f} с")
+            break
+        except Exception as e:
+            logger.error(f"Ошибка при инициализации модели: {e}")
+            if retry_interval <= 0:
+                model_warmup.fail(e)
+                logger.warning("Продолжаем работу без модели (будут использоваться заглушки)")
+                break
+            model_warmup.fail(e, retry_in=retry_interval)
+            logger.warning(f"Повторная попытка через {retry_interval:.0f} с, до этого используются заглушки")
+            await asyncio.sleep(retry_interval)
+        
+        if is_model_ready():
+            # Модель активирована иначе (например, через реестр) во время ожидания
+            model_warmup.finish()
+            logger.info("Модель активирована во время ожидания повтора, инициализация завершена")
+            break
+    
+    if model_registry is not None and settings.MODEL_REGISTRY_WATCH_INTERVAL > 0:
+        await model_registry.watch(settings.MODEL_REGISTRY_WATCH_INTERVAL)
+
+
+async def update_model(
+    model_registry: Optional[ModelRegistry],
+    market_client: BinanceMarketDataClient,
+    executor: ComputeExecutor
+) -> bool:
+    """
+    Инкрементально обновить текущую модель на последних закрытых свечах Binance.
+    
+    Обновляется копия модели в пуле обучения; новая версия регистрируется и
+    активируется через реестр (если он задан), иначе подменяется в
+    model_inference. Если за время обновления модель сменили иначе
+    (реестр, API), результат отбрасывается.
+    
+    Returns:
+        True, если обновленная модель активирована
+    """
+    model_loader = get_model_loader()
+    if model_loader is None or model_loader.model is None:
+        logger.debug("Инкрементальное обновление пропущено: нет sklearn-модели для дообучения")
+        return False
+    
+    klines = await market_client.get_recent_klines(
+        symbol=settings.DEFAULT_SYMBOL,
+        interval=settings.MODEL_TRAIN_INTERVAL,
+        limit=settings.MODEL_UPDATE_WINDOW + UPDATE_WARMUP + 2
+    )
+    # Последняя свеча Binance обычно еще не закрыта
+    now_ms = int(time.time() * 1000)
+    klines = [kline for kline in klines if int(kline[6]) < now_ms]
+    updated = await executor.run_training(update_loader, model_loader, Candles.from_klines(klines))
+    
+    if get_model_loader() is not model_loader:
+        logger.warning("Модель сменилась во время инкрементального обновления, результат отброшен")
+        return False
+    if model_registry is not None:
+        version = await asyncio.to_thread(model_registry.register, updated, {
+            "symbol": settings.DEFAULT_SYMBOL,
+            "interval": settings.MODEL_TRAIN_INTERVAL,
+            "incremental": True
+        })
+        await model_registry.activate(version)
+    else:
+        initialize_model(updated)
+    return True
+
+
+def check_model_update_settings():
+    """
+    Проверить, что инкрементальные обновления переживут перезапуск.
+    
+    Дообучать можно только sklearn-лес. Модель, загруженная из артефакта с
+    массивами (MODEL_PATH или реестр при MODEL_ARTIFACT_FORMAT=arrays), его
+    не содержит: после перезапуска задача обновлений молча ничего не делала
+    бы, поэтому такая конфигурация отвергается при старте.
+    
+    Raises:
+        ValueError: Если MODEL_UPDATE_INTERVAL задан, а модели с диска загружаются без sklearn-леса
+    """
+    if settings.MODEL_UPDATE_INTERVAL <= 0 or not (settings.MODEL_REGISTRY_PATH or settings.MODEL_PATH):
+        return
+    if settings.MODEL_ARTIFACT_FORMAT == "pickle" and settings.MODEL_ALLOW_PICKLE:
+        return
+    raise ValueError(
+        "MODEL_UPDATE_INTERVAL задан, но модели с диска загружаются без sklearn-леса "
+        f"(MODEL_ARTIFACT_FORMAT={settings.MODEL_ARTIFACT_FORMAT}, MODEL_ALLOW_PICKLE={settings.MODEL_ALLOW_PICKLE}), "
+        "и после перезапуска обновлять будет нечего. Задайте MODEL_ARTIFACT_FORMAT=pickle и "
+        "MODEL_ALLOW_PICKLE=true или MODEL_UPDATE_INTERVAL=0"
+    )
+
+
+async def run_model_updates(
+    interval: float,
+    model_registry: Optional[ModelRegistry],
+    market_client: BinanceMarketDataClient,
+    executor: ComputeExecutor
+):
+    """Каждые interval секунд инкрементально обновлять модель (ошибки не прерывают цикл)."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await update_model(model_registry, market_client, executor)
+        except Exception as e:
+            logger.error(f"Ошибка при инкрементальном обновлении модели: {e}")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Запуск приложения...")
+    # Проверяется до запуска фоновых задач и подключений
+    check_model_update_settings()
     
-    Base.metadata.create_all(bind=engine)
+    await init_db()
     logger.info("База данных инициализирована")
     
-    try:
-        logger.info("Инициализация ML модели...")
-        model_loader = ModelLoader()
-        
-        if settings.MODEL_PATH:
-            try:
-                model_loader.load_model(settings.MODEL_PATH)
-                if len(model_loader.model.classes_) < 3:
-                    logger.warning("Загруженная модель имеет недостаточно классов. Переобучаем...")
-                    raise ValueError("Model has insufficient classes")
-                logger.info("Модель загружена из файла")
-            except (FileNotFoundError, ValueError, KeyError) as e:
-                logger.info(f"Модель не может быть использована ({e}), обучение новой модели...")
-                market_client = BinanceMarketDataClient()
-                
-                klines = await market_client.get_recent_klines(
-                    symbol=settings.DEFAULT_SYMBOL,
-                    interval="1h",
-                    limit=500
-                )
-
-                model_loader.train_model(klines)
-                if settings.MODEL_PATH:
-                    model_loader.save_model(settings.MODEL_PATH)
-                await market_client.close()
-        else:
-            logger.info("Обучение модели на исторических данных...")
-            market_client = BinanceMarketDataClient()
-            klines = await market_client.get_recent_klines(
-                symbol=settings.DEFAULT_SYMBOL,
-                interval="1h",
-                limit=500
-            )
-            model_loader.train_model(klines)
-            await market_client.close()
-        
-        initialize_model(model_loader)
-        logger.info("ML модель готова к использованию")
-        
-    except Exception as e:
-        logger.error(f"Ошибка при инициализации модели: {e}")
-        logger.warning("Продолжаем работу без модели (будут использоваться заглушки)")
+    market_client = BinanceMarketDataClient()
+    app.state.market_client = market_client
+    
+    compute_executor = ComputeExecutor(
+        inference_workers=settings.INFERENCE_WORKERS,
+        inference_max_queue=settings.INFERENCE_MAX_QUEUE,
+        training_workers=settings.TRAINING_WORKERS,
+        training_max_queue=settings.TRAINING_MAX_QUEUE,
+        training_mode=settings.TRAINING_EXECUTOR
+    )
+    app.state.compute_executor = compute_executor
+    
+    trade_writer = None
+    if settings.TRADE_WRITER_ENABLED:
+        trade_writer = TradeWriter(
+            max_queue=settings.TRADE_WRITER_MAX_QUEUE,
+            batch_size=settings.TRADE_WRITER_BATCH_SIZE,
+            flush_interval=settings.TRADE_WRITER_FLUSH_INTERVAL,
+            max_retries=settings.TRADE_WRITER_MAX_RETRIES,
+            spill_path=settings.TRADE_WRITER_SPILL_PATH
+        )
+        await trade_writer.start()
+    app.state.trade_writer = trade_writer
+    
+    market_stream = None
+    if settings.MARKET_DATA_MODE == "streaming":
+        market_stream = BinanceMarketStream(
+            market_client,
+            symbols=settings.STREAM_SYMBOLS,
+            interval=settings.DEFAULT_INTERVAL,
+            buffer_size=settings.DEFAULT_KLINES_LIMIT
+        )
+        await market_stream.start()
+    app.state.market_stream = market_stream
+    
+    indicator_engine = IndicatorEngine()
+    if settings.INDICATOR_STATE_PATH:
+        try:
+            indicator_engine.load(settings.INDICATOR_STATE_PATH)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Не удалось загрузить состояние индикаторов: {e}")
+    app.state.indicator_engine = indicator_engine
+    
+    kline_aggregator = None
+    if settings.KLINE_AGGREGATION_ENABLED:
+        kline_aggregator = KlineAggregator(max_candles=settings.KLINE_AGGREGATION_MAX_CANDLES)
+        store = KlineStore()
+        for symbol in dict.fromkeys([settings.DEFAULT_SYMBOL, *settings.STREAM_SYMBOLS]):
+            if store.count(symbol, BASE_INTERVAL) > 0:
+                kline_aggregator.seed(symbol, store.read(symbol, BASE_INTERVAL))
+    app.state.kline_aggregator = kline_aggregator
+    
+    model_registry = None
+    if settings.MODEL_REGISTRY_PATH:
+        model_registry = ModelRegistry(settings.MODEL_REGISTRY_PATH, settings.MODEL_REGISTRY_RESIDENT)
+    app.state.model_registry = model_registry
+    
+    # Модель готовится в фоне: сервер принимает запросы, не дожидаясь
+    # свечей Binance и обучения
+    model_warmup = ModelWarmup()
+    app.state.model_warmup = model_warmup
+    model_task = asyncio.create_task(
+        warm_up_model(model_warmup, model_registry, market_client, compute_executor)
+    )
+    background_tasks = [model_task]
+    if settings.MODEL_UPDATE_INTERVAL > 0:
+        background_tasks.append(asyncio.create_task(
+            run_model_updates(settings.MODEL_UPDATE_INTERVAL, model_registry, market_client, compute_executor)
+        ))
     
     yield
     
     logger.info("Завершение работы приложения...")
+    for task in background_tasks:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    if trade_writer is not None:
+        # Сделки из очереди дописываются до закрытия приложения
+        await trade_writer.stop()
+    if market_stream is not None:
+        await market_stream.stop()
+    if settings.INDICATOR_STATE_PATH:
+        indicator_engine.save(settings.INDICATOR_STATE_PATH)
+    await market_client.close()
+    logger.info(f"HTTP клиент Binance закрыт, статистика соединений: {market_client.get_stats()}")
+    compute_executor.shutdown()
+    await async_engine.dispose()
 
 
 app = FastAPI(
@@ -89,6 +394,7 @@ app.add_middleware(
 
 
 app.include_router(trading_router)
+app.include_router(models_router)
 
 
 @app.get("/health")
@@ -96,3 +402,18 @@ async def health_check():
     """Проверка здоровья приложения."""
     return {"status": "healthy"}
 
+
+@app.get("/ready")
+async def readiness_check():
+    """
+    Готовность к торговле: 200, когда модель загружена, иначе 503.
+    
+    В теле - ход фоновой инициализации модели: состояние, этап, попытки и
+    длительности этапов. /health от модели не зависит.
+    """
+    ready = is_model_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, **app.state.model_warmup.get_status()}
+    )
+
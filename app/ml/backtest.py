@@ -0,0 +1,351 @@
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from app.agents.execution_agent import MIN_CONFIDENCE, SLIPPAGE
+from app.ml.features import compute_feature_matrix
+from app.ml.model_loader import ModelLoader
+from app.ml.training_data import CHUNK_WARMUP, TARGET_BUY, TARGET_SELL
+from app.services.candles import Candles
+from app.services.kline_aggregator import read_candles
+from app.services.kline_store import KlineStore
+
+logger = logging.getLogger(__name__)
+
+# Статусы исполнения, как у ExecutionAgent
+STATUS_SKIPPED = 0
+STATUS_REJECTED = 1
+STATUS_FILLED = 2
+
+# Для модели с двумя классами model_inference._decide заменяет неуверенный прогноз на HOLD
+TWO_CLASS_MIN_CONFIDENCE = 0.6
+
+
+def walk_forward_windows(n: int, train_size: int, test_size: int) -> List[Tuple[int, int, int]]:
+    """
+    Разбить n свечей на окна walk-forward.
+    
+    Модель каждого окна обучается на train_size свечах перед тестовым
+    отрезком; тестовые отрезки идут подряд и не пересекаются.
+    
+    Returns:
+        Список (начало обучения, начало теста, конец теста)
+    """
+    if train_size <= 0 or test_size <= 0:
+        raise ValueError("train_size и test_size должны быть положительными")
+    windows = []
+    for test_start in range(train_size, n, test_size):
+        windows.append((test_start - train_size, test_start, min(n, test_start + test_size)))
+    return windows
+
+
+def decide(probabilities: np.ndarray, classes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Векторный аналог model_inference._decide.
+    
+    Returns:
+        Направление (+1 BUY, -1 SELL, 0 HOLD) и уверенность по строкам
+    """
+    best = np.argmax(probabilities, axis=1)
+    confidence = probabilities[np.arange(len(best)), best]
+    predicted = classes[best]
+    direction = np.select([predicted == TARGET_BUY, predicted == TARGET_SELL], [1, -1], 0).astype(np.int8)
+    if len(classes) == 2:
+        weak = confidence < TWO_CLASS_MIN_CONFIDENCE
+        direction[weak] = 0
+        confidence = np.where(weak, 1.0 - confidence, confidence)
+    return direction, confidence
+
+
+def execute(direction: np.ndarray, confidence: np.ndarray) -> np.ndarray:
+    """Статусы исполнения по правилам ExecutionAgent: HOLD - SKIPPED, уверенность ниже MIN_CONFIDENCE - REJECTED."""
+    status = np.full(len(direction), STATUS_SKIPPED, dtype=np.int8)
+    trade = direction != 0
+    status[trade & (confidence < MIN_CONFIDENCE)] = STATUS_REJECTED
+    status[trade & (confidence >= MIN_CONFIDENCE)] = STATUS_FILLED
+    return status
+
+
+def simulate(
+    close: np.ndarray,
+    next_close: np.ndarray,
+    direction: np.ndarray,
+    status: np.ndarray,
+    long_only: bool = False
+) -> Dict[str, np.ndarray]:
+    """
+    Позиция и доходность по исполненным сигналам (без цикла по свечам).
+    
+    Исполненный BUY открывает длинную позицию на весь капитал, SELL -
+    короткую (при long_only закрывает позицию); SKIPPED и REJECTED позицию
+    не меняют. Сделка проходит на закрытии свечи с проскальзыванием
+    SLIPPAGE, позиция держится до закрытия следующей свечи. Отрезок
+    начинается без позиции, в конце позиция закрывается.
+    
+    Args:
+        close: Цены закрытия, на которых принимаются решения
+        next_close: Цены закрытия следующих свечей
+        direction: Направление сигналов (см. decide)
+        status: Статусы исполнения (см. execute)
+        long_only: Без коротких позиций
+        
+    Returns:
+        Словарь массивов: position, returns (доходность капитала за свечу),
+        execution_price и hits (исполненный сигнал угадал направление
+        следующей свечи с учетом проскальзывания)
+    """
+    n = len(close)
+    filled = status == STATUS_FILLED
+    target = np.where(direction > 0, 1.0, 0.0 if long_only else -1.0)
+    
+    # Позиция - цель последнего исполненного сигнала (протяжка вперед через накопленный максимум индексов)
+    last_filled = np.where(filled, np.arange(n), -1)
+    np.maximum.accumulate(last_filled, out=last_filled)
+    position = np.where(last_filled >= 0, target[np.maximum(last_filled, 0)], 0.0)
+    
+    previous = np.empty(n)
+    previous[:1] = 0.0
+    previous[1:] = position[:-1]
+    turnover = np.abs(position - previous)
+    if n:
+        turnover[-1] += abs(position[-1])
+    
+    returns = position * (next_close / close - 1.0) - turnover * SLIPPAGE
+    execution_price = np.where(filled, close * (1.0 + direction * SLIPPAGE), close)
+    hits = filled & (direction * (next_close - execution_price) > 0)
+    return {
+        "position": position,
+        "returns": returns,
+        "execution_price": execution_price,
+        "hits": hits
+    }
+
+
+def max_drawdown(returns: np.ndarray) -> float:
+    """Максимальная просадка кривой капитала (доля от пика, начальный капитал 1)."""
+    if len(returns) == 0:
+        return 0.0
+    equity = np.cumprod(1.0 + returns)
+    peak = np.maximum(np.maximum.accumulate(equity), 1.0)
+    return float(np.max(1.0 - equity / peak))
+
+
+def run_window(
+    candles: Candles,
+    train_start: int,
+    test_start: int,
+    test_end: int,
+    feature_columns: Sequence[str],
+    threshold_percent: float,
+    long_only: bool = False,
+    n_jobs: int = 1
+) -> Dict[str, Any]:
+    """
+    Обучить модель на candles[train_start:test_start] и проторговать candles[test_start:test_end].
+    
+    Модель обучается так же, как ModelLoader.train_model при запуске
+    приложения. Признаки тестового отрезка считаются вместе с CHUNK_WARMUP
+    свечами перед ним. Свеча test_end (если есть) нужна только как цена
+    закрытия последней позиции.
+    
+    Args:
+        n_jobs: Потоков sklearn-леса; в пуле процессов - 1, иначе окна
+            конкурируют за ядра (как в model_search)
+            
+    Returns:
+        Итоги окна и массив доходности по свечам (returns)
+    """
+    started = time.perf_counter()
+    model_loader = ModelLoader(
+        threshold_percent=threshold_percent,
+        feature_columns=feature_columns,
+        forest_params={"n_jobs": n_jobs}
+    )
+    model_loader.train_model_from_candles(candles.slice(train_start, test_start))
+    train_seconds = time.perf_counter() - started
+    
+    feature_start = max(0, test_start - CHUNK_WARMUP)
+    X = compute_feature_matrix(candles.slice(feature_start, test_end), model_loader.feature_columns)
+    X = X[test_start - feature_start:]
+    direction, confidence = decide(model_loader.predict_proba(X), model_loader.classes_)
+    status = execute(direction, confidence)
+    
+    close = np.asarray(candles.close[test_start:test_end], dtype=np.float64)
+    next_close = np.empty_like(close)
+    following = candles.close[test_start + 1:test_end + 1]
+    next_close[:len(following)] = following
+    # В конце истории следующей цены нет: последняя позиция закрывается по своей цене
+    next_close[len(following):] = close[-1]
+    
+    result = simulate(close, next_close, direction, status, long_only=long_only)
+    returns = result["returns"]
+    filled = int(np.sum(status == STATUS_FILLED))
+    position = result["position"]
+    return {
+        "train_start_time": int(candles.open_time[train_start]),
+        "test_start_time": int(candles.open_time[test_start]),
+        "test_end_time": int(candles.open_time[test_end - 1]),
+        "candles": len(close),
+        "test_accuracy": model_loader.metrics.get("test_accuracy"),
+        "total_return": float(np.prod(1.0 + returns) - 1.0),
+        "max_drawdown": max_drawdown(returns),
+        "filled": filled,
+        "rejected": int(np.sum(status == STATUS_REJECTED)),
+        "skipped": int(np.sum(status == STATUS_SKIPPED)),
+        "hits": int(np.sum(result["hits"])),
+        "hit_rate": float(np.sum(result["hits"]) / filled) if filled else None,
+        "trades": int(np.count_nonzero(np.diff(position, prepend=0.0))),
+        "exposure": float(np.mean(position != 0)),
+        "train_seconds": train_seconds,
+        "seconds": time.perf_counter() - started,
+        "returns": returns
+    }
+
+
+def _window_task(candles: Candles, window: Tuple[int, int, int]) -> Tuple[Candles, int, int, int]:
+    """Копия свечей, нужных окну (с разогревом признаков и следующей ценой), и смещения в ней."""
+    train_start, test_start, test_end = window
+    low = min(train_start, max(0, test_start - CHUNK_WARMUP))
+    high = min(len(candles), test_end + 1)
+    part = candles.slice(low, high)
+    # Копия, а не view на memmap: в процесс передаются только строки окна
+    copied = Candles(*(np.array(column) for column in (
+        part.open_time, part.open, part.high, part.low, part.close, part.volume
+    )))
+    return copied, train_start - low, test_start - low, test_end - low
+
+
+def _run_window_task(args: Tuple) -> Dict[str, Any]:
+    return run_window(*args)
+
+
+def run_backtest(
+    candles: Candles,
+    train_size: int,
+    test_size: int,
+    feature_columns: Optional[Sequence[str]] = None,
+    threshold_percent: Optional[float] = None,
+    long_only: bool = False,
+    capital: float = 10000.0,
+    workers: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Walk-forward бэктест стратегии: обучение, прогноз следующего отрезка, симуляция исполнения.
+    
+    Окна независимы и считаются в пуле процессов; доходности окон затем
+    склеиваются в одну кривую капитала.
+    
+    Args:
+        candles: История по возрастанию времени
+        train_size: Свечей обучения в окне
+        test_size: Свечей тестового отрезка в окне
+        feature_columns: Признаки модели (по умолчанию MODEL_FEATURES)
+        threshold_percent: Порог таргета (по умолчанию MODEL_THRESHOLD_PERCENT)
+        long_only: Без коротких позиций
+        capital: Начальный капитал для PnL
+        workers: Процессов в пуле (по умолчанию число CPU, 1 - без пула)
+        
+    Returns:
+        Итоги: pnl, total_return, max_drawdown, hit_rate, счетчики
+        FILLED/REJECTED/SKIPPED и итоги по окнам
+    """
+    windows = walk_forward_windows(len(candles), train_size, test_size)
+    if not windows:
+        raise ValueError(f"Недостаточно свечей для бэктеста: {len(candles)}, окно обучения {train_size}")
+    
+    # Признаки и порог фиксируются здесь, чтобы все окна обучались одинаково
+    reference = ModelLoader(threshold_percent=threshold_percent, feature_columns=feature_columns)
+    workers = workers or os.cpu_count() or 1
+    # Без пула лес обучается на всех ядрах, в пуле - в один поток на окно
+    serial = workers == 1 or len(windows) == 1
+    tasks = [
+        (
+            *_window_task(candles, window), reference.feature_columns, reference.threshold_percent, long_only,
+            -1 if serial else 1
+        )
+        for window in windows
+    ]
+    
+    started = time.perf_counter()
+    if serial:
+        results = [_run_window_task(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            results = list(pool.map(_run_window_task, tasks))
+    elapsed = time.perf_counter() - started
+    
+    returns = np.concatenate([result.pop("returns") for result in results])
+    total_return = float(np.prod(1.0 + returns) - 1.0)
+    filled = sum(result["filled"] for result in results)
+    hits = sum(result["hits"] for result in results)
+    summary = {
+        "candles": len(returns),
+        "windows": len(results),
+        "train_size": train_size,
+        "test_size": test_size,
+        "capital": capital,
+        "pnl": capital * total_return,
+        "total_return": total_return,
+        "max_drawdown": max_drawdown(returns),
+        "hit_rate": hits / filled if filled else None,
+        "filled": filled,
+        "rejected": sum(result["rejected"] for result in results),
+        "skipped": sum(result["skipped"] for result in results),
+        "trades": sum(result["trades"] for result in results),
+        "exposure": float(sum(result["exposure"] * result["candles"] for result in results) / len(returns)),
+        "seconds": elapsed,
+        "window_results": results
+    }
+    logger.info(
+        f"Бэктест: {summary['candles']} свечей, {summary['windows']} окон за {elapsed:.1f} с, "
+        f"доходность {total_return:.2%}, просадка {summary['max_drawdown']:.2%}"
+    )
+    return summary
+
+
+def backtest_from_store(
+    store: KlineStore,
+    symbol: str,
+    interval: str,
+    train_size: int,
+    test_size: int,
+    start_time: Optional[int] = None,
+    end_time: Optional[int] = None,
+    **kwargs
+) -> Dict[str, Any]:
+    """Бэктест на свечах из локального хранилища (параметры - как у run_backtest)."""
+    candles = read_candles(store, symbol, interval, start_time=start_time, end_time=end_time)
+    return run_backtest(candles, train_size, test_size, **kwargs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Walk-forward бэктест ML стратегии на свечах из локального хранилища")
+    parser.add_argument("symbol")
+    parser.add_argument("interval")
+    parser.add_argument("--train", type=int, default=500, help="свечей обучения в окне")
+    parser.add_argument("--test", type=int, default=5000, help="свечей тестового отрезка в окне")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--long-only", action="store_true")
+    parser.add_argument("--capital", type=float, default=10000.0)
+    parser.add_argument("--store", default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    # Обучение в каждом окне пишет в лог подробно
+    for name in ("app.ml.model_loader", "app.ml.compiled_forest"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    
+    report = backtest_from_store(
+        KlineStore(args.store),
+        args.symbol,
+        args.interval,
+        args.train,
+        args.test,
+        long_only=args.long_only,
+        capital=args.capital,
+        workers=args.workers
+    )
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,140 @@
+import random
+import threading
+from typing import Any, Callable, Dict, Optional, Sequence
+import numpy as np
+from app.ml.compiled_forest import CompiledForest
+
+# Границы уверенности, для которых при обучении считается кривая покрытия/согласия
+EVALUATION_BOUNDS = (0.5, 0.6, 0.7, 0.8, 0.9, 0.95)
+
+
+class CascadeStats:
+    """
+    Счетчики каскада: сколько строк решила первая ступень, сколько ушло в лес
+    и как часто ответ первой ступени совпадает с лесом.
+    
+    Совпадение измеряется на случайной доле (audit_rate) строк, решенных
+    первой ступенью: для них лес тоже считается, но ответ берется из первой
+    ступени. Счетчики потокобезопасны.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        with self._lock:
+            self.rows = 0
+            self.first_stage_hits = 0
+            self.escalations = 0
+            self.audited = 0
+            self.agreements = 0
+    
+    def record(self, first_stage_hits: int, escalations: int, audited: int, agreements: int):
+        with self._lock:
+            self.rows += first_stage_hits + escalations
+            self.first_stage_hits += first_stage_hits
+            self.escalations += escalations
+            self.audited += audited
+            self.agreements += agreements
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = max(self.rows, 1)
+            return {
+                "rows": self.rows,
+                "first_stage_hits": self.first_stage_hits,
+                "escalations": self.escalations,
+                "first_stage_hit_rate": self.first_stage_hits / rows,
+                "escalation_rate": self.escalations / rows,
+                "audited": self.audited,
+                "agreement_rate": self.agreements / self.audited if self.audited else None
+            }
+
+
+def cascade_predict_proba(
+    first_stage: CompiledForest,
+    full_predict_proba: Callable[[np.ndarray], np.ndarray],
+    X: np.ndarray,
+    confidence: float,
+    audit_rate: float = 0.0,
+    stats: Optional[CascadeStats] = None
+) -> np.ndarray:
+    """
+    Вероятности классов через каскад.
+    
+    Строки, где максимальная вероятность первой ступени не ниже confidence,
+    получают ответ первой ступени; остальные оцениваются полной моделью
+    одним вызовом.
+    
+    Args:
+        first_stage: Скомпилированная первая ступень (признаки не масштабируются)
+        full_predict_proba: Вероятности полной модели для немасштабированных признаков
+        X: Массив (n_rows, n_features)
+        confidence: Нижняя граница уверенности первой ступени
+        audit_rate: Доля решенных первой ступенью строк, которые для статистики
+            согласия дополнительно оцениваются полной моделью
+        stats: Счетчики каскада
+        
+    Returns:
+        Массив (n_rows, n_classes) в порядке классов полной модели
+    """
+    probabilities = first_stage.predict_proba(X)
+    confident = probabilities.max(axis=1) >= confidence
+    escalated = np.flatnonzero(~confident)
+    audited = np.array([
+        row for row in np.flatnonzero(confident) if audit_rate > 0 and random.random() < audit_rate
+    ], dtype=np.intp)
+    
+    agreements = 0
+    rows = np.concatenate([escalated, audited])
+    if len(rows):
+        full = full_predict_proba(X[rows])
+        probabilities[escalated] = full[:len(escalated)]
+        if len(audited):
+            agreements = int(np.sum(
+                np.argmax(full[len(escalated):], axis=1) == np.argmax(probabilities[audited], axis=1)
+            ))
+    
+    if stats is not None:
+        stats.record(
+            first_stage_hits=len(X) - len(escalated),
+            escalations=len(escalated),
+            audited=len(audited),
+            agreements=agreements
+        )
+    return probabilities
+
+
+def evaluate_cascade(
+    first_proba: np.ndarray,
+    full_proba: np.ndarray,
+    classes: np.ndarray,
+    y_true: np.ndarray,
+    bounds: Sequence[float] = EVALUATION_BOUNDS
+) -> Dict[str, Any]:
+    """
+    Оценить каскад на отложенной выборке для нескольких границ уверенности.
+    
+    Returns:
+        Точность полной модели и первой ступени и, для каждой границы, покрытие
+        первой ступени, ее согласие с полной моделью и точность каскада
+    """
+    first_pred = classes[np.argmax(first_proba, axis=1)]
+    full_pred = classes[np.argmax(full_proba, axis=1)]
+    first_confidence = first_proba.max(axis=1)
+    curve = []
+    for bound in bounds:
+        confident = first_confidence >= bound
+        cascade_pred = np.where(confident, first_pred, full_pred)
+        curve.append({
+            "confidence": bound,
+            "coverage": float(np.mean(confident)),
+            "agreement": float(np.mean(first_pred[confident] == full_pred[confident])) if confident.any() else None,
+            "accuracy": float(np.mean(cascade_pred == y_true))
+        })
+    return {
+        "full_accuracy": float(np.mean(full_pred == y_true)),
+        "first_stage_accuracy": float(np.mean(first_pred == y_true)),
+        "curve": curve
+    }
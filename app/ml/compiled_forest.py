@@ -0,0 +1,218 @@
+import logging
+from typing import Optional, Union
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeClassifier
+
+logger = logging.getLogger(__name__)
+
+TREE_LEAF = -1
+
+# Строк за один векторный обход: промежуточные массивы (строки x деревья)
+# остаются небольшими и на больших пакетах не растут
+PREDICT_BLOCK_ROWS = 1024
+
+
+def _fold_thresholds(
+    features: np.ndarray,
+    thresholds: np.ndarray,
+    mean: np.ndarray,
+    scale: np.ndarray
+) -> np.ndarray:
+    """
+    Перенести StandardScaler в пороги узлов.
+    
+    sklearn сравнивает float32((x - mean) / scale) <= threshold. Эта функция
+    монотонна по x, поэтому для каждого узла есть наибольшее x (double), при
+    котором условие выполняется; оно находится бисекцией рядом с
+    threshold * scale + mean. Сравнение x <= folded дает те же переходы,
+    что и sklearn, без масштабирования входа.
+    """
+    node_mean = mean[features]
+    node_scale = scale[features]
+    
+    def goes_left(x: np.ndarray) -> np.ndarray:
+        return ((x - node_mean) / node_scale).astype(np.float32) <= thresholds
+    
+    guess = thresholds * node_scale + node_mean
+    width = np.maximum(np.abs(guess), node_scale) * 1e-6 + 1e-300
+    lo = guess - width
+    hi = guess + width
+    # Расширяем интервал, пока lo не внутри условия, а hi - снаружи
+    for _ in range(64):
+        bad_lo = ~goes_left(lo)
+        bad_hi = goes_left(hi)
+        if not (bad_lo.any() or bad_hi.any()):
+            break
+        width = np.where(bad_lo | bad_hi, width * 4, width)
+        lo = np.where(bad_lo, guess - width, lo)
+        hi = np.where(bad_hi, guess + width, hi)
+    
+    for _ in range(2000):
+        active = np.nextafter(lo, np.inf) < hi
+        if not active.any():
+            break
+        mid = np.where(active, lo + (hi - lo) / 2, lo)
+        left = goes_left(mid)
+        lo = np.where(active & left, mid, lo)
+        hi = np.where(active & ~left, mid, hi)
+    return lo
+
+
+class CompiledForest:
+    """
+    Случайный лес в виде плоских массивов узлов для быстрого инференса.
+    
+    Узлы всех деревьев лежат в общих массивах (признак, порог, дети,
+    вероятности листа); обход выполняется одновременно для всех деревьев и
+    строк за max_depth векторных шагов. Листья ссылаются сами на себя, поэтому
+    обход не ветвится. StandardScaler перенесен в пороги, и на вход подаются
+    немасштабированные признаки.
+    """
+    
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        children: np.ndarray,
+        leaf_proba: np.ndarray,
+        roots: np.ndarray,
+        max_depth: int,
+        classes: np.ndarray
+    ):
+        self.feature = feature
+        self.threshold = threshold
+        # Пары (левый, правый) подряд: children[2 * node + 1] - правый ребенок
+        self.children = children
+        self.leaf_proba = leaf_proba
+        self.roots = roots
+        self.max_depth = max_depth
+        self.classes_ = classes
+    
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+    
+    @property
+    def left(self) -> np.ndarray:
+        return self.children[0::2]
+    
+    @property
+    def right(self) -> np.ndarray:
+        return self.children[1::2]
+    
+    @classmethod
+    def from_sklearn(
+        cls,
+        model: Union[RandomForestClassifier, DecisionTreeClassifier],
+        scaler: Optional[StandardScaler] = None
+    ) -> "CompiledForest":
+        """
+        Скомпилировать обученный RandomForestClassifier (и StandardScaler перед ним).
+        
+        Одиночное DecisionTreeClassifier компилируется как лес из одного дерева.
+        
+        Args:
+            model: Обученный лес или дерево
+            scaler: Масштабирование признаков, которое применялось при обучении
+            
+        Returns:
+            CompiledForest с теми же вероятностями, что model.predict_proba(scaler.transform(X))
+        """
+        n_features = model.n_features_in_
+        mean = np.zeros(n_features)
+        scale = np.ones(n_features)
+        if scaler is not None:
+            if scaler.mean_ is not None:
+                mean = np.asarray(scaler.mean_, dtype=np.float64)
+            if scaler.scale_ is not None:
+                scale = np.asarray(scaler.scale_, dtype=np.float64)
+        
+        features, thresholds, lefts, rights, probas, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in getattr(model, "estimators_", [model]):
+            tree = estimator.tree_
+            count = tree.node_count
+            is_leaf = tree.children_left == TREE_LEAF
+            own = np.arange(offset, offset + count)
+            
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, own, tree.children_left + offset))
+            rights.append(np.where(is_leaf, own, tree.children_right + offset))
+            
+            values = tree.value[:, 0, :].astype(np.float64)
+            normalizer = values.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            probas.append(values / normalizer)
+            
+            roots.append(offset)
+            offset += count
+            max_depth = max(max_depth, tree.max_depth)
+        
+        feature = np.concatenate(features).astype(np.intp)
+        threshold = np.concatenate(thresholds)
+        internal = np.isfinite(threshold)
+        threshold[internal] = _fold_thresholds(feature[internal], threshold[internal], mean, scale)
+        
+        compiled = cls(
+            feature=feature,
+            threshold=threshold,
+            children=np.column_stack([np.concatenate(lefts), np.concatenate(rights)]).ravel().astype(np.intp),
+            leaf_proba=np.concatenate(probas),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max_depth,
+            classes=model.classes_
+        )
+        logger.info(
+            f"Лес скомпилирован: {len(roots)} деревьев, {compiled.n_nodes} узлов, глубина {max_depth}"
+        )
+        return compiled
+    
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Индексы листьев для каждой строки и дерева, массив (n_rows, n_trees)."""
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        flat_X = X.ravel()
+        row_offsets = (np.arange(len(X)) * X.shape[1])[:, None]
+        nodes = np.repeat(self.roots[None, :], len(X), axis=0)
+        for _ in range(self.max_depth):
+            values = flat_X.take(row_offsets + self.feature.take(nodes))
+            # children хранит пары (левый, правый): индекс 2 * node + (x > threshold)
+            nodes = self.children.take(2 * nodes + (values > self.threshold.take(nodes)))
+        return nodes
+    
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """
+        Вероятности классов для немасштабированных признаков.
+        
+        Args:
+            X: Массив (n_rows, n_features)
+            
+        Returns:
+            Массив (n_rows, n_classes) в порядке classes_
+        """
+        if len(X) == 1 and len(self.roots) == 1:
+            return self._predict_proba_tree_row(X)
+        if len(X) <= PREDICT_BLOCK_ROWS:
+            return self.leaf_proba[self.apply(X)].sum(axis=1) / len(self.roots)
+        
+        probabilities = np.empty((len(X), self.leaf_proba.shape[1]))
+        for start in range(0, len(X), PREDICT_BLOCK_ROWS):
+            leaves = self.apply(X[start:start + PREDICT_BLOCK_ROWS])
+            probabilities[start:start + PREDICT_BLOCK_ROWS] = self.leaf_proba[leaves].sum(axis=1) / len(self.roots)
+        return probabilities
+    
+    def _predict_proba_tree_row(self, X: np.ndarray) -> np.ndarray:
+        # Одно дерево и одна строка (первая ступень каскада): скалярный обход
+        # дешевле векторных шагов, у которых велики накладные расходы на вызов
+        row = np.asarray(X, dtype=np.float64)[0]
+        children, feature, threshold = self.children, self.feature, self.threshold
+        node = self.roots[0]
+        for _ in range(self.max_depth):
+            node = children[2 * node + (row[feature[node]] > threshold[node])]
+        return self.leaf_proba[node][None, :].copy()
+    
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
@@ -0,0 +1,79 @@
+from typing import Dict, Sequence
+import numpy as np
+from app.ml.indicators import RSI_PERIOD, compute_indicators, latest_indicators, wilder_rsi_last
+from app.services.candles import Candles
+
+# Набор признаков модели по умолчанию (порядок важен)
+FEATURE_COLUMNS = ['sma_10', 'sma_50', 'rsi', 'price_change', 'volume']
+
+# Имена признаков в market_data["features"] для колонок модели, которые
+# называются иначе (остальные индикаторы попадают в фичи под своим именем)
+INFERENCE_KEYS = {
+    'sma_10': 'sma_10',
+    'sma_50': 'sma_50',
+    'rsi': 'rsi_14',
+    'price_change': 'price_change_1m',
+    'volume': 'volume',
+}
+
+FEATURE_DEFAULTS = {'rsi': 50.0}
+
+
+def compute_feature_matrix(candles: Candles, columns: Sequence[str] = FEATURE_COLUMNS) -> np.ndarray:
+    """
+    Посчитать матрицу признаков для всех свечей за один проход.
+    
+    Args:
+        candles: Свечи серии
+        columns: Набор признаков модели (имена из app.ml.indicators.INDICATORS)
+        
+    Returns:
+        Массив (N, len(columns)) в порядке columns
+    """
+    return compute_indicators(candles, columns)
+
+
+def compute_latest_features(candles: Candles) -> Dict[str, float]:
+    """
+    Посчитать признаки только для последней свечи (для инференса).
+    
+    Returns:
+        Словарь в формате market_data["features"]
+    """
+    close = candles.close
+    if len(close) == 0:
+        return {}
+    
+    last = float(close[-1])
+    prev = float(close[-2]) if len(close) > 1 else last
+    return {
+        'sma_10': float(close[-10:].mean()),
+        'sma_50': float(close[-50:].mean()),
+        'rsi_14': wilder_rsi_last(close, RSI_PERIOD),
+        'current_price': last,
+        'price_change_1m': (last - prev) / prev * 100,
+        'volume': float(candles.volume[-1]),
+    }
+
+
+def compute_extra_features(candles: Candles, columns: Sequence[str]) -> Dict[str, float]:
+    """
+    Посчитать для последней свечи индикаторы набора, которых нет среди базовых фич.
+    
+    Args:
+        candles: Окно последних свечей
+        columns: Набор признаков модели
+        
+    Returns:
+        Словарь {имя индикатора: значение}
+    """
+    extra = [column for column in columns if column not in INFERENCE_KEYS]
+    return latest_indicators(candles, extra)
+
+
+def feature_vector(features: Dict[str, float], columns: Sequence[str] = FEATURE_COLUMNS) -> np.ndarray:
+    """Собрать вектор признаков (1, len(columns)) из словаря фич."""
+    return np.array([[
+        features.get(INFERENCE_KEYS.get(column, column), FEATURE_DEFAULTS.get(column, 0.0))
+        for column in columns
+    ]])
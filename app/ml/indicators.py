@@ -0,0 +1,275 @@
+from typing import Callable, Dict, List, Optional, Sequence
+import numpy as np
+from scipy.signal import lfilter
+from app.services.candles import Candles
+
+RSI_PERIOD = 14
+
+
+def _window_sums(values: np.ndarray, window: int):
+    # Сдвиг на первое значение уменьшает ошибку округления в кумулятивной сумме
+    n = len(values)
+    base = values[0]
+    cumsum = np.empty(n + 1)
+    cumsum[0] = 0.0
+    np.cumsum(values - base, out=cumsum[1:])
+    sums = np.empty(n)
+    head = min(n, window)
+    sums[:head] = cumsum[1:head + 1]
+    if n > window:
+        np.subtract(cumsum[window + 1:], cumsum[1:n - window + 1], out=sums[head:])
+    counts = np.minimum(np.arange(1, n + 1, dtype=np.float64), window)
+    return base, sums, counts
+
+
+def rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """Скользящая сумма по последним window значениям (в начале ряда - по всем доступным)."""
+    if len(values) == 0:
+        return np.empty(0)
+    base, shifted_sums, counts = _window_sums(values, window)
+    return base * counts + shifted_sums
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Скользящее среднее с min_periods=1 (как rolling(window, min_periods=1).mean())."""
+    if len(values) == 0:
+        return np.empty(0)
+    base, shifted_sums, counts = _window_sums(values, window)
+    return base + shifted_sums / counts
+
+
+def rolling_std(values: np.ndarray, window: int) -> np.ndarray:
+    """Скользящее стандартное отклонение (ddof=0, min_periods=1)."""
+    if len(values) == 0:
+        return np.empty(0)
+    shifted = values - values[0]
+    mean = rolling_mean(shifted, window)
+    variance = rolling_mean(shifted * shifted, window) - mean * mean
+    return np.sqrt(np.maximum(variance, 0.0))
+
+
+def ema(values: np.ndarray, span: int) -> np.ndarray:
+    """EMA с alpha = 2 / (span + 1), начиная с первого значения (как ewm(adjust=False))."""
+    if len(values) == 0:
+        return np.empty(0)
+    alpha = 2.0 / (span + 1)
+    return lfilter([alpha], [1.0, alpha - 1.0], values, zi=[(1 - alpha) * values[0]])[0]
+
+
+def wilder_smooth(values: np.ndarray, period: int) -> np.ndarray:
+    """
+    Сглаживание Уайлдера (alpha = 1/period).
+    
+    Первые period значений - накопительное среднее, дальше рекурсия
+    avg = avg + (x - avg) / period.
+    """
+    n = len(values)
+    result = np.empty(n)
+    if n == 0:
+        return result
+    head = min(n, period)
+    result[:head] = np.cumsum(values[:head]) / np.arange(1, head + 1)
+    if n > period:
+        alpha = 1.0 / period
+        result[period:] = lfilter(
+            [alpha], [1.0, alpha - 1.0], values[period:], zi=[(1 - alpha) * result[period - 1]]
+        )[0]
+    return result
+
+
+def wilder_rsi(close: np.ndarray, period: int = RSI_PERIOD) -> np.ndarray:
+    """
+    RSI Уайлдера для каждой свечи.
+    
+    Первое значение - простое среднее за period изменений, дальше
+    экспоненциальное сглаживание с alpha = 1/period. Пока изменений меньше
+    period, RSI равен 50.
+    """
+    n = len(close)
+    rsi = np.full(n, 50.0)
+    if n <= period:
+        return rsi
+    
+    deltas = np.diff(close)
+    avg_gain = wilder_smooth(np.maximum(deltas, 0.0), period)[period - 1:]
+    avg_loss = wilder_smooth(np.maximum(-deltas, 0.0), period)[period - 1:]
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi[period:] = np.where(avg_loss == 0, 100.0, 100 - 100 / (1 + avg_gain / avg_loss))
+    return rsi
+
+
+def wilder_rsi_last(close: np.ndarray, period: int = RSI_PERIOD) -> float:
+    """
+    RSI Уайлдера только для последней свечи.
+    
+    Рекурсия сглаживания разворачивается в скалярное произведение с весами
+    alpha * (1 - alpha)^k, без расчета промежуточных значений.
+    """
+    n = len(close)
+    if n <= period:
+        return 50.0
+    
+    deltas = np.diff(close)
+    gains = np.maximum(deltas, 0.0)
+    losses = np.maximum(-deltas, 0.0)
+    
+    alpha = 1.0 / period
+    steps = n - 1 - period
+    decay = (1 - alpha) ** np.arange(steps - 1, -1, -1)
+    seed_weight = (1 - alpha) ** steps
+    avg_gain = seed_weight * gains[:period].mean() + alpha * decay.dot(gains[period:])
+    avg_loss = seed_weight * losses[:period].mean() + alpha * decay.dot(losses[period:])
+    
+    if avg_loss == 0:
+        return 100.0
+    return float(100 - 100 / (1 + avg_gain / avg_loss))
+
+
+def price_change(close: np.ndarray) -> np.ndarray:
+    """Изменение цены к предыдущей свече в процентах (0 для первой свечи)."""
+    change = np.zeros(len(close))
+    if len(close) > 1:
+        change[1:] = (close[1:] - close[:-1]) / close[:-1] * 100
+    return change
+
+
+class IndicatorContext:
+    """
+    Промежуточные ряды одного расчета (EMA, true range, изменения цены).
+    
+    Индикаторы из одного набора берут общие ряды из контекста, поэтому
+    каждый из них считается по свечам один раз.
+    """
+    
+    def __init__(self, candles: Candles):
+        self.candles = candles
+        self._cache: Dict[str, np.ndarray] = {}
+    
+    def get(self, key: str, compute: Callable[[], np.ndarray]) -> np.ndarray:
+        values = self._cache.get(key)
+        if values is None:
+            values = compute()
+            self._cache[key] = values
+        return values
+    
+    def ema(self, span: int) -> np.ndarray:
+        return self.get(f"ema_{span}", lambda: ema(self.candles.close, span))
+    
+    def macd(self) -> np.ndarray:
+        return self.get("macd", lambda: self.ema(12) - self.ema(26))
+    
+    def macd_signal(self) -> np.ndarray:
+        return self.get("macd_signal", lambda: ema(self.macd(), 9))
+    
+    def true_range(self) -> np.ndarray:
+        def compute() -> np.ndarray:
+            high, low, close = self.candles.high, self.candles.low, self.candles.close
+            tr = high - low
+            if len(close) > 1:
+                prev_close = close[:-1]
+                np.maximum(tr[1:], np.abs(high[1:] - prev_close), out=tr[1:])
+                np.maximum(tr[1:], np.abs(low[1:] - prev_close), out=tr[1:])
+            return tr
+        return self.get("true_range", compute)
+    
+    def signed_volume(self) -> np.ndarray:
+        def compute() -> np.ndarray:
+            signed = np.zeros(len(self.candles))
+            if len(signed) > 1:
+                np.multiply(np.sign(np.diff(self.candles.close)), self.candles.volume[1:], out=signed[1:])
+            return signed
+        return self.get("signed_volume", compute)
+
+
+def _bollinger_width(ctx: IndicatorContext, window: int = 20, num_std: float = 2.0) -> np.ndarray:
+    close = ctx.candles.close
+    middle = rolling_mean(close, window)
+    return 2 * num_std * rolling_std(close, window) / middle
+
+
+def _vwap(ctx: IndicatorContext, window: int = 20) -> np.ndarray:
+    candles = ctx.candles
+    typical = (candles.high + candles.low + candles.close) / 3
+    volume = rolling_sum(candles.volume, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vwap = rolling_sum(typical * candles.volume, window) / volume
+    return np.where(volume > 0, vwap, typical)
+
+
+# Реестр индикаторов: имя колонки -> расчет ряда по контексту.
+# VWAP и OBV считаются по скользящему окну, а не накопительно с начала
+# истории: иначе значение зависело бы от того, сколько свечей загружено,
+# и признаки обучения (вся история) расходились бы с инференсом (100 свечей).
+INDICATORS: Dict[str, Callable[[IndicatorContext], np.ndarray]] = {
+    'sma_10': lambda ctx: rolling_mean(ctx.candles.close, 10),
+    'sma_50': lambda ctx: rolling_mean(ctx.candles.close, 50),
+    'rsi': lambda ctx: wilder_rsi(ctx.candles.close, RSI_PERIOD),
+    'price_change': lambda ctx: price_change(ctx.candles.close),
+    'volume': lambda ctx: ctx.candles.volume,
+    'ema_12': lambda ctx: ctx.ema(12),
+    'ema_26': lambda ctx: ctx.ema(26),
+    'macd': lambda ctx: ctx.macd(),
+    'macd_signal': lambda ctx: ctx.macd_signal(),
+    'macd_hist': lambda ctx: ctx.macd() - ctx.macd_signal(),
+    'bb_width_20': _bollinger_width,
+    'atr_14': lambda ctx: wilder_smooth(ctx.true_range(), 14),
+    'vwap_20': _vwap,
+    'obv_20': lambda ctx: rolling_sum(ctx.signed_volume(), 20),
+}
+
+
+def validate_indicators(names: Sequence[str]) -> List[str]:
+    """
+    Проверить набор индикаторов.
+    
+    Raises:
+        ValueError: Если индикатор неизвестен
+    """
+    unknown = [name for name in names if name not in INDICATORS]
+    if unknown:
+        raise ValueError(f"Неизвестные индикаторы: {unknown}. Доступны: {list(INDICATORS)}")
+    return list(names)
+
+
+def compute_indicators(
+    candles: Candles,
+    names: Sequence[str],
+    out: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Посчитать набор индикаторов по всем свечам.
+    
+    Результат пишется в один заранее выделенный массив; общие промежуточные
+    ряды (EMA, true range) считаются один раз на весь набор.
+    
+    Args:
+        candles: Свечи серии
+        names: Имена индикаторов (ключи INDICATORS), задают порядок колонок
+        out: Готовый буфер (N, len(names)) для повторного использования
+        
+    Returns:
+        Массив (N, len(names)) в Fortran-порядке (колонки непрерывны)
+        
+    Raises:
+        ValueError: Если индикатор неизвестен или буфер не подходит по размеру
+    """
+    validate_indicators(names)
+    shape = (len(candles), len(names))
+    if out is None:
+        out = np.empty(shape, order='F')
+    elif out.shape != shape:
+        raise ValueError(f"Буфер размера {out.shape} не подходит, нужен {shape}")
+    
+    ctx = IndicatorContext(candles)
+    for column, name in enumerate(names):
+        out[:, column] = INDICATORS[name](ctx)
+    return out
+
+
+def latest_indicators(candles: Candles, names: Sequence[str]) -> Dict[str, float]:
+    """Значения индикаторов для последней свечи (по переданному окну свечей)."""
+    if len(candles) == 0 or not names:
+        return {}
+    ctx = IndicatorContext(candles)
+    return {name: float(INDICATORS[name](ctx)[-1]) for name in validate_indicators(names)}
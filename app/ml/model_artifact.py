@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import struct
+from pathlib import Path
+from typing import Any, Dict, Tuple
+import numpy as np
+from app.ml.compiled_forest import CompiledForest
+
+# Формат файла:
+#   MAGIC (8 байт) | длина заголовка (uint64 LE) | JSON-заголовок | массивы
+# Каждый массив лежит без сжатия с выравниванием ALIGNMENT байт, поэтому
+# читается как view поверх np.memmap без копирования. Заголовок хранит версию
+# схемы, dtype/shape/смещение массивов, метаданные модели и sha256 области данных.
+#
+# Схема 2 хранит несколько именованных лесов ("model" и, например, первую
+# ступень каскада "first_stage"); в схеме 1 был только один лес "model".
+MAGIC = b"PMFOREST"
+SCHEMA_VERSION = 2
+SUPPORTED_SCHEMA_VERSIONS = (1, 2)
+ALIGNMENT = 64
+_PREFIX = struct.Struct("<8sQ")
+
+# Массивы CompiledForest и их типы на диске (int64 совпадает с intp на 64-бит платформах)
+FOREST_ARRAYS = {
+    "feature": "<i8",
+    "threshold": "<f8",
+    "children": "<i8",
+    "leaf_proba": "<f8",
+    "roots": "<i8",
+    "classes": "<i8",
+}
+
+
+class ArtifactError(ValueError):
+    """Файл не является артефактом модели или поврежден."""
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def is_artifact(path: str) -> bool:
+    """Проверить, записан ли файл в формате массивов (а не pickle)."""
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def _forest_arrays(compiled: CompiledForest) -> Dict[str, np.ndarray]:
+    return {
+        "feature": compiled.feature,
+        "threshold": compiled.threshold,
+        "children": compiled.children,
+        "leaf_proba": compiled.leaf_proba,
+        "roots": compiled.roots,
+        "classes": compiled.classes_,
+    }
+
+
+def save_artifact(path: str, forests: Dict[str, CompiledForest], metadata: Dict[str, Any]):
+    """
+    Сохранить скомпилированные леса и метаданные модели.
+    
+    Args:
+        path: Путь к файлу артефакта
+        forests: Скомпилированные леса по именам (основная модель - "model")
+        metadata: JSON-сериализуемые метаданные (набор признаков, окно обучения, метрики)
+    """
+    forests_layout = {}
+    buffers = []
+    offset = 0
+    for forest_name, compiled in forests.items():
+        arrays = _forest_arrays(compiled)
+        layout = {}
+        for name, dtype in FOREST_ARRAYS.items():
+            data = np.ascontiguousarray(arrays[name], dtype=dtype)
+            offset = _aligned(offset)
+            layout[name] = {"dtype": dtype, "shape": list(data.shape), "offset": offset}
+            buffers.append((offset, data))
+            offset += data.nbytes
+        forests_layout[forest_name] = {"max_depth": int(compiled.max_depth), "arrays": layout}
+    data_size = _aligned(offset)
+    
+    data_section = bytearray(data_size)
+    for start, data in buffers:
+        data_section[start:start + data.nbytes] = data.tobytes()
+    
+    header = json.dumps({
+        "schema_version": SCHEMA_VERSION,
+        "forests": forests_layout,
+        "data_size": data_size,
+        "sha256": hashlib.sha256(data_section).hexdigest(),
+        "metadata": metadata
+    }).encode()
+    # Данные начинаются с выровненного смещения: заголовок дополняется пробелами
+    data_start = _aligned(_PREFIX.size + len(header))
+    header += b" " * (data_start - _PREFIX.size - len(header))
+    
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, len(header)))
+        f.write(header)
+        f.write(data_section)
+
+
+def load_artifact(
+    path: str,
+    mmap: bool = True,
+    verify: bool = True
+) -> Tuple[Dict[str, CompiledForest], Dict[str, Any]]:
+    """
+    Загрузить скомпилированные леса из артефакта.
+    
+    Pickle не используется: из файла читаются только JSON и числовые буферы.
+    
+    Args:
+        path: Путь к файлу артефакта
+        mmap: Отобразить файл в память (страницы общие для всех процессов,
+            открывших тот же файл); иначе файл читается целиком
+        verify: Проверить sha256 области данных
+        
+    Returns:
+        Кортеж (леса по именам, метаданные модели); основная модель - "model"
+        
+    Raises:
+        ArtifactError: Неизвестный формат, версия схемы или несовпадение контрольной суммы
+    """
+    with open(path, "rb") as f:
+        prefix = f.read(_PREFIX.size)
+        if len(prefix) < _PREFIX.size:
+            raise ArtifactError(f"{path}: файл слишком короткий")
+        magic, header_size = _PREFIX.unpack(prefix)
+        if magic != MAGIC:
+            raise ArtifactError(f"{path}: не артефакт модели")
+        try:
+            header = json.loads(f.read(header_size))
+        except ValueError as e:
+            raise ArtifactError(f"{path}: поврежден заголовок ({e})")
+    
+    if header.get("schema_version") not in SUPPORTED_SCHEMA_VERSIONS:
+        raise ArtifactError(
+            f"{path}: версия схемы {header.get('schema_version')} не поддерживается "
+            f"(поддерживаются {SUPPORTED_SCHEMA_VERSIONS})"
+        )
+    if header["schema_version"] == 1:
+        header["forests"] = {"model": {"max_depth": header["max_depth"], "arrays": header["arrays"]}}
+    
+    data_start = _PREFIX.size + header_size
+    data_size = header["data_size"]
+    if os.path.getsize(path) < data_start + data_size:
+        raise ArtifactError(f"{path}: файл обрезан")
+    if mmap:
+        data = np.memmap(path, dtype=np.uint8, mode="r", offset=data_start, shape=(data_size,))
+    else:
+        with open(path, "rb") as f:
+            f.seek(data_start)
+            data = np.frombuffer(f.read(data_size), dtype=np.uint8)
+    
+    if verify and hashlib.sha256(data).hexdigest() != header["sha256"]:
+        raise ArtifactError(f"{path}: контрольная сумма не совпадает")
+    
+    forests = {}
+    for forest_name, spec in header["forests"].items():
+        arrays = {}
+        for name, dtype in FOREST_ARRAYS.items():
+            array_spec = spec["arrays"][name]
+            if array_spec["dtype"] != dtype:
+                raise ArtifactError(f"{path}: неожиданный тип массива {forest_name}.{name}: {array_spec['dtype']}")
+            arrays[name] = np.ndarray(
+                tuple(array_spec["shape"]), dtype=np.dtype(dtype), buffer=data, offset=array_spec["offset"]
+            )
+        forests[forest_name] = CompiledForest(
+            feature=arrays["feature"],
+            threshold=arrays["threshold"],
+            children=arrays["children"],
+            leaf_proba=arrays["leaf_proba"],
+            roots=arrays["roots"],
+            max_depth=spec["max_depth"],
+            classes=arrays["classes"]
+        )
+    if "model" not in forests:
+        raise ArtifactError(f"{path}: в артефакте нет основной модели")
+    return forests, header["metadata"]
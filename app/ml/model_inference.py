@@ -1,16 +1,127 @@
 import logging
 import numpy as np
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
+from app.config import settings
+from app.ml.cascade import CascadeStats, cascade_predict_proba
+from app.ml.features import feature_vector
 from app.ml.model_loader import ModelLoader
+from app.ml.prediction_cache import PredictionCache
 
 logger = logging.getLogger(__name__)
 
 _model_loader: ModelLoader = None
 
+_prediction_cache: Optional[PredictionCache] = None
+if settings.PREDICTION_CACHE_ENABLED:
+    _prediction_cache = PredictionCache(
+        max_entries=settings.PREDICTION_CACHE_MAX_ENTRIES,
+        ttl=settings.PREDICTION_CACHE_TTL,
+        significant_digits=settings.PREDICTION_CACHE_SIGNIFICANT_DIGITS,
+        default_significant_digits=settings.PREDICTION_CACHE_DEFAULT_SIGNIFICANT_DIGITS
+    )
+
+_cascade_stats = CascadeStats()
+
 
 def initialize_model(model_loader: ModelLoader):
+    """
+    Сделать загрузчик текущей моделью инференса.
+    
+    Замена - одно присваивание ссылки, поэтому атомарна: уже начатые
+    предсказания дорабатывают на прежнем загрузчике.
+    """
     global _model_loader
     _model_loader = model_loader
+    if _prediction_cache is not None:
+        _prediction_cache.invalidate()
+    _cascade_stats.reset()
+    if settings.CASCADE_ENABLED and model_loader.first_stage_compiled is None:
+        logger.warning("Каскад включен, но у модели нет первой ступени: все предсказания делает лес")
+
+
+def is_model_ready() -> bool:
+    """Есть ли модель, готовая к инференсу."""
+    model_loader = _model_loader
+    return model_loader is not None and model_loader.is_ready
+
+
+def get_model_loader() -> Optional[ModelLoader]:
+    """Загрузчик, который сейчас обслуживает инференс (None, если модели нет)."""
+    return _model_loader
+
+
+def get_prediction_cache_stats() -> Optional[Dict[str, Any]]:
+    """Статистика кэша предсказаний (None, если кэш выключен)."""
+    return _prediction_cache.get_stats() if _prediction_cache is not None else None
+
+
+def get_cascade_stats() -> Dict[str, Any]:
+    """Доли ответов первой ступени и леса и согласие первой ступени с лесом."""
+    model_loader = _model_loader
+    return {
+        "enabled": settings.CASCADE_ENABLED,
+        "active": _cascade_active(model_loader),
+        "confidence": settings.CASCADE_CONFIDENCE,
+        **_cascade_stats.get_stats()
+    }
+
+
+def _cascade_active(model_loader: Optional[ModelLoader]) -> bool:
+    return (
+        settings.CASCADE_ENABLED
+        and model_loader is not None
+        and model_loader.first_stage_compiled is not None
+    )
+
+
+def get_feature_columns() -> List[str]:
+    """Набор признаков текущей модели (или набор из настроек, если модели нет)."""
+    if _model_loader is None:
+        return list(settings.MODEL_FEATURES)
+    return _model_loader.feature_columns
+
+
+ACTION_MAP = {0: "BUY", 1: "SELL", 2: "HOLD"}
+
+
+def _decide(prediction: Any, probabilities: np.ndarray, model_classes: np.ndarray) -> Tuple[str, float]:
+    """Перевести класс модели и вероятности в действие и уверенность."""
+    pred_idx = np.where(model_classes == prediction)[0]
+    pred_confidence = float(probabilities[pred_idx[0]]) if len(pred_idx) > 0 else 0.5
+    
+    if len(model_classes) == 2:
+        if pred_confidence < 0.6:
+            return "HOLD", 1.0 - pred_confidence
+        if prediction in ACTION_MAP:
+            return ACTION_MAP[prediction], pred_confidence
+        return "HOLD", 0.5
+    
+    if prediction not in ACTION_MAP:
+        logger.warning(f"Модель предсказала неизвестный класс: {prediction}. Используем HOLD.")
+        return "HOLD", pred_confidence
+    return ACTION_MAP[prediction], pred_confidence
+
+
+def _build_reason(features: Dict[str, float]) -> str:
+    reason_parts = []
+    if features.get('sma_10', 0) > features.get('sma_50', 0):
+        reason_parts.append("Price above SMA_50")
+    else:
+        reason_parts.append("Price below SMA_50")
+    
+    rsi = features.get('rsi_14', 50)
+    if rsi > 70:
+        reason_parts.append("RSI overbought")
+    elif rsi < 30:
+        reason_parts.append("RSI oversold")
+    
+    price_change = features.get('price_change_1m', 0)
+    if price_change > 0:
+        reason_parts.append("positive trend")
+    else:
+        reason_parts.append("negative trend")
+    
+    return ", ".join(reason_parts) if reason_parts else "No clear signal"
 
 
 def predict_action(features: Dict[str, float]) -> Dict[str, Any]:
@@ -18,7 +129,7 @@ def predict_action(features: Dict[str, float]) -> Dict[str, Any]:
     Предсказать действие на основе фичей.
     
     Args:
-        features: Словарь с фичами (sma_10, sma_50, rsi_14, price_change_1m, current_price)
+        features: Словарь с фичами (sma_10, sma_50, rsi_14, price_change_1m, volume)
         
     Returns:
         Словарь с предсказанием:
@@ -28,111 +139,108 @@ def predict_action(features: Dict[str, float]) -> Dict[str, Any]:
             "reason": str
         }
     """
-    global _model_loader
+    return predict_actions({"": features})[""]
+
+
+def predict_actions(features_by_symbol: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Предсказать действия для многих символов за один проход модели.
+    
+    Все векторы признаков масштабируются одним вызовом scaler.transform и
+    оцениваются одним вызовом predict_proba (или одним обходом
+    скомпилированного леса); класс берется как argmax вероятностей (так же
+    его выбирает RandomForestClassifier.predict). Если включен каскад, лес
+    оценивает только строки, в которых не уверена первая ступень.
+    
+    Args:
+        features_by_symbol: Словарь {символ: фичи в формате predict_action}
+        
+    Returns:
+        Словарь {символ: предсказание в формате predict_action}
+    """
+    # Один снимок загрузчика на весь вызов: замена модели во время
+    # предсказания не смешивает версии
+    model_loader = _model_loader
     
-    if _model_loader is None or _model_loader.model is None:
+    if model_loader is None or not model_loader.is_ready:
         logger.warning("Модель не инициализирована, возвращаем HOLD")
         return {
-            "action": "HOLD",
-            "confidence": 0.5,
-            "reason": "Model not initialized"
+            symbol: {
+                "action": "HOLD",
+                "confidence": 0.5,
+                "reason": "Model not initialized"
+            }
+            for symbol in features_by_symbol
         }
     
+    if not features_by_symbol:
+        return {}
+    
     try:
-        feature_order = ['sma_10', 'sma_50', 'rsi', 'price_change', 'volume']
-        
-        feature_array = []
-        for feat_name in feature_order:
-            if feat_name == 'price_change':
-                value = features.get('price_change_1m', 0.0)
-            elif feat_name == 'rsi':
-                value = features.get('rsi_14', 50.0)
-            elif feat_name == 'volume':
-                value = features.get('volume', 1000000.0)
-            else:
-                value = features.get(feat_name, 0.0)
-            feature_array.append(value)
-        
-        X = np.array([feature_array])
+        symbols = list(features_by_symbol)
+        columns = model_loader.feature_columns
+        X = np.vstack([feature_vector(features_by_symbol[symbol], columns) for symbol in symbols])
         
-        X_scaled = _model_loader.scaler.transform(X)
+        decisions: Dict[str, Tuple[str, float]] = {}
+        keys = {}
+        if _prediction_cache is not None:
+            for row, symbol in enumerate(symbols):
+                keys[symbol] = _prediction_cache.make_key(model_loader.version, columns, X[row])
+                cached = _prediction_cache.get(keys[symbol])
+                if cached is not None:
+                    decisions[symbol] = cached
         
-        prediction = _model_loader.model.predict(X_scaled)[0]
-        probabilities = _model_loader.model.predict_proba(X_scaled)[0]
-        
-        model_classes = _model_loader.model.classes_
-        
-        action_map = {0: "BUY", 1: "SELL", 2: "HOLD"}
-        
-        if len(model_classes) == 2:
-            logger.warning("Модель имеет только 2 класса. Используем правило на основе уверенности для HOLD.")
-            pred_idx = np.where(model_classes == prediction)[0]
-            if len(pred_idx) > 0:
-                pred_confidence = float(probabilities[pred_idx[0]])
+        missing = [row for row, symbol in enumerate(symbols) if symbol not in decisions]
+        if missing:
+            X_missing = X[missing]
+            if _cascade_active(model_loader):
+                probabilities = cascade_predict_proba(
+                    model_loader.first_stage_compiled,
+                    model_loader.predict_proba,
+                    X_missing,
+                    confidence=settings.CASCADE_CONFIDENCE,
+                    audit_rate=settings.CASCADE_AUDIT_RATE,
+                    stats=_cascade_stats
+                )
             else:
-                pred_confidence = 0.5
+                probabilities = model_loader.predict_proba(X_missing)
             
-            if pred_confidence < 0.6:
-                action = "HOLD"
-                confidence = 1.0 - pred_confidence
-            else:
-                if prediction in action_map:
-                    action = action_map[prediction]
-                    confidence = pred_confidence
-                else:
-                    action = "HOLD"
-                    confidence = 0.5
-        else:
-            if prediction not in action_map:
-                logger.warning(f"Модель предсказала неизвестный класс: {prediction}. Используем HOLD.")
-                action = "HOLD"
-                pred_idx = np.where(model_classes == prediction)[0]
-                if len(pred_idx) > 0:
-                    confidence = float(probabilities[pred_idx[0]])
-                else:
-                    confidence = 0.5
-            else:
-                action = action_map[prediction]
-                pred_idx = np.where(model_classes == prediction)[0]
-                if len(pred_idx) > 0:
-                    confidence = float(probabilities[pred_idx[0]])
-                else:
-                    confidence = 0.5
-        
-        reason_parts = []
-        if features.get('sma_10', 0) > features.get('sma_50', 0):
-            reason_parts.append("Price above SMA_50")
-        else:
-            reason_parts.append("Price below SMA_50")
+            model_classes = model_loader.classes_
+            predictions = model_classes[np.argmax(probabilities, axis=1)]
+            if len(model_classes) == 2:
+                logger.warning("Модель имеет только 2 класса. Используем правило на основе уверенности для HOLD.")
+            
+            for index, row in enumerate(missing):
+                symbol = symbols[row]
+                decisions[symbol] = _decide(predictions[index], probabilities[index], model_classes)
+                if _prediction_cache is not None:
+                    _prediction_cache.put(keys[symbol], decisions[symbol])
         
-        rsi = features.get('rsi_14', 50)
-        if rsi > 70:
-            reason_parts.append("RSI overbought")
-        elif rsi < 30:
-            reason_parts.append("RSI oversold")
+        results = {}
+        for symbol in symbols:
+            action, confidence = decisions[symbol]
+            results[symbol] = {
+                "action": action,
+                "confidence": confidence,
+                "reason": _build_reason(features_by_symbol[symbol])
+            }
         
-        price_change = features.get('price_change_1m', 0)
-        if price_change > 0:
-            reason_parts.append("positive trend")
+        if len(symbols) == 1:
+            logger.info(f"Предсказание: {action} (confidence: {confidence:.2f})")
         else:
-            reason_parts.append("negative trend")
-        
-        reason = ", ".join(reason_parts) if reason_parts else "No clear signal"
-        
-        result = {
-            "action": action,
-            "confidence": confidence,
-            "reason": reason
-        }
-        
-        logger.info(f"Предсказание: {action} (confidence: {confidence:.2f})")
-        return result
+            logger.info(
+                f"Предсказания для {len(symbols)} символов: {len(missing)} за один проход модели, "
+                f"{len(symbols) - len(missing)} из кэша"
+            )
+        return results
         
     except Exception as e:
         logger.error(f"Ошибка при предсказании: {e}")
         return {
-            "action": "HOLD",
-            "confidence": 0.5,
-            "reason": f"Prediction error: {str(e)}"
+            symbol: {
+                "action": "HOLD",
+                "confidence": 0.5,
+                "reason": f"Prediction error: {str(e)}"
+            }
+            for symbol in features_by_symbol
         }
-
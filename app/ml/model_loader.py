@@ -1,91 +1,111 @@
+import copy
 import logging
 import pickle
+import tempfile
+import uuid
+import warnings
 import pandas as pd
 import numpy as np
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.tree._tree import NODE_DTYPE
 from app.config import settings
+from app.ml.cascade import evaluate_cascade
+from app.ml.compiled_forest import TREE_LEAF, CompiledForest
+from app.ml.model_artifact import is_artifact, load_artifact, save_artifact
+from app.ml.features import FEATURE_COLUMNS, compute_feature_matrix
+from app.ml.indicators import price_change, validate_indicators
+from app.ml.training_data import TARGET_HOLD, build_training_arrays, create_targets, rebalance_targets
+from app.services.candles import Candles
+from app.services.kline_aggregator import read_candles
+from app.services.kline_store import KlineStore
 
 logger = logging.getLogger(__name__)
 
+# Колонки, по которым строятся таргеты (считаются, даже если модель их не использует)
+TARGET_COLUMNS = ['sma_10', 'price_change']
+
+# Параметры RandomForestClassifier, не зависящие от настроек
+FOREST_DEFAULTS = {
+    'random_state': 42,
+    'n_jobs': -1,
+    'class_weight': 'balanced'
+}
+
+# С этого размера пакета sklearn-лес (Cython) быстрее скомпилированного
+# (NumPy-обход выигрывает на задержке одиночных строк)
+SKLEARN_BATCH_ROWS = 1000
+
+# Свечей разогрева индикаторов перед окном инкрементального обновления
+# (SMA 50; вклад начала ряда в EMA 26 и RSI Уайлдера затухает до < 1e-6)
+UPDATE_WARMUP = 200
+UPDATE_MIN_ROWS = 20
+
+# Оценка байт на узел дерева: структура узла sklearn и узел скомпилированного
+# леса (признак, порог, два потомка); вероятности листьев считаются отдельно
+NODE_BYTES = NODE_DTYPE.itemsize + 32
+
 
 class ModelLoader:
     
-    def __init__(self, threshold_percent: float = None):
+    def __init__(
+        self,
+        threshold_percent: float = None,
+        feature_columns: Optional[Sequence[str]] = None,
+        forest_params: Optional[Dict[str, Any]] = None
+    ):
         self.threshold_percent = threshold_percent or settings.MODEL_THRESHOLD_PERCENT
+        self.feature_columns: List[str] = validate_indicators(feature_columns or settings.MODEL_FEATURES)
+        # Параметры леса поверх MODEL_N_ESTIMATORS/MODEL_MAX_DEPTH (например, из поиска гиперпараметров)
+        self.forest_params: Dict[str, Any] = {
+            'n_estimators': settings.MODEL_N_ESTIMATORS,
+            'max_depth': settings.MODEL_MAX_DEPTH,
+            **(forest_params or {})
+        }
+        self.compile_forest = settings.MODEL_COMPILE_FOREST
         self.model: Optional[RandomForestClassifier] = None
         self.scaler: Optional[StandardScaler] = None
+        self.compiled: Optional[CompiledForest] = None
+        # Первая ступень каскада: неглубокое дерево на тех же признаках
+        self.first_stage: Optional[DecisionTreeClassifier] = None
+        self.first_stage_compiled: Optional[CompiledForest] = None
+        self.version: Optional[str] = None
+        self.training_window: Dict[str, Any] = {}
+        self.metrics: Dict[str, Any] = {}
     
     def _prepare_features(self, klines: list) -> pd.DataFrame:
         if not klines:
             return pd.DataFrame()
         
-        df = pd.DataFrame(klines, columns=[
-            'open_time', 'open', 'high', 'low', 'close', 'volume',
-            'close_time', 'quote_volume', 'trades', 'taker_buy_base',
-            'taker_buy_quote', 'ignore'
-        ])
-        
-        numeric_cols = ['open', 'high', 'low', 'close', 'volume']
-        for col in numeric_cols:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-        
-        df['sma_10'] = df['close'].rolling(window=10, min_periods=1).mean()
-        df['sma_50'] = df['close'].rolling(window=50, min_periods=1).mean()
-        
-        delta = df['close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14, min_periods=1).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14, min_periods=1).mean()
-        rs = gain / loss.replace(0, np.inf)
-        df['rsi'] = 100 - (100 / (1 + rs))
-        
-        df['price_change'] = df['close'].pct_change() * 100
+        return self._prepare_features_from_candles(Candles.from_klines(klines))
+    
+    def _prepare_features_from_candles(self, candles: Candles) -> pd.DataFrame:
+        if len(candles) == 0:
+            return pd.DataFrame()
         
-        feature_cols = ['sma_10', 'sma_50', 'rsi', 'price_change', 'volume']
-        features_df = df[feature_cols].fillna(0)
+        columns = self.feature_columns + [c for c in TARGET_COLUMNS if c not in self.feature_columns]
+        features_df = pd.DataFrame(compute_feature_matrix(candles, columns), columns=columns)
         
         return features_df
     
     def _create_targets(self, features_df: pd.DataFrame) -> np.ndarray:
-        targets = []
-        
-        hold_threshold = self.threshold_percent * 0.5
-        
-        for i in range(len(features_df) - 1):
-            current_price = features_df.iloc[i]['sma_10']
-            next_price = features_df.iloc[i + 1]['sma_10']
-            
-            if current_price == 0:
-                targets.append(2)
-                continue
-            
-            price_change_pct = ((next_price - current_price) / current_price) * 100
-            
-            if price_change_pct > self.threshold_percent:
-                targets.append(0)
-            elif price_change_pct < -self.threshold_percent:
-                targets.append(1)
-            else:
-                targets.append(2)
-        
-        targets.append(2)
-        
+        targets = create_targets(features_df['sma_10'].to_numpy(), self.threshold_percent)
+        return self._rebalance(targets, lambda: features_df['price_change'].to_numpy())
+    
+    def _rebalance(self, targets: np.ndarray, price_changes: Callable[[], np.ndarray]) -> np.ndarray:
         unique, counts = np.unique(targets, return_counts=True)
         class_distribution = dict(zip(unique, counts))
         logger.info(f"Распределение классов в таргетах: {class_distribution}")
         
         if len(class_distribution) < 3:
             logger.warning("Не все классы представлены в таргетах. Выполняем перебалансировку.")
-            price_changes = features_df['price_change'].abs().values
-            hold_indices = np.argsort(price_changes)[:max(1, len(price_changes) // 5)]
-            for idx in hold_indices:
-                if idx < len(targets):
-                    targets[idx] = 2
+            rebalance_targets(targets, price_changes())
         
-        return np.array(targets)
+        return targets
     
     def train_model(self, klines: list) -> Tuple[RandomForestClassifier, StandardScaler]:
         """
@@ -99,45 +119,125 @@ class ModelLoader:
         """
         logger.info("Начало обучения модели...")
         
-        features_df = self._prepare_features(klines)
+        if klines:
+            self.training_window = {
+                "start_time": int(klines[0][0]),
+                "end_time": int(klines[-1][0]),
+                "candles": len(klines)
+            }
+        return self._train_on_candles(Candles.from_klines(klines))
+    
+    def train_model_from_store(
+        self,
+        store: KlineStore,
+        symbol: str,
+        interval: str,
+        start_time: Optional[int] = None,
+        end_time: Optional[int] = None
+    ) -> Tuple[RandomForestClassifier, StandardScaler]:
+        """
+        Обучить модель на свечах из локального хранилища (без запросов к Binance).
+        
+        Интервалы 5m/15m/1h/4h, которых нет в хранилище, собираются из минутной истории.
+        
+        Args:
+            store: Хранилище исторических свечей
+            symbol: Торговая пара
+            interval: Интервал
+            start_time: Начало окна обучения (мс)
+            end_time: Конец окна обучения (мс)
+            
+        Returns:
+            Кортеж (модель, scaler)
+        """
+        candles = read_candles(store, symbol, interval, start_time=start_time, end_time=end_time)
+        logger.info(f"Обучение модели на {len(candles)} свечах из хранилища ({symbol} {interval})")
+        return self.train_model_from_candles(candles)
+    
+    def train_model_from_candles(self, candles: Candles) -> Tuple[RandomForestClassifier, StandardScaler]:
+        """
+        Обучить модель на готовых свечах (так же, как train_model).
         
-        if len(features_df) < 20:
+        Args:
+            candles: Свечи по возрастанию времени
+            
+        Returns:
+            Кортеж (модель, scaler)
+        """
+        if len(candles) > 0:
+            self.training_window = {
+                "start_time": int(candles.open_time[0]),
+                "end_time": int(candles.open_time[-1]),
+                "candles": len(candles)
+            }
+        return self._train_on_candles(candles)
+    
+    def _train_on_candles(self, candles: Candles) -> Tuple[RandomForestClassifier, StandardScaler]:
+        if len(candles) < 20:
             logger.warning("Недостаточно данных для обучения, используем простую модель")
             self.model = RandomForestClassifier(n_estimators=10, random_state=42)
             self.scaler = StandardScaler()
-            X_synthetic = np.random.randn(60, 5)
+            X_synthetic = np.random.randn(60, len(self.feature_columns))
             y_synthetic = np.array([0] * 20 + [1] * 20 + [2] * 20)
             X_scaled = self.scaler.fit_transform(X_synthetic)
             self.model.fit(X_scaled, y_synthetic)
+            self.first_stage = None
             logger.info(f"Синтетическая модель обучена на классах: {self.model.classes_}")
+            self.metrics = {"synthetic": True}
+            self._on_model_ready()
             return self.model, self.scaler
         
-        targets = self._create_targets(features_df)
+        if settings.TRAINING_SCRATCH_PATH and len(candles) > settings.TRAINING_CHUNK_SIZE:
+            # X/y большой истории пишутся на диск и читаются через np.memmap
+            Path(settings.TRAINING_SCRATCH_PATH).mkdir(parents=True, exist_ok=True)
+            with tempfile.TemporaryDirectory(dir=settings.TRAINING_SCRATCH_PATH) as scratch:
+                return self._train_on_arrays(candles, scratch)
+        return self._train_on_arrays(candles, None)
+    
+    def _train_on_arrays(self, candles: Candles, scratch: Optional[str]) -> Tuple[RandomForestClassifier, StandardScaler]:
+        X, targets = build_training_arrays(
+            candles,
+            self.feature_columns,
+            self.threshold_percent,
+            chunk_size=settings.TRAINING_CHUNK_SIZE,
+            out_dir=scratch
+        )
+        return self.train_model_from_arrays(X, targets, candles.close)
+    
+    def train_model_from_arrays(
+        self,
+        X: np.ndarray,
+        targets: np.ndarray,
+        close: np.ndarray
+    ) -> Tuple[RandomForestClassifier, StandardScaler]:
+        """
+        Обучить модель на готовой матрице признаков и таргетах.
+        
+        Args:
+            X: Признаки (n_rows, len(feature_columns))
+            targets: Таргеты (см. training_data.create_targets); изменяются на месте
+            close: Цены закрытия тех же свечей (для перебалансировки таргетов)
+            
+        Returns:
+            Кортеж (модель, scaler)
+        """
+        price_changes = lambda: price_change(np.asarray(close, dtype=np.float64))
+        targets = self._rebalance(targets, price_changes)
         
         unique_classes = np.unique(targets)
         logger.info(f"Найдены классы в данных: {unique_classes}")
         
         if len(unique_classes) < 3:
             logger.warning(f"Недостаточно классов в данных. Найдено: {unique_classes}. Добавляем примеры HOLD.")
-            hold_indices = []
-            for i in range(min(10, len(features_df))):
-                if abs(features_df.iloc[i]['price_change']) < 0.1:
-                    hold_indices.append(i)
-            
-            if len(hold_indices) == 0:
-                for i in range(max(0, len(features_df) - 5), len(features_df)):
-                    if i < len(targets):
-                        targets[i] = 2
+            if not np.any(np.abs(price_changes()[:10]) < 0.1):
+                targets[-5:] = TARGET_HOLD
         
-        feature_cols = ['sma_10', 'sma_50', 'rsi', 'price_change', 'volume']
-        X = features_df[feature_cols].values
         y = targets
         
         unique_y = np.unique(y)
         if len(unique_y) < 3:
             logger.warning(f"Все еще недостаточно классов: {unique_y}. Принудительно добавляем HOLD.")
-            for i in range(max(0, len(y) - 3), len(y)):
-                y[i] = 2
+            y[-3:] = TARGET_HOLD
         
         if len(X) > 10:
             X_train, X_test, y_train, y_test = train_test_split(
@@ -151,14 +251,9 @@ class ModelLoader:
         X_train_scaled = self.scaler.fit_transform(X_train)
         X_test_scaled = self.scaler.transform(X_test) if len(X_test) > 0 else X_train_scaled
         
-        self.model = RandomForestClassifier(
-            n_estimators=50,
-            max_depth=10,
-            random_state=42,
-            n_jobs=-1,
-            class_weight='balanced'
-        )
+        self.model = RandomForestClassifier(**{**FOREST_DEFAULTS, **self.forest_params})
         self.model.fit(X_train_scaled, y_train)
+        y_fit = y_train
         
         model_classes = self.model.classes_
         logger.info(f"Модель обучена на классах: {model_classes}")
@@ -173,23 +268,281 @@ class ModelLoader:
             if 2 not in y_train_balanced:
                 y_train_balanced[-1] = 2
             self.model.fit(X_train_scaled, y_train_balanced)
+            y_fit = y_train_balanced
             model_classes = self.model.classes_
             logger.info(f"Переобучена модель на классах: {model_classes}")
         
         if len(X_test) > 0:
             score = self.model.score(X_test_scaled, y_test)
             logger.info(f"Точность модели на тестовой выборке: {score:.2f}")
+            self.metrics = {
+                "test_accuracy": float(score),
+                "train_samples": len(X_train),
+                "test_samples": len(X_test)
+            }
         
+        self._train_first_stage(X_train_scaled, y_fit, X_test_scaled, y_test)
         logger.info("Модель обучена успешно")
+        self._on_model_ready()
+        return self.model, self.scaler
+    
+    def _train_first_stage(
+        self,
+        X_train_scaled: np.ndarray,
+        y_train: np.ndarray,
+        X_test_scaled: np.ndarray,
+        y_test: np.ndarray
+    ):
+        """
+        Обучить первую ступень каскада на той же выборке, что и лес.
+        
+        На тестовой выборке считаются покрытие первой ступени, ее согласие с
+        лесом и точность каскада для нескольких границ уверенности
+        (metrics["cascade"]).
+        """
+        self.first_stage = None
+        if settings.CASCADE_MAX_DEPTH <= 0:
+            return
+        
+        first_stage = DecisionTreeClassifier(
+            max_depth=settings.CASCADE_MAX_DEPTH,
+            random_state=42,
+            class_weight='balanced'
+        )
+        first_stage.fit(X_train_scaled, y_train)
+        if not np.array_equal(first_stage.classes_, self.model.classes_):
+            logger.warning("Классы первой ступени не совпадают с лесом, каскад недоступен")
+            return
+        self.first_stage = first_stage
+        
+        if len(X_test_scaled) > 0:
+            cascade_metrics = evaluate_cascade(
+                first_stage.predict_proba(X_test_scaled),
+                self.model.predict_proba(X_test_scaled),
+                self.model.classes_,
+                np.asarray(y_test)
+            )
+            self.metrics["cascade"] = cascade_metrics
+            at_bound = [p for p in cascade_metrics["curve"] if p["confidence"] >= settings.CASCADE_CONFIDENCE]
+            if at_bound:
+                logger.info(
+                    f"Первая ступень каскада (глубина {settings.CASCADE_MAX_DEPTH}): при уверенности "
+                    f">= {at_bound[0]['confidence']} покрытие {at_bound[0]['coverage']:.2f}, "
+                    f"точность каскада {at_bound[0]['accuracy']:.2f} (лес {cascade_metrics['full_accuracy']:.2f})"
+                )
+    
+    def update_model(self, klines: list) -> Tuple[RandomForestClassifier, StandardScaler]:
+        """
+        Инкрементально обновить модель на свежих свечах Binance.
+        
+        Args:
+            klines: Последние закрытые свечи (см. update_model_from_candles)
+            
+        Returns:
+            Кортеж (модель, scaler)
+        """
+        return self.update_model_from_candles(Candles.from_klines(klines))
+    
+    def update_model_from_candles(
+        self,
+        candles: Candles,
+        n_trees: Optional[int] = None
+    ) -> Tuple[RandomForestClassifier, StandardScaler]:
+        """
+        Дообучить лес на последних свечах вместо полного переобучения.
+        
+        Scaler дообучается (partial_fit, накопленные среднее и дисперсия)
+        только на свечах новее training_window["end_time"]; пороги уже
+        обученных деревьев пересчитываются под новые mean/scale, поэтому их
+        решения не меняются. Затем warm_start добавляет n_trees деревьев,
+        обученных на последних MODEL_UPDATE_WINDOW свечах, а самые старые
+        деревья удаляются, пока в лесу больше MODEL_MAX_TREES деревьев или
+        он занимает больше MODEL_MAX_MEMORY_MB.
+        
+        Args:
+            candles: Последние закрытые свечи по возрастанию времени, вместе с
+                UPDATE_WARMUP свечами разогрева индикаторов перед окном
+            n_trees: Сколько деревьев добавить (по умолчанию MODEL_UPDATE_TREES)
+            
+        Returns:
+            Кортеж (модель, scaler)
+            
+        Raises:
+            ValueError: Если нет sklearn-модели (загружена из артефакта с
+                массивами), свечей слишком мало или среди них нет новых
+        """
+        if self.model is None or self.scaler is None:
+            raise ValueError("Модель загружена из артефакта с массивами и не может дообучаться")
+        n_trees = n_trees or settings.MODEL_UPDATE_TREES
+        
+        # Последняя свеча без таргета (следующей еще нет), первые - разогрев индикаторов
+        n = len(candles)
+        start = max(UPDATE_WARMUP, n - 1 - settings.MODEL_UPDATE_WINDOW)
+        end = n - 1
+        if end - start < UPDATE_MIN_ROWS:
+            raise ValueError(f"Недостаточно свечей для обновления модели: {n}")
+        
+        X, targets = build_training_arrays(candles, self.feature_columns, self.threshold_percent)
+        X, y = X[start:end], targets[start:end]
+        open_time = candles.open_time[start:end]
+        last_seen = self.training_window.get("end_time")
+        new = open_time > last_seen if last_seen is not None else np.ones(len(y), dtype=bool)
+        if not np.any(new):
+            raise ValueError(f"Нет свечей новее {last_seen}, обновлять модель нечем")
+        
+        # Точность текущего леса на свечах, которых он еще не видел
+        prequential_accuracy = float(self.model.score(self.scaler.transform(X[new]), y[new]))
+        
+        y = self._rebalance(np.copy(y), lambda: price_change(np.asarray(candles.close, dtype=np.float64))[start:end])
+        # Новые деревья должны знать все классы леса, иначе их вероятности не сложить
+        for position, cls in enumerate(np.setdiff1d(self.model.classes_, y)):
+            y[len(y) - 1 - position] = cls
+        
+        mean, scale = self.scaler.mean_.copy(), self.scaler.scale_.copy()
+        self.scaler.partial_fit(X[new])
+        estimators = list(self.model.estimators_)
+        if self.first_stage is not None:
+            estimators.append(self.first_stage)
+        for estimator in estimators:
+            _rescale_thresholds(estimator, mean, scale, self.scaler.mean_, self.scaler.scale_)
+        
+        self.model.set_params(warm_start=True, n_estimators=len(self.model.estimators_) + n_trees)
+        with warnings.catch_warnings():
+            # class_weight='balanced' считается по окну обновления - так и задумано
+            warnings.simplefilter("ignore", UserWarning)
+            self.model.fit(self.scaler.transform(X), y)
+        self.model.set_params(warm_start=False)
+        retired, nbytes = self._retire_trees(keep=n_trees)
+        
+        self.training_window = {
+            **self.training_window,
+            "end_time": int(open_time[-1]),
+            "candles": self.training_window.get("candles", 0) + int(np.sum(new))
+        }
+        incremental = self.metrics.get("incremental", {})
+        self.metrics["incremental"] = {
+            "updates": incremental.get("updates", 0) + 1,
+            "trees": len(self.model.estimators_),
+            "trees_added": incremental.get("trees_added", 0) + n_trees,
+            "trees_retired": incremental.get("trees_retired", 0) + retired,
+            "memory_mb": round(nbytes / 2**20, 3),
+            "window_rows": len(y),
+            "new_candles": int(np.sum(new)),
+            "prequential_accuracy": prequential_accuracy
+        }
+        logger.info(
+            f"Модель обновлена на {int(np.sum(new))} новых свечах: +{n_trees} деревьев, "
+            f"удалено {retired}, в лесу {len(self.model.estimators_)} ({nbytes / 2**20:.1f} МБ), "
+            f"точность до обновления {prequential_accuracy:.2f}"
+        )
+        self._on_model_ready()
         return self.model, self.scaler
     
-    def load_model(self, model_path: str) -> Tuple[RandomForestClassifier, StandardScaler]:
-        """Загрузить сохраненную модель."""
+    def _retire_trees(self, keep: int) -> Tuple[int, int]:
+        """
+        Удалить самые старые деревья сверх MODEL_MAX_TREES и MODEL_MAX_MEMORY_MB.
+        
+        Последние keep деревьев не удаляются никогда.
+        
+        Returns:
+            Кортеж (удалено деревьев, оценка памяти оставшегося леса в байтах)
+        """
+        estimators = self.model.estimators_
+        sizes = [_tree_nbytes(estimator) for estimator in estimators]
+        max_bytes = settings.MODEL_MAX_MEMORY_MB * 2**20
+        nbytes = sum(sizes)
+        retired = 0
+        while (
+            len(estimators) - retired > keep
+            and (len(estimators) - retired > settings.MODEL_MAX_TREES or nbytes > max_bytes)
+        ):
+            nbytes -= sizes[retired]
+            retired += 1
+        del estimators[:retired]
+        self.model.n_estimators = len(estimators)
+        return retired, nbytes
+    
+    @property
+    def is_ready(self) -> bool:
+        """Есть ли модель для инференса (sklearn или скомпилированный лес)."""
+        return self.model is not None or self.compiled is not None
+    
+    @property
+    def classes_(self) -> np.ndarray:
+        """Классы модели."""
+        if self.model is not None:
+            return self.model.classes_
+        if self.compiled is not None:
+            return self.compiled.classes_
+        raise ValueError("Модель не обучена")
+    
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """
+        Вероятности классов для немасштабированных признаков.
+        
+        Скомпилированный лес учитывает scaler в порогах, поэтому используется
+        без transform; sklearn-модель (после scaler) - если скомпилированного
+        леса нет или пакет не меньше SKLEARN_BATCH_ROWS строк.
+        
+        Args:
+            X: Массив (n_rows, len(feature_columns))
+            
+        Returns:
+            Массив (n_rows, n_classes) в порядке classes_
+        """
+        if self.compiled is not None and (self.model is None or len(X) < SKLEARN_BATCH_ROWS):
+            return self.compiled.predict_proba(X)
+        if self.model is None:
+            raise ValueError("Модель не обучена")
+        return self.model.predict_proba(self.scaler.transform(X))
+    
+    def load_model(self, model_path: str) -> Tuple[Optional[RandomForestClassifier], Optional[StandardScaler]]:
+        """
+        Загрузить сохраненную модель.
+        
+        Формат определяется по содержимому файла. Артефакт с массивами
+        загружается без pickle и отображается в память; в нем хранится только
+        скомпилированный лес, поэтому model и scaler остаются None. Файл
+        pickle загружается только при MODEL_ALLOW_PICKLE: pickle.load
+        выполняет код из файла.
+        
+        Raises:
+            ValueError: Если файл не артефакт с массивами, а pickle запрещен
+        """
         logger.info(f"Загрузка модели из {model_path}")
+        if is_artifact(model_path):
+            forests, metadata = load_artifact(
+                model_path,
+                mmap=settings.MODEL_ARTIFACT_MMAP,
+                verify=settings.MODEL_ARTIFACT_VERIFY
+            )
+            self.compiled = forests["model"]
+            self.first_stage_compiled = forests.get("first_stage")
+            self.model = None
+            self.scaler = None
+            self.first_stage = None
+            self.feature_columns = validate_indicators(metadata.get('feature_columns', FEATURE_COLUMNS))
+            self.training_window = metadata.get('training_window', {})
+            self.metrics = metadata.get('metrics', {})
+            self.forest_params = metadata.get('forest_params', self.forest_params)
+            self.version = uuid.uuid4().hex[:12]
+            logger.info(f"Артефакт модели загружен: {len(self.compiled.roots)} деревьев, {self.compiled.n_nodes} узлов")
+            return self.model, self.scaler
+        
+        if not settings.MODEL_ALLOW_PICKLE:
+            raise ValueError(
+                f"{model_path} не является артефактом модели, а загрузка pickle отключена (MODEL_ALLOW_PICKLE)"
+            )
         with open(model_path, 'rb') as f:
             data = pickle.load(f)
             self.model = data['model']
             self.scaler = data['scaler']
+            # Модели без сохраненного набора признаков обучены на базовом наборе
+            self.feature_columns = validate_indicators(data.get('feature_columns', FEATURE_COLUMNS))
+            self.training_window = data.get('training_window', {})
+            self.metrics = data.get('metrics', {})
+            self.forest_params = data.get('forest_params', self.forest_params)
+            self.first_stage = data.get('first_stage')
         
         # Проверяем количество классов в загруженной модели
         model_classes = self.model.classes_
@@ -199,21 +552,130 @@ class ModelLoader:
             logger.warning(f"Загруженная модель имеет только {len(model_classes)} классов. Рекомендуется переобучить модель.")
         
         logger.info("Модель загружена успешно")
+        self._on_model_ready()
         return self.model, self.scaler
     
-    def save_model(self, model_path: str):
-        """Сохранить модель."""
-        if self.model is None or self.scaler is None:
+    def _on_model_ready(self):
+        """
+        Подготовить новую модель к инференсу.
+        
+        Модели назначается новая версия (ключ кэша предсказаний), лес
+        компилируется в плоские массивы, если это включено в настройках.
+        """
+        self.version = uuid.uuid4().hex[:12]
+        self.compiled = None
+        if self.compile_forest:
+            self.compiled = CompiledForest.from_sklearn(self.model, self.scaler)
+        # Первая ступень всегда работает в скомпилированном виде: она маленькая
+        self.first_stage_compiled = None
+        if self.first_stage is not None:
+            self.first_stage_compiled = CompiledForest.from_sklearn(self.first_stage, self.scaler)
+    
+    def save_model(self, model_path: str, artifact_format: Optional[str] = None):
+        """
+        Сохранить модель.
+        
+        Args:
+            model_path: Путь к файлу
+            artifact_format: "arrays" (скомпилированный лес в виде буферов NumPy)
+                или "pickle"; по умолчанию MODEL_ARTIFACT_FORMAT
+        """
+        artifact_format = artifact_format or settings.MODEL_ARTIFACT_FORMAT
+        if artifact_format not in ("arrays", "pickle"):
+            raise ValueError(f"Неизвестный формат артефакта: {artifact_format}")
+        if not self.is_ready:
             raise ValueError("Модель не обучена")
         
-        logger.info(f"Сохранение модели в {model_path}")
+        logger.info(f"Сохранение модели в {model_path} (формат {artifact_format})")
         Path(model_path).parent.mkdir(parents=True, exist_ok=True)
         
-        with open(model_path, 'wb') as f:
-            pickle.dump({
-                'model': self.model,
-                'scaler': self.scaler
-            }, f)
+        if artifact_format == "arrays":
+            forests = {"model": self.compiled or CompiledForest.from_sklearn(self.model, self.scaler)}
+            if self.first_stage_compiled is not None:
+                forests["first_stage"] = self.first_stage_compiled
+            save_artifact(model_path, forests, {
+                'feature_columns': self.feature_columns,
+                'training_window': self.training_window,
+                'metrics': self.metrics,
+                'forest_params': self.forest_params
+            })
+        else:
+            if self.model is None or self.scaler is None:
+                raise ValueError("Модель загружена из артефакта с массивами и не может быть сохранена в pickle")
+            if not settings.MODEL_ALLOW_PICKLE:
+                logger.warning(f"Модель сохраняется в pickle: загрузить {model_path} можно только при MODEL_ALLOW_PICKLE=true")
+            with open(model_path, 'wb') as f:
+                pickle.dump({
+                    'model': self.model,
+                    'scaler': self.scaler,
+                    'feature_columns': self.feature_columns,
+                    'training_window': self.training_window,
+                    'metrics': self.metrics,
+                    'forest_params': self.forest_params,
+                    'first_stage': self.first_stage
+                }, f)
         
         logger.info("Модель сохранена успешно")
 
+
+def _rescale_thresholds(
+    estimator: DecisionTreeClassifier,
+    old_mean: np.ndarray,
+    old_scale: np.ndarray,
+    new_mean: np.ndarray,
+    new_scale: np.ndarray
+):
+    """Перевести пороги дерева из старого масштаба признаков в новый (на месте)."""
+    tree = estimator.tree_
+    internal = tree.children_left != TREE_LEAF
+    feature = tree.feature[internal]
+    threshold = tree.threshold
+    raw = threshold[internal] * old_scale[feature] + old_mean[feature]
+    threshold[internal] = (raw - new_mean[feature]) / new_scale[feature]
+
+
+def _tree_nbytes(estimator: DecisionTreeClassifier) -> int:
+    """Оценка памяти дерева вместе с его копией в скомпилированном лесе."""
+    tree = estimator.tree_
+    return tree.node_count * NODE_BYTES + 2 * tree.value.nbytes
+
+
+def train_loader(model_loader: ModelLoader, klines: list) -> ModelLoader:
+    """
+    Обучить модель и вернуть загрузчик (для запуска в пуле процессов).
+    
+    В дочернем процессе обучается копия загрузчика, поэтому результат
+    возвращается целиком, а не через изменение аргумента.
+    """
+    model_loader.train_model(klines)
+    return model_loader
+
+
+def train_loader_from_store(
+    model_loader: ModelLoader,
+    store: KlineStore,
+    symbol: str,
+    interval: str,
+    start_time: Optional[int] = None,
+    end_time: Optional[int] = None
+) -> ModelLoader:
+    """Обучить модель на локальной истории и вернуть загрузчик (для пула процессов)."""
+    model_loader.train_model_from_store(store, symbol, interval, start_time=start_time, end_time=end_time)
+    return model_loader
+
+
+def update_loader(model_loader: ModelLoader, candles: Candles) -> ModelLoader:
+    """
+    Инкрементально обновить копию загрузчика и вернуть ее (для пула обучения).
+    
+    Дообучается копия, поэтому загрузчик, который обслуживает инференс, не
+    меняется и при запуске в пуле потоков.
+    """
+    updated = copy.copy(model_loader)
+    updated.model = copy.deepcopy(model_loader.model)
+    updated.scaler = copy.deepcopy(model_loader.scaler)
+    updated.first_stage = copy.deepcopy(model_loader.first_stage)
+    updated.training_window = dict(model_loader.training_window)
+    updated.metrics = copy.deepcopy(model_loader.metrics)
+    updated.update_model_from_candles(candles)
+    return updated
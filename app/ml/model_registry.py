@@ -0,0 +1,277 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from app.ml.model_inference import initialize_model
+from app.ml.model_loader import ModelLoader
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_FILE = "model.bin"
+# Имя артефакта у версий, в метаданных которых оно не записано
+LEGACY_ARTIFACT_FILE = "model.pkl"
+METADATA_FILE = "metadata.json"
+ACTIVE_FILE = "ACTIVE"
+
+
+class ModelRegistry:
+    """
+    Каталог версий модели с заменой без рестарта.
+    
+    Каждая версия - каталог <root>/<version>/ с артефактом ModelLoader и
+    metadata.json (окно обучения, набор признаков, метрики). Файл
+    <root>/ACTIVE хранит активную версию. Каталоги версий и ACTIVE пишутся
+    через временный путь и os.replace, поэтому читатель (в том числе другой
+    процесс) не видит их наполовину записанными.
+    
+    Последние max_resident версий остаются загруженными в памяти: откат на
+    них - замена ссылки без чтения с диска.
+    """
+    
+    def __init__(self, root: str, max_resident: int = 3):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_resident = max(1, max_resident)
+        self._resident: "OrderedDict[str, ModelLoader]" = OrderedDict()
+        self._resident_lock = threading.Lock()
+        self._activate_lock = asyncio.Lock()
+        self.active: Optional[str] = None
+        self._history: List[str] = []
+        self.disk_loads = 0
+        self.resident_hits = 0
+        self.swaps = 0
+        self.last_swap_ms: Optional[float] = None
+    
+    @staticmethod
+    def new_version() -> str:
+        """Имя новой версии: время UTC и случайный суффикс (сортируется по времени)."""
+        return f"{datetime.now(timezone.utc):%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+    
+    def register(self, model_loader: ModelLoader, metadata: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Сохранить обученную модель как новую версию.
+        
+        Args:
+            model_loader: Загрузчик с обученной моделью
+            metadata: Дополнительные поля метаданных (например, символ и интервал обучения)
+            
+        Returns:
+            Имя версии
+        """
+        version = self.new_version()
+        staging = self.root / f".{version}.tmp"
+        staging.mkdir(parents=True)
+        try:
+            model_loader.save_model(str(staging / ARTIFACT_FILE))
+            record = {
+                "version": version,
+                "artifact": ARTIFACT_FILE,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "feature_columns": list(model_loader.feature_columns),
+                "threshold_percent": model_loader.threshold_percent,
+                "forest_params": model_loader.forest_params,
+                "training_window": model_loader.training_window,
+                "metrics": model_loader.metrics,
+                "classes": [int(c) for c in model_loader.classes_],
+                **(metadata or {})
+            }
+            with open(staging / METADATA_FILE, "w") as f:
+                json.dump(record, f, indent=2)
+            os.replace(staging, self.root / version)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        
+        model_loader.version = version
+        self._keep_resident(version, model_loader)
+        logger.info(f"Модель зарегистрирована как версия {version}")
+        return version
+    
+    def list_versions(self) -> List[Dict[str, Any]]:
+        """Метаданные всех версий, от старых к новым."""
+        versions = []
+        for path in sorted(self.root.iterdir()):
+            if path.is_dir() and not path.name.startswith(".") and (path / METADATA_FILE).exists():
+                versions.append(self.metadata(path.name))
+        return versions
+    
+    def metadata(self, version: str) -> Dict[str, Any]:
+        """
+        Метаданные версии.
+        
+        Raises:
+            FileNotFoundError: Если версии нет в реестре
+        """
+        with open(self._version_dir(version) / METADATA_FILE) as f:
+            return json.load(f)
+    
+    def load(self, version: str) -> ModelLoader:
+        """
+        Загрузчик версии: из памяти или с диска (блокирующий вызов).
+        
+        Raises:
+            FileNotFoundError: Если версии нет в реестре
+        """
+        with self._resident_lock:
+            model_loader = self._resident.get(version)
+            if model_loader is not None:
+                self._resident.move_to_end(version)
+                self.resident_hits += 1
+                return model_loader
+        
+        version_dir = self._version_dir(version)
+        if not (version_dir / METADATA_FILE).exists():
+            raise FileNotFoundError(f"Версия модели {version} не найдена в реестре")
+        artifact = version_dir / self.metadata(version).get("artifact", LEGACY_ARTIFACT_FILE)
+        if not artifact.exists():
+            raise FileNotFoundError(f"Версия модели {version} не найдена в реестре")
+        model_loader = ModelLoader()
+        model_loader.load_model(str(artifact))
+        model_loader.version = version
+        self.disk_loads += 1
+        self._keep_resident(version, model_loader)
+        return model_loader
+    
+    def _keep_resident(self, version: str, model_loader: ModelLoader):
+        with self._resident_lock:
+            self._resident[version] = model_loader
+            self._resident.move_to_end(version)
+            while len(self._resident) > self.max_resident:
+                evicted, _ = self._resident.popitem(last=False)
+                logger.info(f"Версия модели {evicted} выгружена из памяти")
+    
+    def _version_dir(self, version: str) -> Path:
+        path = self.root / version
+        # Имя версии приходит из API: не выпускаем его за пределы реестра
+        if path.parent != self.root or version.startswith("."):
+            raise FileNotFoundError(f"Версия модели {version} не найдена в реестре")
+        return path
+    
+    def read_active(self) -> Optional[str]:
+        """Активная версия по файлу ACTIVE (None, если ее еще нет)."""
+        try:
+            version = (self.root / ACTIVE_FILE).read_text().strip()
+        except FileNotFoundError:
+            return None
+        return version or None
+    
+    def _write_active(self, version: str):
+        staging = self.root / f".{ACTIVE_FILE}.tmp"
+        staging.write_text(version)
+        os.replace(staging, self.root / ACTIVE_FILE)
+    
+    def promote(self, version: str):
+        """
+        Записать версию в ACTIVE, не загружая ее.
+        
+        Для внешних инструментов: работающее приложение подхватит версию
+        через watch.
+        
+        Raises:
+            FileNotFoundError: Версии нет в реестре
+        """
+        self.metadata(version)
+        self._write_active(version)
+        logger.info(f"Версия {version} записана в {ACTIVE_FILE}")
+    
+    async def activate(self, version: str) -> Dict[str, Any]:
+        """
+        Сделать версию активной.
+        
+        Версия загружается в фоновом потоке (если ее нет в памяти), затем
+        подменяется в model_inference одной заменой ссылки. Предсказания,
+        начатые до замены, завершаются на прежней версии.
+        
+        Returns:
+            Словарь с новой и предыдущей версией и временем замены
+            
+        Raises:
+            FileNotFoundError: Если версии нет в реестре
+        """
+        async with self._activate_lock:
+            return await self._activate_locked(version)
+    
+    async def rollback(self) -> Dict[str, Any]:
+        """
+        Вернуть версию, активную до текущей.
+        
+        Raises:
+            ValueError: Если предыдущей версии нет
+        """
+        async with self._activate_lock:
+            if len(self._history) < 2:
+                raise ValueError("Нет предыдущей версии модели для отката")
+            result = await self._activate_locked(self._history[-2], record=False)
+            self._history.pop()
+            return result
+    
+    async def _activate_locked(self, version: str, record: bool = True) -> Dict[str, Any]:
+        started = time.perf_counter()
+        with self._resident_lock:
+            resident = version in self._resident
+        if resident:
+            model_loader = self.load(version)
+        else:
+            model_loader = await asyncio.to_thread(self.load, version)
+        
+        initialize_model(model_loader)
+        previous, self.active = self.active, version
+        if record and (not self._history or self._history[-1] != version):
+            self._history.append(version)
+        self._write_active(version)
+        
+        self.swaps += 1
+        self.last_swap_ms = (time.perf_counter() - started) * 1000
+        logger.info(
+            f"Активна версия модели {version} (была {previous}), "
+            f"{'из памяти' if resident else 'загружена с диска'} за {self.last_swap_ms:.1f} мс"
+        )
+        return {
+            "version": version,
+            "previous": previous,
+            "resident": resident,
+            "swap_ms": round(self.last_swap_ms, 3)
+        }
+    
+    async def watch(self, interval: float):
+        """
+        Следить за файлом ACTIVE и активировать версию, записанную в него извне.
+        
+        Args:
+            interval: Период проверки в секундах
+        """
+        failed_version = None
+        while True:
+            await asyncio.sleep(interval)
+            version = None
+            try:
+                version = await asyncio.to_thread(self.read_active)
+                if version is not None and version not in (self.active, failed_version):
+                    logger.info(f"Файл {ACTIVE_FILE} указывает на версию {version}, переключаем модель")
+                    await self.activate(version)
+            except Exception as e:
+                # Повторяем только после новой записи в ACTIVE
+                failed_version = version
+                logger.error(f"Ошибка при переключении модели из файла {ACTIVE_FILE}: {e}")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика реестра."""
+        with self._resident_lock:
+            resident = list(self._resident)
+        return {
+            "active": self.active,
+            "resident": resident,
+            "history": list(self._history),
+            "disk_loads": self.disk_loads,
+            "resident_hits": self.resident_hits,
+            "swaps": self.swaps,
+            "last_swap_ms": round(self.last_swap_ms, 3) if self.last_swap_ms is not None else None
+        }
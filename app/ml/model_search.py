@@ -0,0 +1,405 @@
+import argparse
+import itertools
+import json
+import logging
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from app.config import settings
+from app.ml.backtest import STATUS_FILLED, decide, execute, max_drawdown, simulate
+from app.ml.model_loader import ModelLoader
+from app.ml.model_registry import ModelRegistry
+from app.ml.training_data import TARGET_SOURCE, build_training_arrays, create_targets
+from app.services.candles import Candles
+from app.services.kline_aggregator import read_candles
+from app.services.kline_store import KlineStore
+
+logger = logging.getLogger(__name__)
+
+# Пространство поиска по умолчанию: параметры разметки и RandomForestClassifier
+SEARCH_SPACE: Dict[str, List[Any]] = {
+    "threshold_percent": [0.02, 0.05, 0.1, 0.25, 0.5],
+    "n_estimators": [50, 100, 200],
+    "max_depth": [6, 10, 14],
+    "min_samples_leaf": [1, 5, 20],
+    "max_features": ["sqrt", 0.5],
+}
+
+# Параметры разметки; остальные передаются в RandomForestClassifier
+LABEL_PARAMS = ("threshold_percent",)
+
+# Метрики, по которым можно ранжировать попытки (больше - лучше)
+SCORE_METRICS = ("total_return", "hit_rate", "validation_accuracy", "test_accuracy")
+
+# Выравнивание массивов внутри блока общей памяти
+_ALIGNMENT = 64
+
+
+class SharedArrays:
+    """
+    Массивы NumPy в одном блоке multiprocessing.shared_memory.
+    
+    Процесс-владелец создает блок и копирует в него массивы; воркеры
+    подключаются по spec (имя блока и раскладка) и получают views без
+    копирования. Блок удаляется владельцем в close().
+    """
+    
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        layout = {}
+        offset = 0
+        for name, array in arrays.items():
+            offset = -(-offset // _ALIGNMENT) * _ALIGNMENT
+            layout[name] = (offset, array.shape, array.dtype.str)
+            offset += array.nbytes
+        self._shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        self.spec = (self._shm.name, layout)
+        for name, view in _views(self._shm, layout).items():
+            view[...] = arrays[name]
+    
+    @staticmethod
+    def attach(spec: Tuple[str, Dict[str, Any]]) -> Tuple[shared_memory.SharedMemory, Dict[str, np.ndarray]]:
+        """Подключиться к блоку: объект SharedMemory (его нужно держать) и views только для чтения."""
+        name, layout = spec
+        shm = shared_memory.SharedMemory(name=name)
+        views = _views(shm, layout)
+        for view in views.values():
+            view.flags.writeable = False
+        return shm, views
+    
+    def close(self):
+        self._shm.close()
+        self._shm.unlink()
+    
+    def __enter__(self) -> "SharedArrays":
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _views(shm: shared_memory.SharedMemory, layout: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    return {
+        name: np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+        for name, (offset, shape, dtype) in layout.items()
+    }
+
+
+# Данные воркера: блок общей памяти и views на X, SMA таргета и цены закрытия
+_worker_shm: Optional[shared_memory.SharedMemory] = None
+_worker_arrays: Dict[str, np.ndarray] = {}
+
+
+def _attach_worker(spec: Tuple[str, Dict[str, Any]]):
+    global _worker_shm, _worker_arrays
+    _worker_shm, _worker_arrays = SharedArrays.attach(spec)
+
+
+def grid_trials(space: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """Все сочетания значений пространства поиска."""
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def random_trials(space: Dict[str, List[Any]], count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """count различных случайных сочетаний (или вся сетка, если она меньше)."""
+    grid = grid_trials(space)
+    if count >= len(grid):
+        return grid
+    return random.Random(seed).sample(grid, count)
+
+
+def _trial_cost(params: Dict[str, Any]) -> float:
+    # Грубая оценка времени обучения: крупные попытки запускаются первыми,
+    # чтобы в конце поиска не ждать одну долгую
+    return params.get("n_estimators", settings.MODEL_N_ESTIMATORS) * (params.get("max_depth") or 32)
+
+
+def evaluate_trial(
+    params: Dict[str, Any],
+    feature_columns: Sequence[str],
+    split: int
+) -> Dict[str, Any]:
+    """
+    Обучить модель с параметрами params на строках [0, split) общих данных и оценить на остальных.
+    
+    Модель обучается через ModelLoader.train_model_from_arrays (как в
+    приложении, но в один поток); на отложенном хвосте считаются точность
+    по таргетам этого порога и торговля по правилам ExecutionAgent
+    (app.ml.backtest). Выполняется в воркере после _attach_worker.
+    """
+    started = time.perf_counter()
+    X, sma, close = _worker_arrays["X"], _worker_arrays["sma"], _worker_arrays["close"]
+    threshold_percent = params.get("threshold_percent", settings.MODEL_THRESHOLD_PERCENT)
+    forest_params = {name: value for name, value in params.items() if name not in LABEL_PARAMS}
+    
+    model_loader = ModelLoader(
+        threshold_percent=threshold_percent,
+        feature_columns=feature_columns,
+        forest_params={**forest_params, "n_jobs": 1}
+    )
+    # Прогноз на большом хвосте идет через sklearn, компиляция не нужна
+    model_loader.compile_forest = False
+    model_loader.train_model_from_arrays(X[:split], create_targets(sma[:split], threshold_percent), close[:split])
+    train_seconds = time.perf_counter() - started
+    
+    probabilities = model_loader.predict_proba(X[split:])
+    classes = model_loader.classes_
+    validation_targets = create_targets(sma[split:], threshold_percent)
+    direction, confidence = decide(probabilities, classes)
+    status = execute(direction, confidence)
+    validation_close = close[split:]
+    next_close = np.append(close[split + 1:], close[-1])
+    result = simulate(validation_close, next_close, direction, status)
+    
+    filled = int(np.sum(status == STATUS_FILLED))
+    return {
+        "params": params,
+        "total_return": float(np.prod(1.0 + result["returns"]) - 1.0),
+        "max_drawdown": max_drawdown(result["returns"]),
+        "hit_rate": float(np.sum(result["hits"]) / filled) if filled else None,
+        "filled": filled,
+        "validation_accuracy": float(np.mean(classes[np.argmax(probabilities, axis=1)] == validation_targets)),
+        "test_accuracy": model_loader.metrics.get("test_accuracy"),
+        "train_seconds": train_seconds,
+        "seconds": time.perf_counter() - started,
+        "pid": os.getpid()
+    }
+
+
+def _score(record: Dict[str, Any], metric: str) -> float:
+    value = record.get(metric)
+    return float("-inf") if value is None else value
+
+
+def run_search(
+    candles: Candles,
+    trials: List[Dict[str, Any]],
+    leaderboard_path: str,
+    feature_columns: Optional[Sequence[str]] = None,
+    validation_fraction: float = 0.2,
+    metric: str = "total_return",
+    workers: Optional[int] = None,
+    data: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Параллельный поиск параметров модели и разметки.
+    
+    Матрица признаков, SMA таргета и цены закрытия строятся один раз и
+    кладутся в общую память; воркеры читают их без копирования и
+    сериализации. Каждая попытка дописывается в leaderboard_path (JSON
+    Lines) сразу по завершении, поэтому прерванный поиск не теряет
+    результаты.
+    
+    Args:
+        candles: История по возрастанию времени
+        trials: Параметры попыток (см. grid_trials/random_trials)
+        leaderboard_path: Файл таблицы результатов (дописывается)
+        feature_columns: Признаки модели (по умолчанию MODEL_FEATURES)
+        validation_fraction: Доля последних свечей для оценки
+        metric: Метрика ранжирования (SCORE_METRICS)
+        workers: Процессов (по умолчанию число CPU)
+        data: Откуда взяты свечи (сохраняется в таблицу для export_best)
+        
+    Returns:
+        Результаты попыток, лучшие первыми
+    """
+    if metric not in SCORE_METRICS:
+        raise ValueError(f"Неизвестная метрика: {metric}. Доступны: {', '.join(SCORE_METRICS)}")
+    feature_columns = ModelLoader(feature_columns=feature_columns).feature_columns
+    split = int(len(candles) * (1.0 - validation_fraction))
+    if split < 20 or len(candles) - split < 2:
+        raise ValueError(f"Недостаточно свечей для поиска: {len(candles)}")
+    
+    columns = list(feature_columns)
+    if TARGET_SOURCE not in columns:
+        columns.append(TARGET_SOURCE)
+    started = time.perf_counter()
+    # Порог здесь не важен: таргеты каждой попытки строятся из колонки SMA
+    matrix, _ = build_training_arrays(candles, columns, settings.MODEL_THRESHOLD_PERCENT, chunk_size=settings.TRAINING_CHUNK_SIZE)
+    arrays = {
+        "X": matrix[:, :len(feature_columns)],
+        "sma": matrix[:, columns.index(TARGET_SOURCE)],
+        "close": np.asarray(candles.close, dtype=np.float64)
+    }
+    logger.info(f"Признаки построены за {time.perf_counter() - started:.1f} с: {len(candles)} свечей, {len(trials)} попыток")
+    
+    workers = workers or os.cpu_count() or 1
+    common = {
+        "metric": metric,
+        "feature_columns": list(feature_columns),
+        "validation_fraction": validation_fraction,
+        "candles": len(candles),
+        "data": data or {}
+    }
+    Path(leaderboard_path).parent.mkdir(parents=True, exist_ok=True)
+    results = []
+    with SharedArrays(arrays) as shared, open(leaderboard_path, "a") as leaderboard:
+        del matrix, arrays
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(trials)),
+            initializer=_attach_worker,
+            initargs=(shared.spec,)
+        ) as pool:
+            futures = {
+                pool.submit(evaluate_trial, params, feature_columns, split): params
+                for params in sorted(trials, key=_trial_cost, reverse=True)
+            }
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"Попытка {futures[future]} завершилась ошибкой: {e}")
+                    continue
+                record = {
+                    **result,
+                    "score": result[metric],
+                    **common,
+                    "finished_at": datetime.now(timezone.utc).isoformat()
+                }
+                leaderboard.write(json.dumps(record) + "\n")
+                leaderboard.flush()
+                results.append(record)
+                logger.info(
+                    f"[{len(results)}/{len(trials)}] {result['params']}: {metric} = {result[metric]}, "
+                    f"{result['seconds']:.1f} с"
+                )
+    
+    logger.info(f"Поиск завершен за {time.perf_counter() - started:.1f} с, таблица: {leaderboard_path}")
+    return sorted(results, key=lambda record: _score(record, metric), reverse=True)
+
+
+def read_leaderboard(leaderboard_path: str, metric: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Прочитать таблицу результатов, лучшие первыми.
+    
+    Args:
+        leaderboard_path: Файл JSON Lines из run_search
+        metric: Метрика ранжирования (по умолчанию та, с которой шел поиск)
+    """
+    records = []
+    with open(leaderboard_path) as f:
+        for line in f:
+            if line.strip():
+                records.append(json.loads(line))
+    return sorted(records, key=lambda record: _score(record, metric or record["metric"]), reverse=True)
+
+
+def export_best(
+    leaderboard_path: str,
+    model_path: Optional[str] = None,
+    registry: Optional[ModelRegistry] = None,
+    promote: bool = False,
+    metric: Optional[str] = None,
+    store: Optional[KlineStore] = None
+) -> ModelLoader:
+    """
+    Переобучить модель с лучшими параметрами таблицы на всей истории поиска и сохранить.
+    
+    Свечи берутся из локального хранилища по полю data лучшей записи.
+    Модель сохраняется в model_path и/или регистрируется в реестре; с
+    promote версия записывается в ACTIVE реестра.
+    
+    Returns:
+        Загрузчик с обученной моделью
+    """
+    if model_path is None and registry is None:
+        raise ValueError("Нужен путь модели или реестр")
+    records = read_leaderboard(leaderboard_path, metric)
+    if not records:
+        raise ValueError(f"Таблица {leaderboard_path} пуста")
+    best = records[0]
+    data = best["data"]
+    if "symbol" not in data:
+        raise ValueError("В таблице нет источника свечей (поиск запущен не по хранилищу)")
+    
+    params = best["params"]
+    model_loader = ModelLoader(
+        threshold_percent=params.get("threshold_percent"),
+        feature_columns=best["feature_columns"],
+        forest_params={name: value for name, value in params.items() if name not in LABEL_PARAMS}
+    )
+    candles = read_candles(
+        store or KlineStore(data.get("store")),
+        data["symbol"],
+        data["interval"],
+        start_time=data.get("start_time"),
+        end_time=data.get("end_time")
+    )
+    logger.info(f"Обучение лучшей модели {params} ({best['metric']} = {best['score']}) на {len(candles)} свечах")
+    model_loader.train_model_from_candles(candles)
+    model_loader.metrics["search"] = {name: best[name] for name in ("params", "metric", "score", *SCORE_METRICS)}
+    
+    if model_path is not None:
+        model_loader.save_model(model_path)
+    if registry is not None:
+        version = registry.register(model_loader, {
+            "symbol": data["symbol"],
+            "interval": data["interval"]
+        })
+        if promote:
+            registry.promote(version)
+    return model_loader
+
+
+def _run(args: argparse.Namespace):
+    space = dict(SEARCH_SPACE)
+    if args.space:
+        space.update(json.loads(args.space))
+    trials = random_trials(space, args.random, args.seed) if args.random else grid_trials(space)
+    candles = read_candles(KlineStore(args.store), args.symbol, args.interval)
+    results = run_search(
+        candles,
+        trials,
+        args.leaderboard,
+        validation_fraction=args.validation,
+        metric=args.metric,
+        workers=args.workers,
+        data={"symbol": args.symbol, "interval": args.interval, "store": args.store}
+    )
+    for record in results[:args.top]:
+        print(json.dumps({name: record[name] for name in ("params", "score", *SCORE_METRICS, "max_drawdown")}))
+
+
+def _export(args: argparse.Namespace):
+    registry = ModelRegistry(args.registry, settings.MODEL_REGISTRY_RESIDENT) if args.registry else None
+    model_loader = export_best(args.leaderboard, args.model_path, registry, args.promote, args.metric)
+    print(json.dumps(model_loader.metrics["search"]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Поиск гиперпараметров модели и порога разметки")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    run_parser = commands.add_parser("run", help="запустить поиск на свечах из локального хранилища")
+    run_parser.add_argument("symbol")
+    run_parser.add_argument("interval")
+    run_parser.add_argument("--leaderboard", default="./data/search/leaderboard.jsonl")
+    run_parser.add_argument("--space", help="JSON {параметр: [значения]} поверх пространства по умолчанию")
+    run_parser.add_argument("--random", type=int, default=0, help="число случайных попыток (0 - вся сетка)")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--validation", type=float, default=0.2)
+    run_parser.add_argument("--metric", choices=SCORE_METRICS, default="total_return")
+    run_parser.add_argument("--workers", type=int, default=None)
+    run_parser.add_argument("--top", type=int, default=10)
+    run_parser.add_argument("--store", default=None)
+    run_parser.set_defaults(handler=_run)
+    
+    export_parser = commands.add_parser("export", help="обучить и сохранить лучшую модель таблицы")
+    export_parser.add_argument("leaderboard")
+    export_parser.add_argument("--model-path", default=None)
+    export_parser.add_argument("--registry", default=None, help="каталог реестра моделей")
+    export_parser.add_argument("--promote", action="store_true", help="записать версию в ACTIVE реестра")
+    export_parser.add_argument("--metric", choices=SCORE_METRICS, default=None)
+    export_parser.set_defaults(handler=_export)
+    
+    cli_args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    for name in ("app.ml.model_loader", "app.ml.compiled_forest"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    cli_args.handler(cli_args)
@@ -0,0 +1,118 @@
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+
+class ModelWarmup:
+    """
+    Ход фоновой инициализации модели (для эндпоинта готовности).
+    
+    Состояния: pending -> running -> ready или failed; после failed
+    попытка может быть повторена (снова running). Для каждого этапа
+    попытки (загрузка из реестра, загрузка файла, получение свечей,
+    обучение, регистрация) хранится его длительность. Меняется только
+    из event loop.
+    """
+    
+    def __init__(self):
+        self.state = "pending"
+        self.stage: Optional[str] = None
+        self.attempts = 0
+        self.error: Optional[str] = None
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.next_retry_at: Optional[datetime] = None
+        self.stages: List[Dict[str, Any]] = []
+        self._started: Optional[float] = None
+        self._finished: Optional[float] = None
+        self._stage_started: Optional[float] = None
+    
+    @property
+    def in_progress(self) -> bool:
+        """Инициализация еще идет или ждет повторной попытки."""
+        return self.state in ("pending", "running") or (self.state == "failed" and self.next_retry_at is not None)
+    
+    @property
+    def elapsed(self) -> float:
+        """Секунд с начала первой попытки (до ее завершения, если она завершена)."""
+        if self._started is None:
+            return 0.0
+        end = self._finished if self._finished is not None else time.monotonic()
+        return end - self._started
+    
+    def start(self):
+        """Начать попытку инициализации."""
+        now = time.monotonic()
+        if self._started is None:
+            self._started = now
+            self.started_at = datetime.utcnow()
+        self.state = "running"
+        self.attempts += 1
+        self.error = None
+        self.next_retry_at = None
+        self.stages = []
+        self.stage = None
+        self._finished = None
+        self.finished_at = None
+    
+    def enter(self, stage: str):
+        """Перейти к этапу stage, закрыв предыдущий."""
+        self._close_stage()
+        self.stage = stage
+        self._stage_started = time.monotonic()
+    
+    def finish(self):
+        """Модель готова."""
+        self._close_stage()
+        self.state = "ready"
+        self._finish()
+    
+    def fail(self, error: Exception, retry_in: Optional[float] = None):
+        """
+        Попытка завершилась ошибкой.
+        
+        Args:
+            error: Исключение попытки
+            retry_in: Через сколько секунд будет повторная попытка (None - не будет)
+        """
+        self._close_stage()
+        self.state = "failed"
+        self.error = f"{type(error).__name__}: {error}"
+        self.next_retry_at = None
+        if retry_in is not None:
+            self.next_retry_at = datetime.utcfromtimestamp(time.time() + retry_in)
+        self._finish()
+    
+    def get_status(self) -> Dict[str, Any]:
+        """Состояние, текущий этап, длительности этапов и общее время прогрева."""
+        stages = list(self.stages)
+        if self.state == "running" and self.stage is not None:
+            stages.append({
+                "stage": self.stage,
+                "seconds": round(time.monotonic() - self._stage_started, 3),
+                "done": False
+            })
+        return {
+            "state": self.state,
+            "stage": self.stage if self.state == "running" else None,
+            "attempts": self.attempts,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "next_retry_at": self.next_retry_at.isoformat() if self.next_retry_at else None,
+            "error": self.error,
+            "stages": stages
+        }
+    
+    def _close_stage(self):
+        if self.stage is not None and self._stage_started is not None:
+            self.stages.append({
+                "stage": self.stage,
+                "seconds": round(time.monotonic() - self._stage_started, 3),
+                "done": True
+            })
+        self._stage_started = None
+    
+    def _finish(self):
+        self._finished = time.monotonic()
+        self.finished_at = datetime.utcnow()
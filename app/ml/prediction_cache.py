@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Sequence, Tuple
+import numpy as np
+
+CacheKey = Tuple[Hashable, Tuple[float, ...]]
+
+
+def _round_significant(value: float, digits: int) -> float:
+    """Округлить до digits значащих цифр (0, inf и nan не меняются)."""
+    if value == 0 or not np.isfinite(value):
+        return value
+    return round(value, digits - 1 - int(np.floor(np.log10(abs(value)))))
+
+
+class PredictionCache:
+    """
+    LRU + TTL кэш предсказаний по квантованному вектору признаков.
+    
+    Ключ - (версия модели, вектор признаков, округленный до заданного числа
+    значащих цифр по каждому признаку). Округление относительное, поэтому
+    одинаково ведет себя для BTC по 30000 и для монет дешевле цента. Близкие
+    векторы (например, повторные опросы между закрытиями свечей) попадают в
+    один ключ. Кэш потокобезопасен: предсказания выполняются в пуле потоков
+    инференса.
+    """
+    
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        ttl: float = 30.0,
+        significant_digits: Optional[Dict[str, int]] = None,
+        default_significant_digits: int = 6
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.significant_digits = dict(significant_digits or {})
+        self.default_significant_digits = default_significant_digits
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version: Hashable = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+    
+    def make_key(self, version: Hashable, columns: Sequence[str], vector: np.ndarray) -> CacheKey:
+        """Ключ для вектора признаков модели (значения в порядке columns)."""
+        quantized = tuple(
+            _round_significant(float(value), self.significant_digits.get(column, self.default_significant_digits))
+            for column, value in zip(columns, vector)
+        )
+        return version, quantized
+    
+    def get(self, key: CacheKey) -> Optional[Any]:
+        """Значение по ключу или None (промах или истек TTL)."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, value = entry
+            if now - stored_at > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def put(self, key: CacheKey, value: Any):
+        """Сохранить значение; ключи другой версии модели сбрасывают кэш."""
+        with self._lock:
+            if key[0] != self._version:
+                self._clear_locked()
+                self._version = key[0]
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def invalidate(self):
+        """Сбросить кэш (например, при смене модели)."""
+        with self._lock:
+            self._clear_locked()
+            self._version = None
+    
+    def _clear_locked(self):
+        if self._entries:
+            self.invalidations += 1
+        self._entries.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика кэша предсказаний."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations
+            }
@@ -0,0 +1,124 @@
+import logging
+from pathlib import Path
+from typing import Optional, Sequence, Tuple
+import numpy as np
+from app.ml.features import compute_feature_matrix
+from app.services.candles import Candles
+
+logger = logging.getLogger(__name__)
+
+TARGET_BUY = 0
+TARGET_SELL = 1
+TARGET_HOLD = 2
+
+# Колонка, по изменению которой строится таргет
+TARGET_SOURCE = "sma_10"
+
+# Свечей разогрева перед каждым блоком. Оконные индикаторы считаются по ним
+# точно, рекурсивные (EMA, Уайлдер) забывают начальное состояние: вклад
+# начала блока затухает как (1 - alpha)^1000 < 1e-30.
+CHUNK_WARMUP = 1000
+
+
+def create_targets(sma: np.ndarray, threshold_percent: float) -> np.ndarray:
+    """
+    Таргеты по изменению SMA к следующей свече.
+    
+    BUY (0), если SMA вырастет больше чем на threshold_percent процентов,
+    SELL (1), если упадет больше чем на threshold_percent, иначе HOLD (2).
+    Последняя свеча и свечи с нулевой SMA - HOLD.
+    
+    Args:
+        sma: SMA по свечам
+        threshold_percent: Порог изменения в процентах
+        
+    Returns:
+        Массив таргетов той же длины
+    """
+    targets = np.full(len(sma), TARGET_HOLD, dtype=np.int64)
+    if len(sma) < 2:
+        return targets
+    
+    current = sma[:-1]
+    following = sma[1:]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change_percent = (following - current) / current * 100
+    targets[:-1] = np.select(
+        [current == 0, change_percent > threshold_percent, change_percent < -threshold_percent],
+        [TARGET_HOLD, TARGET_BUY, TARGET_SELL],
+        default=TARGET_HOLD
+    )
+    return targets
+
+
+def rebalance_targets(targets: np.ndarray, price_changes: np.ndarray) -> np.ndarray:
+    """
+    Пометить HOLD пятую часть свечей с наименьшим |изменением цены| (на месте).
+    
+    Применяется, когда в таргетах представлены не все классы.
+    """
+    count = max(1, len(price_changes) // 5)
+    hold_indices = np.argsort(np.abs(price_changes))[:count]
+    targets[hold_indices[hold_indices < len(targets)]] = TARGET_HOLD
+    return targets
+
+
+def build_training_arrays(
+    candles: Candles,
+    feature_columns: Sequence[str],
+    threshold_percent: float,
+    chunk_size: int = 1_000_000,
+    warmup: int = CHUNK_WARMUP,
+    out_dir: Optional[str] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Построить матрицу признаков X и таргеты y по блокам свечей.
+    
+    Каждый блок считается вместе с warmup свечами перед ним и одной после
+    него (для таргета последней свечи блока), поэтому кроме результата в
+    памяти держится O(chunk_size + warmup) строк. Колонки свечей могут быть
+    np.memmap из KlineStore: читаются только страницы текущего блока.
+    Перебалансировка таргетов здесь не выполняется.
+    
+    Args:
+        candles: Свечи по возрастанию времени
+        feature_columns: Признаки модели
+        threshold_percent: Порог таргета (см. create_targets)
+        chunk_size: Свечей в блоке
+        warmup: Свечей разогрева индикаторов перед блоком
+        out_dir: Каталог для X.npy/y.npy; если задан, результат - np.memmap на диске
+        
+    Returns:
+        Кортеж (X формы (N, len(feature_columns)), y формы (N,))
+    """
+    n = len(candles)
+    columns = list(feature_columns)
+    if TARGET_SOURCE not in columns:
+        columns.append(TARGET_SOURCE)
+    source_index = columns.index(TARGET_SOURCE)
+    n_features = len(feature_columns)
+    
+    if out_dir is not None:
+        Path(out_dir).mkdir(parents=True, exist_ok=True)
+        X = np.lib.format.open_memmap(str(Path(out_dir) / "X.npy"), mode="w+", dtype=np.float64, shape=(n, n_features))
+        y = np.lib.format.open_memmap(str(Path(out_dir) / "y.npy"), mode="w+", dtype=np.int64, shape=(n,))
+    else:
+        X = np.empty((n, n_features))
+        y = np.empty(n, dtype=np.int64)
+    
+    chunk_size = max(1, chunk_size)
+    for start in range(0, n, chunk_size):
+        end = min(n, start + chunk_size)
+        low = max(0, start - warmup)
+        high = min(n, end + 1)
+        matrix = compute_feature_matrix(candles.slice(low, high), columns)
+        X[start:end] = matrix[start - low:end - low, :n_features]
+        y[start:end] = create_targets(matrix[start - low:, source_index], threshold_percent)[:end - start]
+    
+    if out_dir is not None:
+        X.flush()
+        y.flush()
+    if n > chunk_size:
+        logger.info(f"Обучающая выборка построена по блокам: {n} свечей, блок {chunk_size}")
+    return X, y
+
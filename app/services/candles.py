@@ -0,0 +1,75 @@
+from typing import Any, Dict, List
+import numpy as np
+
+
+class Candles:
+    """
+    Компактное представление свечей: по одному непрерывному массиву на колонку.
+    
+    Цены и объем лежат в одном блоке float64 размером (5, N), поэтому каждая
+    колонка - непрерывный view без отдельной аллокации.
+    """
+    
+    __slots__ = ("open_time", "open", "high", "low", "close", "volume")
+    
+    def __init__(
+        self,
+        open_time: np.ndarray,
+        open: np.ndarray,
+        high: np.ndarray,
+        low: np.ndarray,
+        close: np.ndarray,
+        volume: np.ndarray
+    ):
+        self.open_time = open_time
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+    
+    @classmethod
+    def from_klines(cls, klines: List[List[Any]]) -> "Candles":
+        """Разобрать свечи Binance (цены строками) в типизированные массивы."""
+        if not klines:
+            return cls.empty()
+        
+        columns = list(zip(*klines))
+        open_time = np.array(columns[0], dtype=np.int64)
+        ohlcv = np.array(columns[1:6], dtype=np.float64)
+        return cls(open_time, ohlcv[0], ohlcv[1], ohlcv[2], ohlcv[3], ohlcv[4])
+    
+    @classmethod
+    def from_columns(cls, columns: Dict[str, np.ndarray]) -> "Candles":
+        """Собрать свечи из колонок KlineStore (без копирования)."""
+        return cls(
+            columns["open_time"],
+            columns["open"],
+            columns["high"],
+            columns["low"],
+            columns["close"],
+            columns["volume"]
+        )
+    
+    @classmethod
+    def empty(cls) -> "Candles":
+        prices = np.empty((5, 0), dtype=np.float64)
+        return cls(np.empty(0, dtype=np.int64), prices[0], prices[1], prices[2], prices[3], prices[4])
+    
+    def __len__(self) -> int:
+        return len(self.close)
+    
+    def tail(self, n: int) -> "Candles":
+        """Последние n свечей (views на те же массивы)."""
+        return self.slice(max(0, len(self) - n), len(self))
+    
+    def slice(self, start: int, end: int) -> "Candles":
+        """Свечи [start, end) (views на те же массивы)."""
+        return Candles(
+            self.open_time[start:end],
+            self.open[start:end],
+            self.high[start:end],
+            self.low[start:end],
+            self.close[start:end],
+            self.volume[start:end]
+        )
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutorOverloaded(Exception):
+    """Задача отброшена: очередь пула переполнена."""
+
+
+def _timed_call(fn: Callable, args: Tuple, kwargs: Dict[str, Any]) -> Tuple[Any, float, float]:
+    # time.time(), а не monotonic: отметки сравниваются между процессами
+    started = time.time()
+    result = fn(*args, **kwargs)
+    return result, started, time.time()
+
+
+class _BoundedPool:
+    """Пул с ограничением одновременных задач и длины очереди ожидания."""
+    
+    def __init__(self, name: str, executor: Executor, max_concurrency: int, max_queue: int):
+        self.name = name
+        self.executor = executor
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.total_compute_time = 0.0
+        self.max_compute_time = 0.0
+    
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        if self.queue_depth >= self.max_queue:
+            self.rejected += 1
+            raise ExecutorOverloaded(f"Очередь пула {self.name} переполнена ({self.queue_depth} задач)")
+        
+        submitted = time.time()
+        self.queue_depth += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queue_depth -= 1
+        
+        self.running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result, started, finished = await loop.run_in_executor(self.executor, _timed_call, fn, args, kwargs)
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.running -= 1
+            self._semaphore.release()
+        
+        wait_time = max(0.0, started - submitted)
+        compute_time = finished - started
+        self.completed += 1
+        self.total_wait_time += wait_time
+        self.max_wait_time = max(self.max_wait_time, wait_time)
+        self.total_compute_time += compute_time
+        self.max_compute_time = max(self.max_compute_time, compute_time)
+        return result
+    
+    def get_stats(self) -> Dict[str, Any]:
+        completed = max(self.completed, 1)
+        return {
+            "max_concurrency": self.max_concurrency,
+            "running": self.running,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_wait_seconds": round(self.total_wait_time / completed, 6),
+            "max_wait_seconds": round(self.max_wait_time, 6),
+            "avg_compute_seconds": round(self.total_compute_time / completed, 6),
+            "max_compute_seconds": round(self.max_compute_time, 6)
+        }
+
+
+class ComputeExecutor:
+    """
+    Вынос CPU-задач из event loop.
+    
+    Инференс выполняется в пуле потоков, обучение - в пуле процессов (или
+    потоков, если процессы недоступны). Число одновременных задач и длина
+    очереди ограничены; для каждого пула считается время ожидания в очереди
+    и время вычисления.
+    """
+    
+    def __init__(
+        self,
+        inference_workers: int = 4,
+        inference_max_queue: int = 100,
+        training_workers: int = 1,
+        training_max_queue: int = 2,
+        training_mode: str = "process"
+    ):
+        self.inference = _BoundedPool(
+            "inference",
+            ThreadPoolExecutor(max_workers=inference_workers, thread_name_prefix="inference"),
+            max_concurrency=inference_workers,
+            max_queue=inference_max_queue
+        )
+        if training_mode == "process":
+            training_executor: Executor = ProcessPoolExecutor(max_workers=training_workers)
+        else:
+            training_executor = ThreadPoolExecutor(max_workers=training_workers, thread_name_prefix="training")
+        self.training = _BoundedPool(
+            "training",
+            training_executor,
+            max_concurrency=training_workers,
+            max_queue=training_max_queue
+        )
+    
+    async def run_inference(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Выполнить инференс в пуле потоков.
+        
+        Raises:
+            ExecutorOverloaded: Если очередь инференса переполнена
+        """
+        return await self.inference.run(fn, *args, **kwargs)
+    
+    async def run_training(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Выполнить обучение в пуле процессов.
+        
+        Функция и аргументы должны сериализоваться pickle (функция - уровня модуля).
+        
+        Raises:
+            ExecutorOverloaded: Если очередь обучения переполнена
+        """
+        return await self.training.run(fn, *args, **kwargs)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика пулов."""
+        return {
+            "inference": self.inference.get_stats(),
+            "training": self.training.get_stats()
+        }
+    
+    def shutdown(self):
+        """Остановить пулы (ожидающие задачи отменяются)."""
+        self.inference.executor.shutdown(wait=True, cancel_futures=True)
+        self.training.executor.shutdown(wait=True, cancel_futures=True)
+        logger.info(f"Пулы вычислений остановлены, статистика: {self.get_stats()}")
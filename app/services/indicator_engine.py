@@ -0,0 +1,195 @@
+import json
+import logging
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Tuple
+import numpy as np
+from app.services.candles import Candles
+
+logger = logging.getLogger(__name__)
+
+
+class IndicatorState:
+    """
+    Состояние индикаторов одной серии по закрытым свечам.
+    
+    SMA считаются по скользящим суммам, RSI - по сглаживанию Уайлдера
+    (те же формулы, что и в app.ml.features). Незакрытая свеча в состояние
+    не попадает: значения для нее вычисляются поверх состояния за O(1).
+    """
+    
+    def __init__(self, sma_windows: Sequence[int] = (10, 50), rsi_period: int = 14):
+        self.sma_windows = tuple(sma_windows)
+        self.rsi_period = rsi_period
+        self.closes: deque = deque(maxlen=max(self.sma_windows))
+        self.sums: Dict[int, float] = {window: 0.0 for window in self.sma_windows}
+        self.last_close: Optional[float] = None
+        self.last_open_time: Optional[int] = None
+        self.deltas_seen = 0
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+    
+    def apply_closed(self, open_time: int, close: float):
+        """Учесть закрытую свечу."""
+        for window in self.sma_windows:
+            if len(self.closes) >= window:
+                self.sums[window] -= self.closes[-window]
+            self.sums[window] += close
+        self.closes.append(close)
+        
+        if self.last_close is not None:
+            self.avg_gain, self.avg_loss = self._smooth(close - self.last_close)
+            self.deltas_seen += 1
+        self.last_close = close
+        self.last_open_time = open_time
+    
+    def _smooth(self, delta: float) -> Tuple[float, float]:
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+        period = self.rsi_period
+        if self.deltas_seen < period:
+            # Первые period изменений - простое среднее (начальное значение Уайлдера)
+            n = self.deltas_seen
+            return (self.avg_gain * n + gain) / (n + 1), (self.avg_loss * n + loss) / (n + 1)
+        return (
+            (self.avg_gain * (period - 1) + gain) / period,
+            (self.avg_loss * (period - 1) + loss) / period
+        )
+    
+    def sma(self, window: int, live_close: float) -> float:
+        """SMA по последним window свечам, включая незакрытую."""
+        closed_needed = window - 1
+        if len(self.closes) < closed_needed:
+            return live_close if not self.closes else (sum(self.closes) + live_close) / (len(self.closes) + 1)
+        dropped = self.sums[window] - (self.closes[-window] if len(self.closes) >= window else 0.0)
+        return (dropped + live_close) / window
+    
+    def rsi(self, live_close: float) -> float:
+        """RSI Уайлдера с учетом незакрытой свечи."""
+        if self.last_close is None or self.deltas_seen + 1 < self.rsi_period:
+            return 50.0
+        avg_gain, avg_loss = self._smooth(live_close - self.last_close)
+        if avg_loss == 0:
+            return 100.0
+        return 100 - (100 / (1 + avg_gain / avg_loss))
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "sma_windows": list(self.sma_windows),
+            "rsi_period": self.rsi_period,
+            "closes": list(self.closes),
+            "sums": {str(window): value for window, value in self.sums.items()},
+            "last_close": self.last_close,
+            "last_open_time": self.last_open_time,
+            "deltas_seen": self.deltas_seen,
+            "avg_gain": self.avg_gain,
+            "avg_loss": self.avg_loss
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "IndicatorState":
+        state = cls(sma_windows=data["sma_windows"], rsi_period=data["rsi_period"])
+        state.closes.extend(data["closes"])
+        state.sums = {int(window): value for window, value in data["sums"].items()}
+        state.last_close = data["last_close"]
+        state.last_open_time = data["last_open_time"]
+        state.deltas_seen = data["deltas_seen"]
+        state.avg_gain = data["avg_gain"]
+        state.avg_loss = data["avg_loss"]
+        return state
+
+
+class IndicatorEngine:
+    """Инкрементальные индикаторы по (symbol, interval)."""
+    
+    def __init__(self, sma_windows: Sequence[int] = (10, 50), rsi_period: int = 14, max_series: int = 256):
+        self.sma_windows = tuple(sma_windows)
+        self.rsi_period = rsi_period
+        self.max_series = max_series
+        self._states: "OrderedDict[Tuple[str, str], IndicatorState]" = OrderedDict()
+    
+    def _new_state(self) -> IndicatorState:
+        return IndicatorState(sma_windows=self.sma_windows, rsi_period=self.rsi_period)
+    
+    def update(self, symbol: str, interval: str, candles: Candles) -> Dict[str, float]:
+        """
+        Обновить состояние серии и получить индикаторы.
+        
+        Последняя свеча считается незакрытой. В состояние применяются только
+        закрытые свечи новее уже учтенных; если между ними есть пропуск,
+        состояние строится заново по переданным свечам.
+        
+        Args:
+            symbol: Торговая пара
+            interval: Интервал
+            candles: Последние свечи серии
+            
+        Returns:
+            Словарь с фичами (sma_*, rsi_*, current_price, price_change_1m, volume)
+        """
+        if len(candles) == 0:
+            return {}
+        
+        key = (symbol, interval)
+        state = self._states.get(key)
+        open_times = candles.open_time
+        closed_count = len(candles) - 1
+        
+        start = 0
+        if state is not None and state.last_open_time is not None:
+            closed_times = open_times[:closed_count]
+            start = int(np.searchsorted(closed_times, state.last_open_time, side="right"))
+            if start < closed_count and (start == 0 or closed_times[start - 1] != state.last_open_time):
+                logger.info(f"Пропуск свечей в {key}, индикаторы пересчитываются")
+                state = None
+                start = 0
+        if state is None:
+            state = self._new_state()
+            self._states[key] = state
+            while len(self._states) > self.max_series:
+                self._states.popitem(last=False)
+        self._states.move_to_end(key)
+        
+        closes = candles.close
+        for i in range(start, closed_count):
+            state.apply_closed(int(open_times[i]), float(closes[i]))
+        
+        live_close = float(closes[-1])
+        features = {f"sma_{window}": state.sma(window, live_close) for window in self.sma_windows}
+        features[f"rsi_{self.rsi_period}"] = state.rsi(live_close)
+        features["current_price"] = live_close
+        features["price_change_1m"] = (
+            (live_close - state.last_close) / state.last_close * 100 if state.last_close else 0.0
+        )
+        features["volume"] = float(candles.volume[-1])
+        return features
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Снимок состояния всех серий (JSON-совместимый)."""
+        return {
+            f"{symbol}|{interval}": state.to_dict()
+            for (symbol, interval), state in self._states.items()
+        }
+    
+    def restore(self, snapshot: Dict[str, Any]):
+        """Восстановить состояние из снимка."""
+        for key, data in snapshot.items():
+            symbol, interval = key.split("|", 1)
+            self._states[(symbol, interval)] = IndicatorState.from_dict(data)
+    
+    def save(self, path: str):
+        """Сохранить снимок в файл."""
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.snapshot(), f)
+        logger.info(f"Состояние индикаторов сохранено в {path}")
+    
+    def load(self, path: str) -> bool:
+        """Загрузить снимок из файла, если он существует."""
+        if not Path(path).exists():
+            return False
+        with open(path) as f:
+            self.restore(json.load(f))
+        logger.info(f"Состояние индикаторов загружено из {path} ({len(self._states)} серий)")
+        return True
+
@@ -0,0 +1,313 @@
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+import numpy as np
+from app.services.candles import Candles
+from app.services.kline_store import KLINE_COLUMNS, KlineStore
+
+logger = logging.getLogger(__name__)
+
+BASE_INTERVAL = "1m"
+
+# Длительность интервалов в мс. Свечи Binance этих интервалов выровнены
+# по границам, кратным длительности от начала эпохи (UTC).
+INTERVAL_MS = {
+    "1m": 60_000,
+    "5m": 5 * 60_000,
+    "15m": 15 * 60_000,
+    "1h": 60 * 60_000,
+    "4h": 4 * 60 * 60_000,
+}
+
+AGGREGATED_INTERVALS = [interval for interval in INTERVAL_MS if interval != BASE_INTERVAL]
+
+# Поля свечи Binance, которые суммируются при агрегации
+_SUM_FIELDS = (5, 7, 9, 10)
+
+
+def _new_bucket(kline: List[Any], start: int, interval_ms: int) -> List[Any]:
+    return [
+        start, float(kline[1]), float(kline[2]), float(kline[3]), float(kline[4]), float(kline[5]),
+        start + interval_ms - 1, float(kline[7]), int(kline[8]), float(kline[9]), float(kline[10]), "0"
+    ]
+
+
+def _merge_into(bucket: List[Any], kline: List[Any]):
+    bucket[2] = max(bucket[2], float(kline[2]))
+    bucket[3] = min(bucket[3], float(kline[3]))
+    bucket[4] = float(kline[4])
+    for index in _SUM_FIELDS:
+        bucket[index] += float(kline[index])
+    bucket[8] += int(kline[8])
+
+
+class _AggregatedSeries:
+    """Закрытые свечи одного интервала и накопленная часть текущей."""
+    
+    def __init__(self, interval_ms: int, max_candles: int):
+        self.interval_ms = interval_ms
+        self.closed: Deque[List[Any]] = deque(maxlen=max_candles)
+        self.partial: Optional[List[Any]] = None
+    
+    def apply_closed(self, kline: List[Any]):
+        """Учесть закрытую минутную свечу."""
+        open_time = int(kline[0])
+        start = open_time - open_time % self.interval_ms
+        if self.partial is not None and self.partial[0] != start:
+            self.closed.append(self.partial)
+            self.partial = None
+        if self.partial is None:
+            if not self.closed and open_time != start:
+                # Начало первой свечи не видно: неполную свечу не собираем
+                return
+            self.partial = _new_bucket(kline, start, self.interval_ms)
+        else:
+            _merge_into(self.partial, kline)
+        if open_time + INTERVAL_MS[BASE_INTERVAL] >= start + self.interval_ms:
+            # Последняя минута интервала: свеча закрыта
+            self.closed.append(self.partial)
+            self.partial = None
+    
+    def last_start(self) -> Optional[int]:
+        if self.partial is not None:
+            return self.partial[0]
+        return self.closed[-1][0] if self.closed else None
+    
+    def tail(self, live: Optional[List[Any]], limit: int) -> List[List[Any]]:
+        """Последние limit свечей, включая текущую (с учетом незакрытой минуты)."""
+        current = list(self.partial) if self.partial is not None else None
+        if live is not None:
+            open_time = int(live[0])
+            start = open_time - open_time % self.interval_ms
+            if current is not None and current[0] == start:
+                _merge_into(current, live)
+            elif current is None and (self.closed[-1][0] < start if self.closed else open_time == start):
+                current = _new_bucket(live, start, self.interval_ms)
+        
+        count = limit - 1 if current is not None else limit
+        klines = list(self.closed)[-count:] if count > 0 else []
+        if current is not None:
+            klines.append(current)
+        return klines
+
+
+class KlineAggregator:
+    """
+    Свечи старших интервалов (5m, 15m, 1h, 4h), собранные из минутных.
+    
+    Минутные свечи применяются инкрементально: каждая закрытая минута
+    учитывается один раз, незакрытая добавляется к текущей свече только при
+    чтении. Границы свечей совпадают с границами Binance.
+    """
+    
+    def __init__(self, max_candles: int = 1000, intervals: Optional[List[str]] = None):
+        self.max_candles = max_candles
+        self.intervals = intervals or AGGREGATED_INTERVALS
+        unknown = [interval for interval in self.intervals if interval not in INTERVAL_MS]
+        if unknown:
+            raise ValueError(f"Неподдерживаемые интервалы: {unknown}")
+        self._series: Dict[str, Dict[str, _AggregatedSeries]] = {}
+        self._last_open_time: Dict[str, int] = {}
+        self._live: Dict[str, List[Any]] = {}
+        self.minutes_applied = 0
+        self.gaps = 0
+        self.resets = 0
+        self.hits = 0
+        self.misses = 0
+    
+    def supports(self, interval: str) -> bool:
+        return interval in self.intervals
+    
+    def _symbol_series(self, symbol: str) -> Dict[str, _AggregatedSeries]:
+        series = self._series.get(symbol)
+        if series is None:
+            series = {
+                interval: _AggregatedSeries(INTERVAL_MS[interval], self.max_candles)
+                for interval in self.intervals
+            }
+            self._series[symbol] = series
+        return series
+    
+    def update(self, symbol: str, klines: List[List[Any]]):
+        """
+        Применить минутные свечи серии.
+        
+        Последняя свеча считается незакрытой. Применяются только закрытые
+        свечи новее уже учтенных. Если между ними пропуск, серия интервала
+        сохраняется, когда пропуск не выходит за текущую свечу интервала,
+        иначе начинается заново.
+        
+        Args:
+            symbol: Торговая пара
+            klines: Минутные свечи в формате Binance (по возрастанию open_time)
+        """
+        if not klines:
+            return
+        
+        last_open_time = self._last_open_time.get(symbol)
+        start = len(klines) - 1
+        if last_open_time is not None:
+            while start > 0 and int(klines[start - 1][0]) > last_open_time:
+                start -= 1
+        else:
+            start = 0
+        
+        series = self._symbol_series(symbol)
+        base_ms = INTERVAL_MS[BASE_INTERVAL]
+        if start < len(klines) - 1 and last_open_time is not None:
+            first_open_time = int(klines[start][0])
+            if first_open_time != last_open_time + base_ms:
+                self.gaps += 1
+                self._handle_gap(symbol, series, first_open_time)
+        
+        for kline in klines[start:-1]:
+            for aggregated in series.values():
+                aggregated.apply_closed(kline)
+            self.minutes_applied += 1
+        if start < len(klines) - 1:
+            self._last_open_time[symbol] = int(klines[-2][0])
+        self._live[symbol] = klines[-1]
+    
+    def _handle_gap(self, symbol: str, series: Dict[str, _AggregatedSeries], first_open_time: int):
+        for interval, aggregated in series.items():
+            last_start = aggregated.last_start()
+            if last_start is not None and first_open_time - last_start >= 2 * aggregated.interval_ms:
+                series[interval] = _AggregatedSeries(aggregated.interval_ms, self.max_candles)
+                self.resets += 1
+                logger.info(f"Пропуск минутных свечей {symbol}, серия {interval} собирается заново")
+    
+    def seed(self, symbol: str, columns: Dict[str, np.ndarray]):
+        """
+        Заполнить серии символа по истории закрытых минутных свечей (колонки KlineStore).
+        
+        Args:
+            symbol: Торговая пара
+            columns: Колонки минутных свечей по возрастанию open_time
+        """
+        if len(columns["open_time"]) == 0:
+            return
+        
+        series = self._symbol_series(symbol)
+        for interval in self.intervals:
+            aggregated = _AggregatedSeries(INTERVAL_MS[interval], self.max_candles)
+            needed = (self.max_candles + 1) * (INTERVAL_MS[interval] // INTERVAL_MS[BASE_INTERVAL])
+            minutes = {name: values[-needed:] for name, values in columns.items()}
+            buckets = aggregate_columns(minutes, interval)
+            first, end = _complete_range(minutes, buckets, interval)
+            rows = _columns_to_klines(buckets)
+            if end < len(rows):
+                aggregated.partial = rows[end]
+            aggregated.closed.extend(rows[first:end])
+            series[interval] = aggregated
+        self._last_open_time[symbol] = int(columns["open_time"][-1])
+        logger.info(f"Серии старших интервалов {symbol} заполнены по {len(columns['open_time'])} минутным свечам")
+    
+    def get_klines(self, symbol: str, interval: str, limit: int) -> Optional[List[List[Any]]]:
+        """
+        Последние свечи интервала, собранные локально.
+        
+        Returns:
+            Список свечей в формате Binance или None, если локальной истории
+            меньше limit свечей
+        """
+        series = self._series.get(symbol, {}).get(interval)
+        if series is None:
+            self.misses += 1
+            return None
+        klines = series.tail(self._live.get(symbol), limit)
+        if len(klines) < limit:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return klines
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика агрегации."""
+        return {
+            "symbols": len(self._series),
+            "intervals": self.intervals,
+            "minutes_applied": self.minutes_applied,
+            "gaps": self.gaps,
+            "resets": self.resets,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+def aggregate_columns(columns: Dict[str, np.ndarray], interval: str) -> Dict[str, np.ndarray]:
+    """
+    Векторно собрать свечи интервала из минутных колонок.
+    
+    Args:
+        columns: Колонки минутных свечей (как KlineStore.read)
+        interval: Целевой интервал из INTERVAL_MS
+        
+    Returns:
+        Колонки свечей интервала (включая неполные свечи на краях)
+    """
+    interval_ms = INTERVAL_MS[interval]
+    open_time = np.asarray(columns["open_time"])
+    if len(open_time) == 0:
+        return {name: np.empty(0, dtype=dtype) for name, dtype in KLINE_COLUMNS}
+    
+    bucket = open_time - open_time % interval_ms
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(open_time)] - 1
+    
+    result = {
+        "open_time": bucket[starts],
+        "open": np.asarray(columns["open"])[starts],
+        "high": np.maximum.reduceat(columns["high"], starts),
+        "low": np.minimum.reduceat(columns["low"], starts),
+        "close": np.asarray(columns["close"])[ends],
+        "close_time": bucket[starts] + interval_ms - 1,
+    }
+    for name in ("volume", "quote_volume", "trades", "taker_buy_base", "taker_buy_quote"):
+        result[name] = np.add.reduceat(columns[name], starts)
+    return {name: result[name].astype(dtype, copy=False) for name, dtype in KLINE_COLUMNS}
+
+
+def _complete_range(minutes: Dict[str, np.ndarray], buckets: Dict[str, np.ndarray], interval: str):
+    """Границы [first, end) свечей, у которых видны первая и последняя минута."""
+    count = len(buckets["open_time"])
+    if count == 0:
+        return 0, 0
+    first = 0 if minutes["open_time"][0] == buckets["open_time"][0] else 1
+    last_minute = buckets["open_time"][-1] + INTERVAL_MS[interval] - INTERVAL_MS[BASE_INTERVAL]
+    end = count if minutes["open_time"][-1] == last_minute else count - 1
+    return min(first, end), end
+
+
+def _columns_to_klines(columns: Dict[str, np.ndarray]) -> List[List[Any]]:
+    rows = [column.tolist() for column in (columns[name] for name, _ in KLINE_COLUMNS)]
+    return [list(row) + ["0"] for row in zip(*rows)]
+
+
+def read_candles(
+    store: KlineStore,
+    symbol: str,
+    interval: str,
+    start_time: Optional[int] = None,
+    end_time: Optional[int] = None
+) -> Candles:
+    """
+    Прочитать свечи интервала из хранилища.
+    
+    Если серии интервала в хранилище нет, она собирается из минутной истории;
+    неполные свечи на краях диапазона отбрасываются.
+    """
+    if store.count(symbol, interval) > 0 or interval not in AGGREGATED_INTERVALS:
+        return Candles.from_columns(store.read(symbol, interval, start_time=start_time, end_time=end_time))
+    
+    minutes = store.read(symbol, BASE_INTERVAL, start_time=start_time, end_time=end_time)
+    columns = aggregate_columns(minutes, interval)
+    first, end = _complete_range(minutes, columns, interval)
+    return Candles.from_columns({name: values[first:end] for name, values in columns.items()})
+
+
+def count_candles(store: KlineStore, symbol: str, interval: str) -> int:
+    """Сколько свечей интервала доступно в хранилище (напрямую или через минутную историю)."""
+    count = store.count(symbol, interval)
+    if count > 0 or interval not in AGGREGATED_INTERVALS:
+        return count
+    return store.count(symbol, BASE_INTERVAL) * INTERVAL_MS[BASE_INTERVAL] // INTERVAL_MS[interval]
@@ -0,0 +1,104 @@
+import logging
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class KlineCache:
+    """Кольцевые буферы свечей по (symbol, interval) с LRU вытеснением."""
+    
+    def __init__(self, max_candles: int = 1000, max_series: int = 64):
+        self.max_candles = max_candles
+        self.max_series = max_series
+        self._series: "OrderedDict[Tuple[str, str], Deque[List[Any]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.candles_fetched = 0
+        self.candles_served = 0
+    
+    def get(self, symbol: str, interval: str) -> Optional[Deque[List[Any]]]:
+        """Получить буфер серии и отметить его как недавно использованный."""
+        key = (symbol, interval)
+        buffer = self._series.get(key)
+        if buffer is not None:
+            self._series.move_to_end(key)
+        return buffer
+    
+    def last_open_time(self, symbol: str, interval: str) -> Optional[int]:
+        """Время открытия последней (возможно, еще не закрытой) свечи."""
+        buffer = self._series.get((symbol, interval))
+        if not buffer:
+            return None
+        return int(buffer[-1][0])
+    
+    def replace(self, symbol: str, interval: str, klines: List[List[Any]]):
+        """Заменить серию целиком (полная загрузка)."""
+        key = (symbol, interval)
+        self._series[key] = deque(klines, maxlen=self.max_candles)
+        self._series.move_to_end(key)
+        self.misses += 1
+        self.candles_fetched += len(klines)
+        self._evict()
+    
+    def merge(self, symbol: str, interval: str, klines: List[List[Any]]):
+        """
+        Добавить новые свечи в серию.
+        
+        Свечи с open_time не раньше первой новой свечи (в том числе незакрытая
+        последняя) заменяются пришедшими данными.
+        """
+        buffer = self._series.get((symbol, interval))
+        if buffer is None:
+            self.replace(symbol, interval, klines)
+            return
+        if klines:
+            first_open_time = int(klines[0][0])
+            while buffer and int(buffer[-1][0]) >= first_open_time:
+                buffer.pop()
+            buffer.extend(klines)
+        self.hits += 1
+        self.candles_fetched += len(klines)
+    
+    def push(self, symbol: str, interval: str, kline: List[Any]):
+        """
+        Применить одно обновление свечи из потока.
+        
+        Обновление незакрытой свечи заменяет ее, новая свеча добавляется в конец.
+        Пока серия не загружена через REST, обновления игнорируются.
+        """
+        buffer = self._series.get((symbol, interval))
+        if buffer is None:
+            return
+        open_time = int(kline[0])
+        if buffer and int(buffer[-1][0]) == open_time:
+            buffer[-1] = kline
+        elif not buffer or int(buffer[-1][0]) < open_time:
+            buffer.append(kline)
+    
+    def tail(self, symbol: str, interval: str, limit: int) -> List[List[Any]]:
+        """Последние limit свечей серии (пустой список, если серии нет в кэше)."""
+        buffer = self._series.get((symbol, interval))
+        if buffer is None:
+            return []
+        klines = list(buffer)[-limit:]
+        self.candles_served += len(klines)
+        return klines
+    
+    def _evict(self):
+        while len(self._series) > self.max_series:
+            key, _ = self._series.popitem(last=False)
+            self.evictions += 1
+            logger.info(f"Серия свечей {key} вытеснена из кэша")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика кэша свечей."""
+        return {
+            "series": len(self._series),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "candles_fetched": self.candles_fetched,
+            "candles_served": self.candles_served
+        }
@@ -0,0 +1,249 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import numpy as np
+from app.config import settings
+from app.services.market_data_client import BinanceMarketDataClient
+
+logger = logging.getLogger(__name__)
+
+# Колонки свечи Binance (без последнего поля "ignore") и их типы на диске
+KLINE_COLUMNS = [
+    ("open_time", np.int64),
+    ("open", np.float64),
+    ("high", np.float64),
+    ("low", np.float64),
+    ("close", np.float64),
+    ("volume", np.float64),
+    ("close_time", np.int64),
+    ("quote_volume", np.float64),
+    ("trades", np.int64),
+    ("taker_buy_base", np.float64),
+    ("taker_buy_quote", np.float64),
+]
+
+BINANCE_MAX_KLINES = 1000
+
+
+class KlineStore:
+    """
+    Колоночное хранилище исторических свечей на диске.
+    
+    Каждая серия (symbol, interval) хранится в своем каталоге: по одному
+    append-only бинарному файлу на колонку и meta.json с числом записанных
+    строк. Колонки сбрасываются на диск (fsync) раньше meta.json. Чтение
+    отдает np.memmap без копирования данных.
+    """
+    
+    def __init__(self, root: str = None):
+        self.root = Path(root or settings.HISTORY_STORE_PATH)
+    
+    def _series_dir(self, symbol: str, interval: str) -> Path:
+        return self.root / symbol.upper() / interval
+    
+    def _read_meta(self, symbol: str, interval: str) -> Dict[str, Any]:
+        """
+        Прочитать meta.json и сверить число строк с размерами файлов колонок.
+        
+        Если после сбоя в каком-то файле колонки меньше строк, чем записано в
+        meta.json, серия обрезается до строк, которые есть во всех колонках.
+        """
+        series_dir = self._series_dir(symbol, interval)
+        meta_path = series_dir / "meta.json"
+        if not meta_path.exists():
+            return {"count": 0, "last_open_time": None}
+        with open(meta_path) as f:
+            meta = json.load(f)
+        
+        available = min(
+            self._column_rows(series_dir / f"{name}.bin", dtype) for name, dtype in KLINE_COLUMNS
+        )
+        if available < meta["count"]:
+            logger.warning(
+                f"Серия {symbol} {interval}: в meta.json {meta['count']} свечей, "
+                f"в файлах колонок {available}, серия обрезана"
+            )
+            last_open_time = None
+            if available > 0:
+                open_time = np.memmap(series_dir / "open_time.bin", dtype=np.int64, mode="r", shape=(available,))
+                last_open_time = int(open_time[-1])
+            meta = {"count": available, "last_open_time": last_open_time}
+        return meta
+    
+    @staticmethod
+    def _column_rows(path: Path, dtype) -> int:
+        try:
+            return path.stat().st_size // np.dtype(dtype).itemsize
+        except FileNotFoundError:
+            return 0
+    
+    @staticmethod
+    def _fsync_dir(path: Path):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    
+    def _write_meta(self, symbol: str, interval: str, meta: Dict[str, Any]):
+        series_dir = self._series_dir(symbol, interval)
+        tmp_path = series_dir / "meta.json.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, series_dir / "meta.json")
+        self._fsync_dir(series_dir)
+    
+    def count(self, symbol: str, interval: str) -> int:
+        """Количество сохраненных свечей серии."""
+        return self._read_meta(symbol, interval)["count"]
+    
+    def last_open_time(self, symbol: str, interval: str) -> Optional[int]:
+        """open_time последней сохраненной свечи."""
+        return self._read_meta(symbol, interval)["last_open_time"]
+    
+    def append(self, symbol: str, interval: str, klines: List[List[Any]]) -> int:
+        """
+        Дописать закрытые свечи в серию.
+        
+        Свечи не новее последней сохраненной и еще не закрытые пропускаются.
+        
+        Args:
+            symbol: Торговая пара
+            interval: Интервал
+            klines: Свечи в формате Binance
+            
+        Returns:
+            Количество дописанных свечей
+        """
+        meta = self._read_meta(symbol, interval)
+        last_open_time = meta["last_open_time"]
+        now_ms = int(time.time() * 1000)
+        
+        rows = [
+            k for k in klines
+            if (last_open_time is None or int(k[0]) > last_open_time) and int(k[6]) < now_ms
+        ]
+        if not rows:
+            return 0
+        
+        series_dir = self._series_dir(symbol, interval)
+        series_dir.mkdir(parents=True, exist_ok=True)
+        
+        for index, (name, dtype) in enumerate(KLINE_COLUMNS):
+            values = np.array([row[index] for row in rows], dtype=np.float64).astype(dtype)
+            column_path = series_dir / f"{name}.bin"
+            with open(column_path, "ab") as f:
+                # Отбрасываем хвост, оставшийся от прерванной записи
+                f.truncate(meta["count"] * np.dtype(dtype).itemsize)
+                values.tofile(f)
+                f.flush()
+                os.fsync(f.fileno())
+        # Колонки на диске до meta.json: после сбоя meta не может ссылаться
+        # на строки, которых нет в файлах
+        self._fsync_dir(series_dir)
+        
+        meta = {"count": meta["count"] + len(rows), "last_open_time": int(rows[-1][0])}
+        self._write_meta(symbol, interval, meta)
+        return len(rows)
+    
+    def read(
+        self,
+        symbol: str,
+        interval: str,
+        start_time: Optional[int] = None,
+        end_time: Optional[int] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Прочитать серию как словарь колонок (memmap, без копирования).
+        
+        Args:
+            symbol: Торговая пара
+            interval: Интервал
+            start_time: Начало диапазона по open_time (мс, включительно)
+            end_time: Конец диапазона по open_time (мс, включительно)
+            
+        Returns:
+            Словарь {имя колонки: массив}; пустые массивы, если данных нет
+        """
+        count = self.count(symbol, interval)
+        if count == 0:
+            return {name: np.empty(0, dtype=dtype) for name, dtype in KLINE_COLUMNS}
+        
+        series_dir = self._series_dir(symbol, interval)
+        columns = {
+            name: np.memmap(series_dir / f"{name}.bin", dtype=dtype, mode="r", shape=(count,))
+            for name, dtype in KLINE_COLUMNS
+        }
+        
+        open_time = columns["open_time"]
+        start = 0 if start_time is None else int(np.searchsorted(open_time, start_time, side="left"))
+        end = count if end_time is None else int(np.searchsorted(open_time, end_time, side="right"))
+        return {name: values[start:end] for name, values in columns.items()}
+
+
+async def backfill_klines(
+    market_client: BinanceMarketDataClient,
+    store: KlineStore,
+    symbol: str,
+    interval: str,
+    start_time: int,
+    end_time: Optional[int] = None
+) -> int:
+    """
+    Загрузить историю свечей постранично (по 1000) и сохранить в хранилище.
+    
+    Загрузка продолжается с последней сохраненной свечи, поэтому прерванный
+    backfill можно просто запустить снова.
+    
+    Returns:
+        Количество сохраненных свечей
+    """
+    last_open_time = store.last_open_time(symbol, interval)
+    cursor = start_time if last_open_time is None else max(start_time, last_open_time + 1)
+    end_time = end_time or int(time.time() * 1000)
+    total = 0
+    
+    while cursor <= end_time:
+        klines = await market_client.get_klines_range(
+            symbol=symbol,
+            interval=interval,
+            start_time=cursor,
+            end_time=end_time,
+            limit=BINANCE_MAX_KLINES
+        )
+        if not klines:
+            break
+        total += store.append(symbol, interval, klines)
+        cursor = int(klines[-1][0]) + 1
+        if len(klines) < BINANCE_MAX_KLINES:
+            break
+    
+    logger.info(f"Backfill {symbol} {interval}: сохранено {total} свечей")
+    return total
+
+
+async def _main(args: argparse.Namespace):
+    market_client = BinanceMarketDataClient()
+    store = KlineStore(args.store)
+    start_time = int((time.time() - args.days * 86400) * 1000)
+    try:
+        await backfill_klines(market_client, store, args.symbol, args.interval, start_time)
+    finally:
+        await market_client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill исторических свечей Binance в локальное хранилище")
+    parser.add_argument("symbol")
+    parser.add_argument("interval")
+    parser.add_argument("--days", type=float, default=365)
+    parser.add_argument("--store", default=None)
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(parser.parse_args()))
@@ -1,16 +1,189 @@
+import asyncio
 import httpx
+import importlib.util
+import json
 import logging
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, Optional, Tuple
 from app.config import settings
+from app.services.candles import Candles
+from app.services.kline_cache import KlineCache
+from app.services.rate_limiter import ENDPOINT_WEIGHTS, RateLimitScheduler
 
 logger = logging.getLogger(__name__)
 
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+# Лимит догрузки новых свечей: небольшой лимит держит вес запроса минимальным
+KLINES_DELTA_LIMIT = 99
+
+RETRYABLE_STATUS_CODES = {418, 429, 500, 502, 503, 504}
+
+RequestKey = Tuple[str, Tuple[Tuple[str, Any], ...]]
+
+
+class LeaderCancelled(Exception):
+    """Запрос, к которому присоединились другие вызовы, был отменен."""
+
 
 class BinanceMarketDataClient:
     
-    def __init__(self, base_url: str = None):
+    def __init__(self, base_url: str = None, client: Optional[httpx.AsyncClient] = None):
         self.base_url = base_url or settings.BINANCE_BASE_URL
-        self.client = httpx.AsyncClient(timeout=10.0)
+        self.client = client or self._build_http_client()
+        self._requests_total = 0
+        self._connections_opened = 0
+        self.max_retries = settings.BINANCE_MAX_RETRIES
+        self.rate_limiter = RateLimitScheduler(
+            weight_limit=settings.BINANCE_WEIGHT_LIMIT,
+            safety_margin=settings.BINANCE_WEIGHT_SAFETY_MARGIN,
+            max_queue=settings.RATE_LIMIT_MAX_QUEUE,
+            max_wait=settings.RATE_LIMIT_MAX_WAIT,
+            backoff_base=settings.BINANCE_BACKOFF_BASE,
+            backoff_max=settings.BINANCE_BACKOFF_MAX
+        )
+        self.single_flight_ttl = settings.SINGLE_FLIGHT_TTL
+        self._inflight: Dict[RequestKey, asyncio.Future] = {}
+        self._recent: Dict[RequestKey, Tuple[float, bytes]] = {}
+        self._coalesced = 0
+        self._ttl_hits = 0
+        self.kline_cache: Optional[KlineCache] = None
+        if settings.KLINE_CACHE_ENABLED:
+            self.kline_cache = KlineCache(
+                max_candles=settings.KLINE_CACHE_MAX_CANDLES,
+                max_series=settings.KLINE_CACHE_MAX_SERIES
+            )
+    
+    def _build_http_client(self) -> httpx.AsyncClient:
+        """Создать HTTP клиент с пулом keep-alive соединений."""
+        http2 = settings.HTTP2_ENABLED
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("HTTP/2 включен, но пакет h2 не установлен. Используем HTTP/1.1")
+            http2 = False
+        
+        limits = httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY
+        )
+        timeout = httpx.Timeout(settings.HTTP_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT)
+        return httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2)
+    
+    async def _trace(self, event_name: str, info: Dict[str, Any]):
+        """Учет новых TCP соединений (httpcore trace extension)."""
+        if event_name == "connection.connect_tcp.started":
+            self._connections_opened += 1
+    
+    async def _get(self, path: str, params: Dict[str, Any]) -> Any:
+        """
+        Выполнить GET запрос к Binance с объединением одинаковых запросов.
+        
+        Одновременные вызовы с тем же (path, params) ждут один запрос к Binance.
+        При SINGLE_FLIGHT_TTL > 0 тело ответа еще столько секунд отдается из
+        памяти. Общим остается только тело ответа: каждый вызов разбирает его
+        заново и получает свой объект. Если первый вызов отменен, ожидающие
+        вызовы повторяют запрос сами.
+        """
+        key = (path, tuple(sorted(params.items())))
+        
+        while True:
+            recent = self._recent.get(key)
+            if recent is not None and recent[0] > time.monotonic():
+                self._ttl_hits += 1
+                return json_loads(recent[1])
+            
+            future = self._inflight.get(key)
+            if future is None:
+                break
+            self._coalesced += 1
+            try:
+                return json_loads(await asyncio.shield(future))
+            except LeaderCancelled:
+                continue
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            content = await self._request(path, params)
+        except asyncio.CancelledError:
+            future.set_exception(LeaderCancelled(f"Запрос {path} отменен"))
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        else:
+            future.set_result(content)
+            if self.single_flight_ttl > 0:
+                self._remember(key, content)
+            return json_loads(content)
+        finally:
+            self._inflight.pop(key, None)
+    
+    def _remember(self, key: RequestKey, content: bytes):
+        now = time.monotonic()
+        if len(self._recent) >= 1024:
+            self._recent = {k: v for k, v in self._recent.items() if v[0] > now}
+        self._recent[key] = (now + self.single_flight_ttl, content)
+    
+    async def _request(self, path: str, params: Dict[str, Any]) -> bytes:
+        """
+        Выполнить GET запрос к Binance и вернуть тело ответа.
+        
+        Запрос проходит через планировщик веса; 429/418, 5xx и сетевые ошибки
+        повторяются с экспоненциальной задержкой.
+        
+        Raises:
+            httpx.HTTPError: При ошибке запроса после всех повторов
+            RateLimitExceeded: Запрос отброшен планировщиком
+        """
+        url = f"{self.base_url}{path}"
+        weight = ENDPOINT_WEIGHTS.get(path, 1)
+        attempt = 0
+        
+        while True:
+            await self.rate_limiter.acquire(weight)
+            self._requests_total += 1
+            try:
+                response = await self.client.get(url, params=params, extensions={"trace": self._trace})
+            except httpx.TransportError as e:
+                if attempt >= self.max_retries:
+                    raise
+                logger.warning(f"Сетевая ошибка при запросе {path}: {e}, повтор")
+            else:
+                self.rate_limiter.update_from_response(response.status_code, response.headers)
+                if response.status_code not in RETRYABLE_STATUS_CODES or attempt >= self.max_retries:
+                    response.raise_for_status()
+                    return response.content
+                logger.warning(f"Binance вернул {response.status_code} для {path}, повтор")
+            
+            self.rate_limiter.retries += 1
+            await asyncio.sleep(self.rate_limiter.backoff_delay(attempt))
+            attempt += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Получить статистику переиспользования соединений.
+        
+        Returns:
+            Словарь с количеством запросов, новых и переиспользованных соединений
+        """
+        reused = max(0, self._requests_total - self._connections_opened)
+        return {
+            "requests_total": self._requests_total,
+            "connections_opened": self._connections_opened,
+            "connections_reused": reused,
+            "reuse_ratio": reused / self._requests_total if self._requests_total else 0.0,
+            "coalesced_requests": self._coalesced,
+            "ttl_hits": self._ttl_hits,
+            "rate_limiter": self.rate_limiter.get_stats(),
+            "kline_cache": self.kline_cache.get_stats() if self.kline_cache else None
+        }
     
     async def get_current_price(self, symbol: str) -> float:
         """
@@ -25,13 +198,10 @@ class BinanceMarketDataClient:
         Raises:
             httpx.HTTPError: При ошибке запроса
         """
-        url = f"{self.base_url}/api/v3/ticker/price"
         params = {"symbol": symbol}
         
         try:
-            response = await self.client.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
+            data = await self._get("/api/v3/ticker/price", params)
             price = float(data["price"])
             logger.info(f"Получена цена {symbol}: {price}")
             return price
@@ -63,24 +233,114 @@ class BinanceMarketDataClient:
         Raises:
             httpx.HTTPError: При ошибке запроса
         """
-        url = f"{self.base_url}/api/v3/klines"
-        params = {
-            "symbol": symbol,
-            "interval": interval,
-            "limit": limit
-        }
-        
         try:
-            response = await self.client.get(url, params=params)
-            response.raise_for_status()
-            klines = response.json()
+            if self.kline_cache is None or limit > self.kline_cache.max_candles:
+                klines = await self._fetch_klines(symbol, interval, limit)
+            else:
+                klines = await self._get_cached_klines(symbol, interval, limit)
             logger.info(f"Получено {len(klines)} свечей для {symbol}")
             return klines
         except httpx.HTTPError as e:
             logger.error(f"Ошибка при получении свечей {symbol}: {e}")
             raise
     
+    async def get_recent_candles(
+        self,
+        symbol: str,
+        interval: str = "1m",
+        limit: int = 100
+    ) -> Candles:
+        """
+        Получить последние свечи в виде типизированных массивов OHLCV.
+        
+        Args:
+            symbol: Торговая пара
+            interval: Интервал
+            limit: Количество свечей
+            
+        Returns:
+            Candles с непрерывными колонками float64
+        """
+        klines = await self.get_recent_klines(symbol=symbol, interval=interval, limit=limit)
+        return Candles.from_klines(klines)
+    
+    async def get_klines_range(
+        self,
+        symbol: str,
+        interval: str,
+        start_time: int,
+        end_time: Optional[int] = None,
+        limit: int = 1000
+    ) -> List[List[Any]]:
+        """
+        Получить свечи за диапазон времени без использования кэша.
+        
+        Args:
+            symbol: Торговая пара
+            interval: Интервал
+            start_time: Начало диапазона (open_time, мс)
+            end_time: Конец диапазона (мс)
+            limit: Максимум свечей в ответе (не больше 1000)
+            
+        Returns:
+            Список свечей в формате Binance
+        """
+        try:
+            return await self._fetch_klines(symbol, interval, limit, start_time=start_time, end_time=end_time)
+        except httpx.HTTPError as e:
+            logger.error(f"Ошибка при получении свечей {symbol}: {e}")
+            raise
+    
+    async def _fetch_klines(
+        self,
+        symbol: str,
+        interval: str,
+        limit: int,
+        start_time: Optional[int] = None,
+        end_time: Optional[int] = None
+    ) -> List[List[Any]]:
+        params = {
+            "symbol": symbol,
+            "interval": interval,
+            "limit": limit
+        }
+        if start_time is not None:
+            params["startTime"] = start_time
+        if end_time is not None:
+            params["endTime"] = end_time
+        return await self._get("/api/v3/klines", params)
+    
+    async def _get_cached_klines(self, symbol: str, interval: str, limit: int) -> List[List[Any]]:
+        """
+        Получить свечи через кэш, догружая только новые.
+        
+        Запрос начинается с open_time последней свечи в кэше, поэтому
+        незакрытая свеча приходит заново и заменяет устаревшую версию.
+        Между записью в кэш и чтением из него нет await, поэтому серия не
+        может быть вытеснена до чтения.
+        """
+        cache = self.kline_cache
+        buffer = cache.get(symbol, interval)
+        
+        if buffer is None or len(buffer) < limit:
+            klines = await self._fetch_klines(symbol, interval, limit)
+            cache.replace(symbol, interval, klines)
+            return cache.tail(symbol, interval, limit)
+        
+        new_klines = await self._fetch_klines(
+            symbol, interval, KLINES_DELTA_LIMIT,
+            start_time=cache.last_open_time(symbol, interval)
+        )
+        # Пока шел запрос, серию могли вытеснить параллельные запросы других серий
+        evicted = cache.get(symbol, interval) is None
+        if evicted or len(new_klines) >= KLINES_DELTA_LIMIT:
+            # Пропущено больше свечей, чем помещается в один ответ: загружаем заново
+            klines = await self._fetch_klines(symbol, interval, limit)
+            cache.replace(symbol, interval, klines)
+        else:
+            cache.merge(symbol, interval, new_klines)
+        return cache.tail(symbol, interval, limit)
+    
     async def close(self):
         """Закрыть HTTP клиент."""
         await self.client.aclose()
-
@@ -0,0 +1,167 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from typing import Any, Dict, List, Optional
+import websockets
+from app.config import settings
+from app.services.kline_cache import KlineCache
+from app.services.market_data_client import BinanceMarketDataClient
+
+logger = logging.getLogger(__name__)
+
+
+class BinanceMarketStream:
+    """
+    Потоковое получение kline и bookTicker через WebSocket Binance.
+    
+    Последние цены и буферы свечей хранятся в памяти. После каждого
+    (пере)подключения пропущенные свечи догружаются через REST.
+    """
+    
+    def __init__(
+        self,
+        market_client: BinanceMarketDataClient,
+        symbols: List[str],
+        interval: str = "1m",
+        ws_url: str = None,
+        buffer_size: int = 100
+    ):
+        self.market_client = market_client
+        self.symbols = [symbol.upper() for symbol in symbols]
+        self.interval = interval
+        self.ws_url = ws_url or settings.BINANCE_WS_URL
+        self.buffer_size = buffer_size
+        self.cache = market_client.kline_cache or KlineCache(
+            max_candles=max(buffer_size, settings.KLINE_CACHE_MAX_CANDLES),
+            max_series=max(len(self.symbols), settings.KLINE_CACHE_MAX_SERIES)
+        )
+        self.stale_after = settings.STREAM_STALE_AFTER
+        self.reconnect_max_delay = settings.STREAM_RECONNECT_MAX_DELAY
+        self._prices: Dict[str, float] = {}
+        self._price_updated: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.connected = False
+        self.messages = 0
+        self.reconnects = 0
+        self.backfills = 0
+        self.last_message_at = 0.0
+    
+    @property
+    def stream_url(self) -> str:
+        streams = []
+        for symbol in self.symbols:
+            name = symbol.lower()
+            streams.append(f"{name}@kline_{self.interval}")
+            streams.append(f"{name}@bookTicker")
+        return f"{self.ws_url}/stream?streams={'/'.join(streams)}"
+    
+    async def start(self):
+        """Запустить фоновое чтение потока."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Запущен поток рыночных данных для {self.symbols}")
+    
+    async def stop(self):
+        """Остановить фоновое чтение потока."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.connected = False
+    
+    async def _run(self):
+        attempt = 0
+        while True:
+            try:
+                async with websockets.connect(self.stream_url, ping_interval=20) as ws:
+                    # Сообщения копятся в сокете, пока идет догрузка через REST
+                    await self._backfill()
+                    self.connected = True
+                    attempt = 0
+                    logger.info("WebSocket Binance подключен")
+                    async for raw in ws:
+                        self._handle_message(raw)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Поток Binance прерван: {e}")
+            finally:
+                self.connected = False
+            
+            self.reconnects += 1
+            delay = random.uniform(0, min(self.reconnect_max_delay, 2 ** attempt))
+            attempt += 1
+            await asyncio.sleep(delay)
+    
+    async def _backfill(self):
+        """Догрузить свечи и цены через REST (после пропуска в потоке)."""
+        for symbol in self.symbols:
+            klines = await self.market_client.get_recent_klines(
+                symbol=symbol,
+                interval=self.interval,
+                limit=self.buffer_size
+            )
+            if self.market_client.kline_cache is None:
+                self.cache.replace(symbol, self.interval, klines)
+            self._set_price(symbol, await self.market_client.get_current_price(symbol))
+        self.backfills += 1
+    
+    def _handle_message(self, raw: Any):
+        message = json.loads(raw)
+        data = message.get("data", message)
+        self.messages += 1
+        self.last_message_at = time.monotonic()
+        
+        if data.get("e") == "kline":
+            k = data["k"]
+            kline = [
+                k["t"], k["o"], k["h"], k["l"], k["c"], k["v"],
+                k["T"], k["q"], k["n"], k["V"], k["Q"], k.get("B", "0")
+            ]
+            self.cache.push(data["s"], k["i"], kline)
+        elif "b" in data and "a" in data:
+            bid = float(data["b"])
+            ask = float(data["a"])
+            self._set_price(data["s"], (bid + ask) / 2)
+    
+    def _set_price(self, symbol: str, price: float):
+        self._prices[symbol] = price
+        self._price_updated[symbol] = time.monotonic()
+    
+    def _is_fresh(self, symbol: str) -> bool:
+        updated = self._price_updated.get(symbol)
+        return self.connected and updated is not None and time.monotonic() - updated < self.stale_after
+    
+    def get_price(self, symbol: str) -> Optional[float]:
+        """Последняя цена из потока или None, если данных нет или они устарели."""
+        if not self._is_fresh(symbol):
+            return None
+        return self._prices[symbol]
+    
+    def get_klines(self, symbol: str, interval: str, limit: int) -> Optional[List[List[Any]]]:
+        """Последние свечи из памяти или None, если поток не покрывает запрос."""
+        if interval != self.interval or not self._is_fresh(symbol):
+            return None
+        buffer = self.cache.get(symbol, interval)
+        if buffer is None or len(buffer) < limit:
+            return None
+        return self.cache.tail(symbol, interval, limit)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика потока."""
+        return {
+            "symbols": self.symbols,
+            "interval": self.interval,
+            "connected": self.connected,
+            "messages": self.messages,
+            "reconnects": self.reconnects,
+            "backfills": self.backfills,
+            "last_message_age_seconds": (
+                time.monotonic() - self.last_message_at if self.last_message_at else None
+            )
+        }
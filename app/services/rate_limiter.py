@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Dict, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+# Вес публичных эндпойнтов Binance (запрос с одним symbol)
+ENDPOINT_WEIGHTS: Dict[str, int] = {
+    "/api/v3/ticker/price": 2,
+    "/api/v3/klines": 2,
+}
+
+USED_WEIGHT_HEADER = "x-mbx-used-weight-1m"
+
+
+class RateLimitExceeded(Exception):
+    """Запрос отброшен планировщиком, чтобы не превысить лимит Binance."""
+
+
+class RateLimitScheduler:
+    """
+    Token bucket по весу запросов Binance.
+    
+    Бюджет пополняется равномерно в течение минуты и синхронизируется с
+    заголовком X-MBX-USED-WEIGHT-1M. После 429/418 запросы ждут Retry-After.
+    """
+    
+    def __init__(
+        self,
+        weight_limit: int = 6000,
+        safety_margin: float = 0.9,
+        max_queue: int = 100,
+        max_wait: float = 10.0,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0
+    ):
+        self.capacity = weight_limit * safety_margin
+        self.refill_rate = weight_limit / 60.0
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.tokens = self.capacity
+        self.used_weight: Optional[int] = None
+        self.banned_until = 0.0
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.waits = 0
+        self.total_wait_time = 0.0
+        self.shed = 0
+        self.retries = 0
+        self.throttled = 0
+    
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated_at) * self.refill_rate)
+        self._updated_at = now
+    
+    def _delay_for(self, weight: int, now: float) -> float:
+        if self.banned_until > now:
+            return self.banned_until - now
+        if self.tokens >= weight:
+            return 0.0
+        return (weight - self.tokens) / self.refill_rate
+    
+    async def acquire(self, weight: int = 1):
+        """
+        Дождаться бюджета на запрос с указанным весом.
+        
+        Raises:
+            RateLimitExceeded: Очередь переполнена или ожидание дольше max_wait
+        """
+        if self.queue_depth >= self.max_queue:
+            self._shed(f"очередь переполнена ({self.queue_depth})")
+        
+        self.queue_depth += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        started = time.monotonic()
+        try:
+            async with self._lock:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    delay = self._delay_for(weight, now)
+                    if delay <= 0:
+                        break
+                    if now - started + delay > self.max_wait:
+                        self._shed(f"ожидание {delay:.1f}с превышает лимит")
+                    await asyncio.sleep(delay)
+                self.tokens -= weight
+        finally:
+            self.queue_depth -= 1
+            waited = time.monotonic() - started
+            if waited > 0.001:
+                self.waits += 1
+                self.total_wait_time += waited
+    
+    def _shed(self, reason: str):
+        self.shed += 1
+        logger.warning(f"Запрос к Binance отброшен: {reason}")
+        raise RateLimitExceeded(f"Binance rate limit: {reason}")
+    
+    def update_from_response(self, status_code: int, headers: Mapping[str, str]):
+        """Обновить состояние по заголовкам и статусу ответа Binance."""
+        used = headers.get(USED_WEIGHT_HEADER)
+        if used is not None and used.isdigit():
+            self.used_weight = int(used)
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens = min(self.tokens, self.capacity - self.used_weight)
+        
+        if status_code in (418, 429):
+            self.throttled += 1
+            retry_after = self._parse_retry_after(headers)
+            self.banned_until = max(self.banned_until, time.monotonic() + retry_after)
+            logger.warning(f"Binance вернул {status_code}, пауза {retry_after:.1f}с")
+    
+    def _parse_retry_after(self, headers: Mapping[str, str]) -> float:
+        value = headers.get("retry-after")
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return self.backoff_max
+    
+    def backoff_delay(self, attempt: int) -> float:
+        """Экспоненциальная задержка с полным jitter."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика планировщика запросов."""
+        self._refill(time.monotonic())
+        return {
+            "tokens_available": round(self.tokens, 2),
+            "used_weight_1m": self.used_weight,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "waits": self.waits,
+            "avg_wait_seconds": self.total_wait_time / self.waits if self.waits else 0.0,
+            "total_wait_seconds": self.total_wait_time,
+            "shed": self.shed,
+            "retries": self.retries,
+            "throttled_responses": self.throttled,
+            "banned_for_seconds": max(0.0, self.banned_until - time.monotonic())
+        }
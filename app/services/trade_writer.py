@@ -0,0 +1,310 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db_models.db import AsyncSessionLocal
+from app.db_models.trade_entity import Trade
+
+logger = logging.getLogger(__name__)
+
+# Метка конца очереди: stop() ставит ее после всех сделок
+_STOP = object()
+
+# Колонки Trade с датой: в файле отложенных сделок хранятся строкой ISO 8601
+_DATETIME_COLUMNS = ("timestamp",)
+
+
+def _encode_row(row: Dict[str, Any]) -> str:
+    return json.dumps({
+        name: value.isoformat() if isinstance(value, datetime) else value for name, value in row.items()
+    })
+
+
+def _decode_row(line: str) -> Dict[str, Any]:
+    row = json.loads(line)
+    for name in _DATETIME_COLUMNS:
+        if isinstance(row.get(name), str):
+            row[name] = datetime.fromisoformat(row[name])
+    return row
+
+
+class TradeWriter:
+    """
+    Отложенная пакетная запись сделок (write-behind).
+    
+    ExecutionAgent кладет строки сделок в ограниченную очередь и сразу
+    возвращает результат; фоновая задача пишет их одним INSERT на пакет и
+    одним commit, когда набралось batch_size строк или с первой строки
+    пакета прошло flush_interval секунд. Запись идет через асинхронную
+    сессию и не блокирует event loop. Если очередь заполнена, submit ждет
+    свободного места (backpressure). stop() дописывает все, что уже в очереди.
+    
+    Пакет, который не удалось записать и после max_retries повторов,
+    дописывается в файл spill_path (JSON Lines) и повторно записывается в БД
+    при следующем start(); без spill_path он отбрасывается.
+    """
+    
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession] = AsyncSessionLocal,
+        max_queue: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 0.2,
+        max_retries: int = 3,
+        spill_path: Optional[str] = None
+    ):
+        self.session_factory = session_factory
+        self.max_queue = max_queue
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.spill_path = spill_path
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        # Сделок из очереди обработано (записано, сохранено в файл или отброшено)
+        self._processed = 0
+        self._progress = asyncio.Condition()
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.max_queue_depth = 0
+        self.backpressure_waits = 0
+        self.backpressure_time = 0.0
+        self.total_flush_time = 0.0
+        self.max_flush_time = 0.0
+    
+    async def start(self):
+        """Запустить фоновую запись."""
+        if self._task is None:
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+            logger.info(
+                f"Запущена пакетная запись сделок: пакет {self.batch_size}, "
+                f"интервал {self.flush_interval} с, очередь {self.max_queue}"
+            )
+    
+    async def stop(self):
+        """Дописать очередь в БД и остановить фоновую запись."""
+        if self._task is None:
+            return
+        self._closing = True
+        if not self._task.done():
+            # Метка встает за сделками, уже ждущими места в очереди
+            await self._queue.put(_STOP)
+        try:
+            await self._task
+        except Exception as e:
+            logger.error(f"Фоновая запись сделок завершилась с ошибкой: {e}")
+        self._task = None
+        logger.info(f"Пакетная запись сделок остановлена, статистика: {self.get_stats()}")
+    
+    async def submit(self, row: Dict[str, Any]):
+        """
+        Поставить сделку в очередь записи.
+        
+        Args:
+            row: Значения колонок Trade
+            
+        Raises:
+            RuntimeError: Если запись остановлена
+        """
+        if self._task is None or self._closing:
+            raise RuntimeError("Пакетная запись сделок не запущена")
+        if self._queue.full():
+            self.backpressure_waits += 1
+            started = time.perf_counter()
+            await self._queue.put(row)
+            self.backpressure_time += time.perf_counter() - started
+        else:
+            self._queue.put_nowait(row)
+        self.enqueued += 1
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+    
+    async def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Дождаться обработки сделок, поставленных в очередь до вызова.
+        
+        Ждет только до отметки enqueued на момент вызова, поэтому не зависает
+        при непрерывном потоке новых сделок.
+        
+        Args:
+            timeout: Максимальное ожидание в секундах (None - без ограничения)
+            
+        Returns:
+            True, если все сделки до отметки записаны (или сохранены в spill_path)
+        """
+        if self._task is None:
+            return True
+        watermark = self.enqueued
+        async with self._progress:
+            try:
+                await asyncio.wait_for(self._progress.wait_for(lambda: self._processed >= watermark), timeout)
+            except asyncio.TimeoutError:
+                return False
+        return True
+    
+    async def _run(self):
+        await self._replay_spill()
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            row = await self._queue.get()
+            if row is _STOP:
+                break
+            batch = [row]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                if not self._queue.empty():
+                    row = self._queue.get_nowait()
+                else:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0 or self._closing:
+                        break
+                    try:
+                        row = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if row is _STOP:
+                    stopping = True
+                    break
+                batch.append(row)
+            
+            try:
+                await self._write_batch(batch)
+            finally:
+                async with self._progress:
+                    self._processed += len(batch)
+                    self._progress.notify_all()
+    
+    async def _write_batch(self, batch: List[Dict[str, Any]]):
+        for attempt in range(self.max_retries + 1):
+            started = time.perf_counter()
+            try:
+                await self._insert(batch)
+            except Exception as e:
+                self.failed_batches += 1
+                if attempt == self.max_retries:
+                    await self._give_up(batch, e, attempt + 1)
+                    return
+                logger.warning(f"Ошибка записи пакета из {len(batch)} сделок (попытка {attempt + 1}): {e}")
+                await asyncio.sleep(0.1 * 2 ** attempt)
+                continue
+            
+            elapsed = time.perf_counter() - started
+            self.written += len(batch)
+            self.batches += 1
+            self.total_flush_time += elapsed
+            self.max_flush_time = max(self.max_flush_time, elapsed)
+            return
+    
+    async def _give_up(self, batch: List[Dict[str, Any]], error: Exception, attempts: int):
+        if self.spill_path:
+            try:
+                await asyncio.to_thread(self._spill, batch)
+                self.spilled += len(batch)
+                logger.error(
+                    f"Пакет из {len(batch)} сделок не записан после {attempts} попыток ({error}), "
+                    f"сохранен в {self.spill_path}"
+                )
+                return
+            except OSError as e:
+                logger.error(f"Не удалось сохранить пакет сделок в {self.spill_path}: {e}")
+        self.dropped += len(batch)
+        logger.error(f"Пакет из {len(batch)} сделок не записан после {attempts} попыток и отброшен: {error}")
+    
+    def _spill(self, batch: List[Dict[str, Any]]):
+        path = Path(self.spill_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a") as f:
+            f.write("".join(_encode_row(row) + "\n" for row in batch))
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def _take_spilled(self, replay_path: Path) -> List[Dict[str, Any]]:
+        """Перенести файл отложенных сделок в replay_path и прочитать строки."""
+        spill_path = Path(self.spill_path)
+        if spill_path.exists():
+            if replay_path.exists():
+                # Прошлый повтор прервался: дописываем новые сделки к нему
+                with open(replay_path, "a") as replay, open(spill_path) as spill:
+                    replay.write(spill.read())
+                    replay.flush()
+                    os.fsync(replay.fileno())
+                spill_path.unlink()
+            else:
+                os.replace(spill_path, replay_path)
+        if not replay_path.exists():
+            return []
+        with open(replay_path) as f:
+            # Последняя строка может быть оборвана сбоем во время записи
+            return [_decode_row(line) for line in f if line.endswith("\n")]
+    
+    async def _replay_spill(self):
+        """Записать в БД сделки, отложенные в spill_path при прошлых сбоях."""
+        if not self.spill_path:
+            return
+        replay_path = Path(f"{self.spill_path}.replay")
+        try:
+            rows = await asyncio.to_thread(self._take_spilled, replay_path)
+        except (OSError, ValueError) as e:
+            logger.error(f"Не удалось прочитать отложенные сделки из {self.spill_path}: {e}")
+            return
+        if not rows:
+            await asyncio.to_thread(replay_path.unlink, missing_ok=True)
+            return
+        
+        logger.info(f"Повторная запись {len(rows)} отложенных сделок из {self.spill_path}")
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            try:
+                # Повтор мог прерваться после части пакетов: записанные order_id пропускаем
+                async with self.session_factory() as session:
+                    result = await session.execute(
+                        select(Trade.order_id).where(Trade.order_id.in_([row["order_id"] for row in batch]))
+                    )
+                    existing = set(result.scalars())
+            except Exception as e:
+                logger.warning(f"Не удалось проверить отложенные сделки в БД: {e}")
+                existing = set()
+            batch = [row for row in batch if row["order_id"] not in existing]
+            if batch:
+                written = self.written
+                await self._write_batch(batch)
+                self.replayed += self.written - written
+        await asyncio.to_thread(replay_path.unlink)
+    
+    async def _insert(self, batch: List[Dict[str, Any]]):
+        async with self.session_factory() as session:
+            await session.execute(insert(Trade), batch)
+            await session.commit()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика записи."""
+        return {
+            "queue_depth": self._queue.qsize(),
+            "max_queue": self.max_queue,
+            "max_queue_depth": self.max_queue_depth,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "batches": self.batches,
+            "avg_batch_size": round(self.written / self.batches, 1) if self.batches else 0.0,
+            "failed_batches": self.failed_batches,
+            "dropped": self.dropped,
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+            "backpressure_waits": self.backpressure_waits,
+            "backpressure_seconds": round(self.backpressure_time, 6),
+            "avg_flush_seconds": round(self.total_flush_time / self.batches, 6) if self.batches else 0.0,
+            "max_flush_seconds": round(self.max_flush_time, 6)
+        }
@@ -0,0 +1,168 @@
+"""
+Бенчмарк форматов артефакта модели.
+
+Сравнивает сохранение в pickle (RandomForestClassifier + StandardScaler) и
+артефакт с массивами скомпилированного леса (app.ml.model_artifact):
+размер файла, время загрузки в чистом процессе, прирост RSS (анонимная
+память процесса и страницы файла) и суммарный PSS нескольких процессов,
+загрузивших одну и ту же модель (как воркеры uvicorn).
+
+Запуск: python -m benchmarks.bench_artifact [--trees 200] [--klines 20000] [--workers 4]
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+import numpy as np
+
+# Режимы загрузки: переменные окружения дочернего процесса
+MODES = {
+    "pickle": {"MODEL_COMPILE_FOREST": "false", "MODEL_ALLOW_PICKLE": "true"},
+    "pickle+compile": {"MODEL_COMPILE_FOREST": "true", "MODEL_ALLOW_PICKLE": "true"},
+    "arrays (read)": {"MODEL_ARTIFACT_MMAP": "false", "MODEL_ARTIFACT_VERIFY": "true"},
+    "arrays (mmap)": {"MODEL_ARTIFACT_MMAP": "true", "MODEL_ARTIFACT_VERIFY": "true"},
+    "arrays (mmap, no sha)": {"MODEL_ARTIFACT_MMAP": "true", "MODEL_ARTIFACT_VERIFY": "false"},
+}
+
+
+def read_status() -> Dict[str, int]:
+    """RssAnon и RssFile текущего процесса в КБ."""
+    values = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            name, _, rest = line.partition(":")
+            if name in ("RssAnon", "RssFile"):
+                values[name] = int(rest.split()[0])
+    return values
+
+
+def read_pss(pid: int) -> int:
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            if line.startswith("Pss:"):
+                return int(line.split()[1])
+    return 0
+
+
+def child(path: str):
+    """Загрузить модель, вывести замеры и ждать строки в stdin перед выходом."""
+    logging.disable(logging.WARNING)
+    from app.ml.model_loader import ModelLoader
+    
+    before = read_status()
+    start = time.perf_counter()
+    model_loader = ModelLoader()
+    model_loader.load_model(path)
+    load_seconds = time.perf_counter() - start
+    # Один прогноз, чтобы страницы модели были в памяти процесса
+    row = np.zeros((1, len(model_loader.feature_columns)))
+    if model_loader.compiled is not None:
+        model_loader.compiled.predict_proba(row)
+    else:
+        model_loader.model.predict_proba(model_loader.scaler.transform(row))
+    after = read_status()
+    
+    print(json.dumps({
+        "load_seconds": load_seconds,
+        "rss_anon_kb": after["RssAnon"] - before["RssAnon"],
+        "rss_file_kb": after["RssFile"] - before["RssFile"]
+    }), flush=True)
+    sys.stdin.readline()
+
+
+def spawn(path: str, env: Dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.bench_artifact", "--child", path],
+        env={**os.environ, **env},
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True
+    )
+
+
+def run_workers(path: str, env: Dict[str, str], workers: int) -> List[Dict[str, float]]:
+    """Запустить workers процессов одновременно, вернуть их замеры и PSS."""
+    processes = [spawn(path, env) for _ in range(workers)]
+    results = [json.loads(process.stdout.readline()) for process in processes]
+    for process, result in zip(processes, results):
+        result["pss_kb"] = read_pss(process.pid)
+    for process in processes:
+        process.communicate("\n")
+    return results
+
+
+def train_large_model(n_klines: int, n_trees: int):
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import StandardScaler
+    from app.ml.model_loader import ModelLoader
+    from app.ml.training_data import build_training_arrays
+    from app.services.candles import Candles
+    from benchmarks.bench_features import make_klines
+    
+    model_loader = ModelLoader(threshold_percent=0.02)
+    candles = Candles.from_klines(make_klines(n_klines))
+    X, y = build_training_arrays(candles, model_loader.feature_columns, model_loader.threshold_percent)
+    model_loader.scaler = StandardScaler()
+    model_loader.model = RandomForestClassifier(n_estimators=n_trees, random_state=42, n_jobs=-1)
+    model_loader.model.fit(model_loader.scaler.fit_transform(X), y)
+    model_loader._on_model_ready()
+    return model_loader, X
+
+
+def check_parity(model_loader, path: str, X: np.ndarray):
+    from app.ml.model_artifact import load_artifact
+    
+    compiled = load_artifact(path)[0]["model"]
+    expected = model_loader.model.predict_proba(model_loader.scaler.transform(X))
+    np.testing.assert_allclose(compiled.predict_proba(X), expected, rtol=0, atol=1e-12)
+    print(f"parity: OK (artifact vs sklearn, {len(X)} rows)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trees", type=int, default=200)
+    parser.add_argument("--klines", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child)
+        return
+    logging.disable(logging.WARNING)
+    
+    model_loader, X = train_large_model(args.klines, args.trees)
+    print(f"model: {args.trees} trees, {model_loader.compiled.n_nodes} nodes")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {
+            "pickle": os.path.join(tmp, "model.pkl"),
+            "arrays": os.path.join(tmp, "model.bin"),
+        }
+        model_loader.save_model(paths["pickle"], artifact_format="pickle")
+        model_loader.save_model(paths["arrays"], artifact_format="arrays")
+        check_parity(model_loader, paths["arrays"], X[-2000:])
+        for name, path in paths.items():
+            print(f"{name} file: {os.path.getsize(path) / 1e6:.1f} MB")
+        
+        print(
+            f"{'mode':>22} {'load':>9} {'RssAnon':>9} {'RssFile':>9} "
+            f"{f'PSS x{args.workers}':>10}"
+        )
+        for mode, env in MODES.items():
+            path = paths["pickle"] if mode.startswith("pickle") else paths["arrays"]
+            single = run_workers(path, env, 1)[0]
+            group = run_workers(path, env, args.workers)
+            print(
+                f"{mode:>22} {single['load_seconds'] * 1e3:>7.1f}ms "
+                f"{single['rss_anon_kb'] / 1024:>7.1f}MB {single['rss_file_kb'] / 1024:>7.1f}MB "
+                f"{sum(r['pss_kb'] for r in group) / 1024:>8.1f}MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
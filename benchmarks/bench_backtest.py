@@ -0,0 +1,125 @@
+"""
+Бенчмарк walk-forward бэктеста (app.ml.backtest).
+
+Сравнивает векторную симуляцию исполнения и PnL с построчным циклом по
+правилам ExecutionAgent (и проверяет совпадение результатов), затем
+прогоняет полный бэктест (обучение, прогноз, симуляция) на 1M и 10M
+синтетических свечей в одном процессе и в пуле процессов.
+
+Запуск: python -m benchmarks.bench_backtest [--sizes 1000000 10000000] [--train 2000] [--test 250000] [--workers 4]
+"""
+import argparse
+import logging
+import time
+from typing import Tuple
+import numpy as np
+from app.agents.execution_agent import MIN_CONFIDENCE, SLIPPAGE
+from app.ml.backtest import STATUS_FILLED, execute, max_drawdown, run_backtest, simulate
+from app.services.candles import Candles
+from benchmarks.bench_indicators import format_time, make_candles
+
+THRESHOLD_PERCENT = 0.02
+
+
+def loop_simulate(
+    close: np.ndarray,
+    next_close: np.ndarray,
+    direction: np.ndarray,
+    confidence: np.ndarray
+) -> Tuple[np.ndarray, int]:
+    """Построчная симуляция: решение ExecutionAgent для каждой свечи и учет позиции."""
+    returns = np.empty(len(close))
+    position = 0.0
+    hits = 0
+    for i in range(len(close)):
+        target = position
+        if direction[i] != 0 and confidence[i] >= MIN_CONFIDENCE:
+            execution_price = close[i] + close[i] * SLIPPAGE if direction[i] > 0 else close[i] - close[i] * SLIPPAGE
+            if direction[i] * (next_close[i] - execution_price) > 0:
+                hits += 1
+            target = 1.0 if direction[i] > 0 else -1.0
+        cost = abs(target - position) * SLIPPAGE
+        position = target
+        if i == len(close) - 1:
+            cost += abs(position) * SLIPPAGE
+        returns[i] = position * (next_close[i] / close[i] - 1.0) - cost
+    return returns, hits
+
+
+def make_price_candles(n: int, seed: int = 0) -> Candles:
+    """Свечи с геометрическим случайным блужданием: на 10M свечей цена остается положительной."""
+    candles = make_candles(n, seed)
+    rng = np.random.default_rng(seed + 1)
+    scale = np.exp(np.cumsum(rng.normal(0, 0.0007, n))) * 30000 / candles.close
+    for column in (candles.open, candles.high, candles.low, candles.close):
+        column *= scale
+    return candles
+
+
+def make_signals(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.001, n + 1)))
+    direction = rng.choice(np.array([-1, 0, 1], dtype=np.int8), size=n)
+    confidence = rng.uniform(0.34, 1.0, size=n)
+    return close[:-1], close[1:], direction, confidence
+
+
+def vectorized(close, next_close, direction, confidence):
+    status = execute(direction, confidence)
+    result = simulate(close, next_close, direction, status)
+    return result["returns"], int(np.sum(result["hits"])), status
+
+
+def check_parity(n: int = 20000):
+    close, next_close, direction, confidence = make_signals(n)
+    expected_returns, expected_hits = loop_simulate(close, next_close, direction, confidence)
+    returns, hits, status = vectorized(close, next_close, direction, confidence)
+    np.testing.assert_allclose(returns, expected_returns, rtol=0, atol=1e-15)
+    assert hits == expected_hits
+    print(
+        f"parity: OK ({n} rows, {int(np.sum(status == STATUS_FILLED))} fills, "
+        f"return {np.prod(1 + returns) - 1:.4f}, drawdown {max_drawdown(returns):.4f})"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000000, 10000000])
+    parser.add_argument("--train", type=int, default=2000)
+    parser.add_argument("--test", type=int, default=250000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    
+    check_parity()
+    
+    print(f"\n{'rows':>10} {'loop':>10} {'vectorized':>11}  (execution + PnL accounting)")
+    for n in (100000, 1000000):
+        signals = make_signals(n)
+        start = time.perf_counter()
+        loop_simulate(*signals)
+        loop_time = time.perf_counter() - start
+        start = time.perf_counter()
+        vectorized(*signals)
+        print(f"{n:>10} {format_time(loop_time):>10} {format_time(time.perf_counter() - start):>11}")
+    
+    print(
+        f"\n{'candles':>10} {'windows':>8} {'workers':>8} {'time':>9} {'return':>9} "
+        f"{'drawdown':>9} {'hit rate':>9} {'filled':>9}"
+    )
+    for n in args.sizes:
+        candles = make_price_candles(n)
+        for workers in dict.fromkeys((1, args.workers)):
+            report = run_backtest(
+                candles, args.train, args.test, threshold_percent=THRESHOLD_PERCENT, workers=workers
+            )
+            hit_rate = f"{report['hit_rate']:.3f}" if report['hit_rate'] is not None else "-"
+            print(
+                f"{n:>10} {report['windows']:>8} {workers:>8} {format_time(report['seconds']):>9} "
+                f"{report['total_return']:>9.4f} {report['max_drawdown']:>9.4f} {hit_rate:>9} {report['filled']:>9}"
+            )
+        del candles
+
+
+if __name__ == "__main__":
+    main()
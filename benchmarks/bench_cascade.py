@@ -0,0 +1,77 @@
+"""
+Бенчмарк каскадного инференса.
+
+Печатает кривую, посчитанную при обучении (покрытие первой ступени,
+согласие с лесом и точность каскада для разных границ уверенности), и
+сравнивает p50/p99 задержки леса и каскада для одной строки и для пакета.
+Проверяет, что при недостижимой границе каскад совпадает с лесом, а при
+нулевой - с первой ступенью.
+
+Запуск: python -m benchmarks.bench_cascade [--batch 200] [--calls 500]
+"""
+import argparse
+import logging
+import numpy as np
+from app.ml.cascade import CascadeStats, cascade_predict_proba
+from app.ml.features import compute_feature_matrix
+from app.ml.model_loader import ModelLoader
+from app.services.candles import Candles
+from benchmarks.bench_features import make_klines
+from benchmarks.bench_forest import latency
+
+
+def check_parity(model_loader: ModelLoader, X: np.ndarray):
+    forest, first_stage = model_loader.compiled, model_loader.first_stage_compiled
+    np.testing.assert_array_equal(cascade_predict_proba(first_stage, forest.predict_proba, X, 1.01), forest.predict_proba(X))
+    np.testing.assert_array_equal(cascade_predict_proba(first_stage, forest.predict_proba, X, 0.0), first_stage.predict_proba(X))
+    print(f"parity: OK ({len(X)} rows; bound > 1 == forest, bound 0 == first stage)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch", type=int, default=200)
+    parser.add_argument("--calls", type=int, default=500)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    
+    klines = make_klines(5000)
+    model_loader = ModelLoader(threshold_percent=0.02)
+    model_loader.train_model(klines)
+    X = compute_feature_matrix(Candles.from_klines(klines), model_loader.feature_columns)
+    check_parity(model_loader, X)
+    
+    cascade_metrics = model_loader.metrics["cascade"]
+    print(
+        f"held-out accuracy: forest {cascade_metrics['full_accuracy']:.3f}, "
+        f"first stage {cascade_metrics['first_stage_accuracy']:.3f}"
+    )
+    print(f"{'bound':>6} {'coverage':>9} {'agreement':>10} {'accuracy':>9}")
+    for point in cascade_metrics["curve"]:
+        agreement = f"{point['agreement']:.3f}" if point['agreement'] is not None else "-"
+        print(f"{point['confidence']:>6} {point['coverage']:>9.3f} {agreement:>10} {point['accuracy']:>9.3f}")
+    
+    forest, first_stage = model_loader.compiled, model_loader.first_stage_compiled
+    confidence = first_stage.predict_proba(X).max(axis=1)
+    # Одиночные строки: уверенная (решает первая ступень) и неуверенная (уходит в лес)
+    sure = X[np.flatnonzero(confidence >= 0.9)[-1:]]
+    unsure = X[np.flatnonzero(confidence < 0.6)[-1:]]
+    batch = X[-args.batch:]
+    print(f"\n{'case':>30} {'p50':>10} {'p99':>10} {'escalated':>10}")
+    cases = [("forest", None)] + [(f"cascade >= {bound}", bound) for bound in (0.6, 0.8, 0.9)]
+    for rows_name, rows in (("sure row", sure), ("unsure row", unsure), (f"{args.batch} rows", batch)):
+        for name, bound in cases:
+            stats = CascadeStats()
+            if bound is None:
+                fn = lambda: forest.predict_proba(rows)
+            else:
+                fn = lambda: cascade_predict_proba(first_stage, forest.predict_proba, rows, bound, stats=stats)
+            timings = latency(fn, args.calls)
+            escalated = f"{stats.get_stats()['escalation_rate']:.2f}" if bound is not None else "-"
+            print(
+                f"{f'{name} {rows_name}':>30} {np.percentile(timings, 50):>8.0f}us "
+                f"{np.percentile(timings, 99):>8.0f}us {escalated:>10}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Бенчмарк синхронного и асинхронного слоя БД под параллельной нагрузкой.
+
+Пока писатели коммитят сделки по одной (путь ExecutionAgent без
+TradeWriter), клиенты запрашивают GET /trading/trades и пустой /ping через
+ASGI в том же event loop. Синхронный слой - прежний код: Session из
+create_engine внутри async def маршрута, commit и refresh на сделку.
+Асинхронный - маршрут app.api.routes_trading с AsyncSession и пулом из
+app.db_models.db. Перед нагрузкой проверяется, что оба маршрута отдают
+одинаковый список сделок.
+
+Второй прогон добавляет внешнего писателя (другой процесс, пакетная запись
+или медленный диск), который держит блокировку записи --lock-hold-ms из
+каждых --lock-every-ms: синхронный commit ждет ее внутри event loop.
+
+Запуск: python -m benchmarks.bench_db [--seconds 3] [--clients 16] [--writers 4] [--lock-hold-ms 50]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+import httpx
+import numpy as np
+from fastapi import Depends, FastAPI, Query
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from app.agents.execution_agent import ExecutionAgent
+from app.api.routes_trading import router as trading_router
+from app.db_models.db import Base, create_async_db_engine, get_async_db
+from app.db_models.schemas import TradeResponse
+from app.db_models.trade_entity import Trade
+from benchmarks.bench_indicators import format_time
+
+
+def seed_trades(path: str, n: int):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    start = datetime(2024, 1, 1)
+    rows = [
+        {
+            "order_id": f"SEED-{i:06d}",
+            "symbol": "BTCUSDT",
+            "action": "BUY" if i % 2 else "SELL",
+            "price": 30000.0 + i,
+            "execution_price": 30000.0 + i,
+            "status": "FILLED",
+            "timestamp": start + timedelta(seconds=i)
+        }
+        for i in range(n)
+    ]
+    with engine.begin() as connection:
+        connection.execute(insert(Trade), rows)
+    engine.dispose()
+
+
+def make_sync_app(session_factory) -> FastAPI:
+    """Прежний слой: синхронная сессия в async def маршруте."""
+    app = FastAPI()
+    
+    def get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+    
+    @app.get("/trading/trades", response_model=List[TradeResponse])
+    async def get_trades(limit: int = Query(default=50, ge=1, le=100), db: Session = Depends(get_db)):
+        trades = db.query(Trade).order_by(Trade.timestamp.desc()).limit(limit).all()
+        return [TradeResponse.model_validate(trade) for trade in trades]
+    
+    @app.get("/ping")
+    async def ping():
+        return {}
+    
+    return app
+
+
+def make_async_app(session_factory) -> FastAPI:
+    """Текущий слой: маршрут приложения с AsyncSession."""
+    app = FastAPI()
+    app.include_router(trading_router)
+    app.state.trade_writer = None
+    
+    async def get_db():
+        async with session_factory() as db:
+            yield db
+    
+    app.dependency_overrides[get_async_db] = get_db
+    
+    @app.get("/ping")
+    async def ping():
+        return {}
+    
+    return app
+
+
+def sync_write(session_factory):
+    """Запись сделки, как в ExecutionAgent до асинхронного слоя."""
+    with session_factory() as db:
+        trade = Trade(
+            order_id=f"ORD-{uuid.uuid4().hex[:12]}",
+            symbol="BTCUSDT",
+            action="BUY",
+            price=30000.0,
+            execution_price=30003.0,
+            status="FILLED",
+            timestamp=datetime.utcnow()
+        )
+        db.add(trade)
+        db.commit()
+        db.refresh(trade)
+
+
+def hold_write_lock(path: str, hold: float, every: float, stop: threading.Event):
+    """Периодически держать блокировку записи SQLite, как долгая транзакция другого писателя."""
+    connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+    while not stop.is_set():
+        connection.execute("BEGIN IMMEDIATE")
+        connection.execute("UPDATE trades SET price = price WHERE id = 1")
+        time.sleep(hold)
+        connection.execute("COMMIT")
+        time.sleep(max(0.0, every - hold))
+    connection.close()
+
+
+async def run_load(app: FastAPI, write, seconds: float, clients: int, writers: int):
+    transport = httpx.ASGITransport(app=app)
+    latencies = {"/trading/trades?limit=50": [], "/ping": []}
+    writes = 0
+    deadline = time.perf_counter() + seconds
+    
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Запрос через ASGI в том же процессе может не отдать управление
+        # loop ни разу, поэтому каждый клиент уступает его после запроса
+        async def reader(path: str):
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = await client.get(path)
+                assert response.status_code == 200
+                latencies[path].append(time.perf_counter() - started)
+                await asyncio.sleep(0)
+        
+        async def writer():
+            nonlocal writes
+            while time.perf_counter() < deadline:
+                await write()
+                writes += 1
+                await asyncio.sleep(0)
+        
+        await asyncio.gather(
+            *(reader("/trading/trades?limit=50") for _ in range(clients)),
+            *(reader("/ping") for _ in range(clients)),
+            *(writer() for _ in range(writers))
+        )
+    return latencies, writes
+
+
+async def fetch_trades(app: FastAPI):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        return (await client.get("/trading/trades?limit=100")).json()
+
+
+async def bench(tmp: str, args, contended: bool):
+    results = []
+    
+    sync_path = os.path.join(tmp, f"sync-{contended}.db")
+    seed_trades(sync_path, args.seed_trades)
+    # Пул по числу клиентов: с пулом по умолчанию (5 + 10) прежний слой при
+    # 16 клиентах зависает до pool_timeout - блокированный loop не дает
+    # закрыть сессии, ожидающие в threadpool
+    sync_engine = create_engine(
+        f"sqlite:///{sync_path}",
+        connect_args={"check_same_thread": False},
+        pool_size=args.clients + args.writers + 1
+    )
+    sync_factory = sessionmaker(autocommit=False, autoflush=False, bind=sync_engine)
+    sync_app = make_sync_app(sync_factory)
+    
+    async_path = os.path.join(tmp, f"async-{contended}.db")
+    seed_trades(async_path, args.seed_trades)
+    async_engine = create_async_db_engine(f"sqlite:///{async_path}")
+    async_factory = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+    async_app = make_async_app(async_factory)
+    
+    assert await fetch_trades(sync_app) == await fetch_trades(async_app)
+    
+    async def write_sync():
+        sync_write(sync_factory)
+    
+    async def write_async():
+        async with async_factory() as db:
+            await ExecutionAgent(db).process({"action": "BUY", "confidence": 0.9}, {"symbol": "BTCUSDT", "price": 30000.0})
+    
+    for name, path, app, write in (
+        ("sync Session", sync_path, sync_app, write_sync),
+        ("AsyncSession", async_path, async_app, write_async)
+    ):
+        stop = threading.Event()
+        lock_thread = None
+        if contended:
+            lock_thread = threading.Thread(
+                target=hold_write_lock,
+                args=(path, args.lock_hold_ms / 1000, args.lock_every_ms / 1000, stop)
+            )
+            lock_thread.start()
+        try:
+            latencies, writes = await run_load(app, write, args.seconds, args.clients, args.writers)
+        finally:
+            stop.set()
+            if lock_thread is not None:
+                await asyncio.to_thread(lock_thread.join)
+        results.append((name, latencies, writes))
+    
+    sync_engine.dispose()
+    await async_engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seed-trades", type=int, default=2000)
+    parser.add_argument("--lock-hold-ms", type=float, default=50.0)
+    parser.add_argument("--lock-every-ms", type=float, default=100.0)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    
+    print(
+        f"{args.clients} clients per endpoint, {args.writers} writers committing per trade, "
+        f"{args.seconds:.0f}s per layer (SQLite file)"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        for contended in (False, True):
+            results = asyncio.run(bench(tmp, args, contended))
+            if contended:
+                print(f"\nexternal writer holds the write lock {args.lock_hold_ms:.0f}ms of every {args.lock_every_ms:.0f}ms")
+            else:
+                print(f"parity: OK (both layers return the same {min(100, args.seed_trades)} latest trades)\n")
+            print(
+                f"{'layer':<13} {'trades req/s':>13} {'p50':>9} {'p99':>9} {'ping req/s':>11} "
+                f"{'ping p99':>9} {'writes/s':>9}"
+            )
+            for name, latencies, writes in results:
+                trades = latencies["/trading/trades?limit=50"]
+                ping = latencies["/ping"]
+                print(
+                    f"{name:<13} {len(trades) / args.seconds:>13.0f} {format_time(float(np.percentile(trades, 50))):>9} "
+                    f"{format_time(float(np.percentile(trades, 99))):>9} {len(ping) / args.seconds:>11.0f} "
+                    f"{format_time(float(np.percentile(ping, 99))):>9} {writes / args.seconds:>9.0f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Бенчмарк и проверка паритета конвейера признаков.
+
+Сравнивает app.ml.features с прежними реализациями (pandas rolling в
+ModelLoader и циклы Python в MarketMonitoringAgent). Паритет признаков
+обучения и инференса проверяет tests/test_features_parity.py.
+
+Запуск: python -m benchmarks.bench_features
+"""
+import time
+from typing import Callable, List
+import numpy as np
+import pandas as pd
+from app.ml.features import FEATURE_COLUMNS, compute_feature_matrix, compute_latest_features
+from app.services.candles import Candles
+from app.services.indicator_engine import IndicatorEngine
+
+
+def make_klines(n: int, seed: int = 0) -> List[list]:
+    rng = np.random.default_rng(seed)
+    closes = 30000 + np.cumsum(rng.normal(0, 20, n))
+    volumes = rng.uniform(1, 100, n)
+    return [
+        [1700000000000 + i * 60000, f"{c:.2f}", f"{c + 5:.2f}", f"{c - 5:.2f}", f"{c:.2f}", f"{v:.4f}",
+         1700000059999 + i * 60000, "0", 10, "0", "0", "0"]
+        for i, (c, v) in enumerate(zip(closes, volumes))
+    ]
+
+
+def legacy_training_features(klines: List[list]) -> pd.DataFrame:
+    """Прежний ModelLoader._prepare_features."""
+    df = pd.DataFrame(klines, columns=[
+        'open_time', 'open', 'high', 'low', 'close', 'volume',
+        'close_time', 'quote_volume', 'trades', 'taker_buy_base',
+        'taker_buy_quote', 'ignore'
+    ])
+    for col in ['open', 'high', 'low', 'close', 'volume']:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    df['sma_10'] = df['close'].rolling(window=10, min_periods=1).mean()
+    df['sma_50'] = df['close'].rolling(window=50, min_periods=1).mean()
+    delta = df['close'].diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=14, min_periods=1).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14, min_periods=1).mean()
+    rs = gain / loss.replace(0, np.inf)
+    df['rsi'] = 100 - (100 / (1 + rs))
+    df['price_change'] = df['close'].pct_change() * 100
+    return df[FEATURE_COLUMNS].fillna(0)
+
+
+def legacy_inference_features(klines: List[list]) -> dict:
+    """Прежний MarketMonitoringAgent._extract_features_from_klines."""
+    closes = [float(k[4]) for k in klines]
+
+    def sma(prices, window):
+        if len(prices) < window:
+            return prices[-1] if prices else 0.0
+        return sum(prices[-window:]) / window
+
+    def rsi(prices, period=14):
+        if len(prices) < period + 1:
+            return 50.0
+        deltas = [prices[i] - prices[i - 1] for i in range(1, len(prices))]
+        recent = deltas[-period:]
+        avg_gain = sum(d for d in recent if d > 0) / period
+        avg_loss = sum(-d for d in recent if d < 0) / period
+        if avg_loss == 0:
+            return 100.0
+        return 100 - (100 / (1 + avg_gain / avg_loss))
+
+    return {
+        "sma_10": sma(closes, 10),
+        "sma_50": sma(closes, 50),
+        "rsi_14": rsi(closes, 14),
+        "current_price": closes[-1],
+        "price_change_1m": (closes[-1] - closes[-2]) / closes[-2] * 100,
+    }
+
+
+def per_call_us(fn: Callable, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    print(
+        f"{'candles':>8} {'legacy train':>14} {'vector train':>14} "
+        f"{'legacy infer':>14} {'latest row':>12} {'incremental':>12}"
+    )
+    for n in (100, 1000, 10000):
+        klines = make_klines(n)
+        candles = Candles.from_klines(klines)
+        engine = IndicatorEngine()
+        engine.update("BENCH", "1m", candles)
+        repeat = max(3, 20000 // n)
+        print(
+            f"{n:>8} "
+            f"{per_call_us(lambda: legacy_training_features(klines), repeat):>12.0f}us "
+            f"{per_call_us(lambda: compute_feature_matrix(Candles.from_klines(klines)), repeat):>12.0f}us "
+            f"{per_call_us(lambda: legacy_inference_features(klines), repeat):>12.0f}us "
+            f"{per_call_us(lambda: compute_latest_features(candles), repeat):>10.0f}us "
+            f"{per_call_us(lambda: engine.update('BENCH', '1m', candles), repeat):>10.0f}us"
+        )
+
+
+if __name__ == "__main__":
+    main()
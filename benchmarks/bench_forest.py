@@ -0,0 +1,79 @@
+"""
+Бенчмарк скомпилированного случайного леса.
+
+Проверяет, что CompiledForest дает те же вероятности, что
+RandomForestClassifier.predict_proba после StandardScaler (в том числе в
+точках ровно на порогах), и сравнивает p50/p99 задержки для одной строки и
+для пакета.
+
+Запуск: python -m benchmarks.bench_forest [--batch 200] [--calls 500]
+"""
+import argparse
+import logging
+import time
+from typing import Callable
+import numpy as np
+from app.ml.compiled_forest import CompiledForest
+from app.ml.features import compute_feature_matrix
+from app.ml.model_loader import ModelLoader
+from app.services.candles import Candles
+from benchmarks.bench_features import make_klines
+
+
+def boundary_rows(compiled: CompiledForest, base: np.ndarray) -> np.ndarray:
+    """Строки, у которых один признак стоит ровно на пороге узла или сразу за ним."""
+    internal = np.flatnonzero(np.isfinite(compiled.threshold))
+    rows = base[np.arange(len(internal)) % len(base)].copy()
+    values = compiled.threshold[internal]
+    values[1::2] = np.nextafter(values[1::2], np.inf)
+    rows[np.arange(len(internal)), compiled.feature[internal]] = values
+    return rows
+
+
+def check_parity(model_loader: ModelLoader, X: np.ndarray):
+    compiled = CompiledForest.from_sklearn(model_loader.model, model_loader.scaler)
+    X = np.vstack([X, boundary_rows(compiled, X)])
+    expected = model_loader.model.predict_proba(model_loader.scaler.transform(X))
+    np.testing.assert_allclose(compiled.predict_proba(X), expected, rtol=0, atol=1e-12)
+    print(f"parity: OK ({len(X)} rows incl. threshold boundaries, {compiled.n_nodes} nodes)")
+
+
+def latency(fn: Callable, calls: int) -> np.ndarray:
+    timings = np.empty(calls)
+    for i in range(calls):
+        start = time.perf_counter()
+        fn()
+        timings[i] = time.perf_counter() - start
+    return timings * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch", type=int, default=200)
+    parser.add_argument("--calls", type=int, default=500)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    
+    klines = make_klines(5000)
+    model_loader = ModelLoader(threshold_percent=0.02)
+    model_loader.train_model(klines)
+    X = compute_feature_matrix(Candles.from_klines(klines), model_loader.feature_columns)
+    check_parity(model_loader, X)
+    
+    model, scaler, compiled = model_loader.model, model_loader.scaler, model_loader.compiled
+    single = X[-1:]
+    batch = X[-args.batch:]
+    cases = [
+        ("sklearn 1 row", lambda: model.predict_proba(scaler.transform(single))),
+        ("compiled 1 row", lambda: compiled.predict_proba(single)),
+        (f"sklearn {args.batch} rows", lambda: model.predict_proba(scaler.transform(batch))),
+        (f"compiled {args.batch} rows", lambda: compiled.predict_proba(batch)),
+    ]
+    print(f"{'case':>20} {'p50':>10} {'p99':>10}")
+    for name, fn in cases:
+        timings = latency(fn, args.calls)
+        print(f"{name:>20} {np.percentile(timings, 50):>8.0f}us {np.percentile(timings, 99):>8.0f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Микробенчмарк библиотеки индикаторов.
+
+Проверяет индикаторы app.ml.indicators на совпадение с эталонными
+реализациями pandas и замеряет время расчета каждого индикатора и всего
+набора (в заранее выделенный буфер) на 1k, 100k и 10M свечей.
+
+Запуск: python -m benchmarks.bench_indicators [--sizes 1000 100000 10000000]
+"""
+import argparse
+import time
+from typing import Callable
+import numpy as np
+import pandas as pd
+from app.ml.indicators import INDICATORS, compute_indicators
+from app.services.candles import Candles
+
+
+def make_candles(n: int, seed: int = 0) -> Candles:
+    rng = np.random.default_rng(seed)
+    prices = np.empty((5, n))
+    close = 30000 + np.cumsum(rng.normal(0, 20, n))
+    spread = rng.uniform(0, 15, (2, n))
+    prices[0] = np.concatenate(([close[0]], close[:-1]))
+    prices[1] = np.maximum(prices[0], close) + spread[0]
+    prices[2] = np.minimum(prices[0], close) - spread[1]
+    prices[3] = close
+    prices[4] = rng.uniform(1, 100, n)
+    open_time = 1700000000000 + np.arange(n, dtype=np.int64) * 60000
+    return Candles(open_time, prices[0], prices[1], prices[2], prices[3], prices[4])
+
+
+def reference_indicators(candles: Candles) -> pd.DataFrame:
+    """Те же индикаторы, посчитанные через pandas."""
+    df = pd.DataFrame({
+        'high': candles.high, 'low': candles.low, 'close': candles.close, 'volume': candles.volume
+    })
+    close = df['close']
+    ref = pd.DataFrame(index=df.index)
+    ref['sma_10'] = close.rolling(10, min_periods=1).mean()
+    ref['sma_50'] = close.rolling(50, min_periods=1).mean()
+    ref['price_change'] = close.pct_change().fillna(0) * 100
+    ref['volume'] = df['volume']
+    ref['ema_12'] = close.ewm(span=12, adjust=False).mean()
+    ref['ema_26'] = close.ewm(span=26, adjust=False).mean()
+    ref['macd'] = ref['ema_12'] - ref['ema_26']
+    ref['macd_signal'] = ref['macd'].ewm(span=9, adjust=False).mean()
+    ref['macd_hist'] = ref['macd'] - ref['macd_signal']
+    ref['bb_width_20'] = 4 * close.rolling(20, min_periods=1).std(ddof=0) / close.rolling(20, min_periods=1).mean()
+    
+    prev_close = close.shift(1)
+    tr = pd.concat([
+        df['high'] - df['low'], (df['high'] - prev_close).abs(), (df['low'] - prev_close).abs()
+    ], axis=1).max(axis=1)
+    atr = tr.expanding().mean().to_numpy()
+    for i in range(14, len(atr)):
+        atr[i] = atr[i - 1] + (tr.iloc[i] - atr[i - 1]) / 14
+    ref['atr_14'] = atr
+    
+    typical = (df['high'] + df['low'] + df['close']) / 3
+    ref['vwap_20'] = (typical * df['volume']).rolling(20, min_periods=1).sum() / df['volume'].rolling(20, min_periods=1).sum()
+    ref['obv_20'] = (np.sign(close.diff()).fillna(0) * df['volume']).rolling(20, min_periods=1).sum()
+    
+    delta = close.diff()
+    gain = delta.clip(lower=0).to_numpy()[1:]
+    loss = (-delta).clip(lower=0).to_numpy()[1:]
+    rsi = np.full(len(close), 50.0)
+    avg_gain, avg_loss = gain[:14].mean(), loss[:14].mean()
+    for i in range(14, len(close)):
+        if i > 14:
+            avg_gain = (avg_gain * 13 + gain[i - 1]) / 14
+            avg_loss = (avg_loss * 13 + loss[i - 1]) / 14
+        rsi[i] = 100.0 if avg_loss == 0 else 100 - 100 / (1 + avg_gain / avg_loss)
+    ref['rsi'] = rsi
+    return ref
+
+
+def check_parity(n: int = 3000):
+    candles = make_candles(n)
+    names = list(INDICATORS)
+    ours = compute_indicators(candles, names)
+    ref = reference_indicators(candles)
+    for column, name in enumerate(names):
+        np.testing.assert_allclose(ours[:, column], ref[name].to_numpy(), rtol=1e-7, atol=1e-7, err_msg=name)
+    print(f"parity: OK ({len(names)} indicators vs pandas, {n} candles)")
+
+
+def best_of(fn: Callable, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def format_time(seconds: float) -> str:
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.0f}us"
+    if seconds < 1:
+        return f"{seconds * 1e3:.1f}ms"
+    return f"{seconds:.2f}s"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000, 10000000])
+    args = parser.parse_args()
+    
+    check_parity()
+    
+    names = list(INDICATORS)
+    print(f"{'indicator':>14} " + " ".join(f"{n:>10}" for n in args.sizes))
+    rows = {name: [] for name in names}
+    totals = []
+    per_candle = []
+    for n in args.sizes:
+        candles = make_candles(n)
+        repeat = 3 if n >= 1000000 else 20
+        for name in names:
+            rows[name].append(best_of(lambda: compute_indicators(candles, [name]), repeat))
+        out = np.empty((n, len(names)), order='F')
+        total = best_of(lambda: compute_indicators(candles, names, out=out), repeat)
+        totals.append(total)
+        per_candle.append(total / n * 1e9)
+        del out, candles
+    
+    for name in names:
+        print(f"{name:>14} " + " ".join(f"{format_time(t):>10}" for t in rows[name]))
+    print(f"{'full set':>14} " + " ".join(f"{format_time(t):>10}" for t in totals))
+    print(f"{'ns/candle':>14} " + " ".join(f"{t:>10.0f}" for t in per_candle))
+
+
+if __name__ == "__main__":
+    main()
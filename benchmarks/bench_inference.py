@@ -0,0 +1,69 @@
+"""
+Бенчмарк пакетного инференса.
+
+Сравнивает оценку вселенной символов последовательными вызовами
+predict_action с одним вызовом predict_actions и проверяет, что решения
+совпадают.
+
+Запуск: python -m benchmarks.bench_inference [--symbols 200]
+"""
+import argparse
+import logging
+import os
+import time
+import numpy as np
+
+# Измеряется сама модель: кэш предсказаний выключается до импорта app
+os.environ.setdefault("PREDICTION_CACHE_ENABLED", "false")
+from app.ml import model_inference
+from app.ml.features import compute_latest_features
+from app.ml.model_loader import ModelLoader
+from app.services.candles import Candles
+from benchmarks.bench_features import make_klines
+
+
+def make_universe(count: int) -> dict:
+    universe = {}
+    for index in range(count):
+        candles = Candles.from_klines(make_klines(120, seed=index))
+        universe[f"SYM{index}USDT"] = compute_latest_features(candles)
+    return universe
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    
+    model_loader = ModelLoader(threshold_percent=0.02)
+    model_loader.train_model(make_klines(3000))
+    model_inference.initialize_model(model_loader)
+    universe = make_universe(args.symbols)
+    
+    serial = {symbol: model_inference.predict_action(features) for symbol, features in universe.items()}
+    batch = model_inference.predict_actions(universe)
+    assert serial.keys() == batch.keys()
+    for symbol in universe:
+        assert serial[symbol]["action"] == batch[symbol]["action"], symbol
+        assert np.isclose(serial[symbol]["confidence"], batch[symbol]["confidence"]), symbol
+    print(f"parity: OK ({args.symbols} symbols, predict_action == predict_actions)")
+    
+    def timed(fn) -> float:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+    
+    serial_time = timed(lambda: [model_inference.predict_action(features) for features in universe.values()])
+    batch_time = timed(lambda: model_inference.predict_actions(universe))
+    print(f"serial predict_action: {serial_time * 1e3:.1f}ms ({serial_time / args.symbols * 1e3:.2f}ms/symbol)")
+    print(f"batch predict_actions: {batch_time * 1e3:.1f}ms ({batch_time / args.symbols * 1e3:.3f}ms/symbol)")
+    print(f"speedup: {serial_time / batch_time:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
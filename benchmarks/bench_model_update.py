@@ -0,0 +1,91 @@
+"""
+Бенчмарк инкрементального обновления модели (ModelLoader.update_model_from_candles).
+
+Проверяет, что пересчет порогов под обновленный scaler не меняет решений
+старых деревьев, затем сравнивает время полного переобучения на всей
+истории с обновлением на последних MODEL_UPDATE_WINDOW свечах и следит,
+чтобы лес не превышал MODEL_MAX_TREES деревьев.
+
+Запуск: python -m benchmarks.bench_model_update [--candles 100000] [--step 60] [--updates 30]
+"""
+import argparse
+import copy
+import logging
+import time
+import numpy as np
+from app.config import settings
+from app.ml.model_loader import UPDATE_WARMUP, ModelLoader, update_loader
+from benchmarks.bench_backtest import make_price_candles
+from benchmarks.bench_indicators import format_time
+
+THRESHOLD_PERCENT = 0.02
+
+
+def check_parity(model_loader: ModelLoader, candles, n: int = 2000):
+    """Старые деревья обновленной модели дают те же вероятности, что до обновления."""
+    rng = np.random.default_rng(0)
+    X = model_loader.scaler.mean_ + rng.normal(size=(n, len(model_loader.feature_columns))) * model_loader.scaler.scale_
+    expected = model_loader.model.predict_proba(model_loader.scaler.transform(X))
+    trees = len(model_loader.model.estimators_)
+    
+    updated = update_loader(model_loader, candles)
+    old_trees = copy.copy(updated.model)
+    old_trees.estimators_ = updated.model.estimators_[:trees]
+    np.testing.assert_allclose(old_trees.predict_proba(updated.scaler.transform(X)), expected, rtol=0, atol=1e-12)
+    np.testing.assert_allclose(
+        updated.compiled.predict_proba(X),
+        updated.model.predict_proba(updated.scaler.transform(X)),
+        rtol=0,
+        atol=1e-12
+    )
+    print(
+        f"parity: OK ({n} rows, {trees} old trees unchanged after scaler update, "
+        f"compiled forest matches sklearn)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--candles", type=int, default=100000)
+    parser.add_argument("--step", type=int, default=60, help="new candles between updates")
+    parser.add_argument("--updates", type=int, default=30)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    
+    total = args.candles + args.step * args.updates
+    candles = make_price_candles(total)
+    context = settings.MODEL_UPDATE_WINDOW + UPDATE_WARMUP + 1
+    
+    model_loader = ModelLoader(threshold_percent=THRESHOLD_PERCENT)
+    start = time.perf_counter()
+    model_loader.train_model_from_candles(candles.slice(0, args.candles))
+    full_time = time.perf_counter() - start
+    print(f"full refit on {args.candles} candles: {format_time(full_time)}")
+    
+    check_parity(model_loader, candles.slice(args.candles - context + args.step, args.candles + args.step))
+    
+    print(
+        f"\n{'update':>7} {'time':>9} {'trees':>6} {'retired':>8} {'memory':>9} {'accuracy':>9}  "
+        f"(window {settings.MODEL_UPDATE_WINDOW}, +{settings.MODEL_UPDATE_TREES} trees, "
+        f"cap {settings.MODEL_MAX_TREES} trees / {settings.MODEL_MAX_MEMORY_MB:.0f}MB)"
+    )
+    times = []
+    for update in range(1, args.updates + 1):
+        end = args.candles + update * args.step
+        start = time.perf_counter()
+        model_loader = update_loader(model_loader, candles.slice(end - context, end))
+        times.append(time.perf_counter() - start)
+        stats = model_loader.metrics["incremental"]
+        assert stats["trees"] <= max(settings.MODEL_MAX_TREES, settings.MODEL_UPDATE_TREES)
+        if update == 1 or update % 5 == 0:
+            print(
+                f"{update:>7} {format_time(times[-1]):>9} {stats['trees']:>6} {stats['trees_retired']:>8} "
+                f"{stats['memory_mb']:>7.1f}MB {stats['prequential_accuracy']:>9.3f}"
+            )
+    
+    median = float(np.median(times))
+    print(f"\nmedian update {format_time(median)} vs full refit {format_time(full_time)} ({full_time / median:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Бенчмарк поиска гиперпараметров (app.ml.model_search).
+
+Показывает, сколько стоило бы каждой попытке строить признаки самой и
+получать матрицу через pickle, и сравнивает время поиска на 1, 2, 4, ...
+воркерах (до числа CPU) с идеальным линейным ускорением.
+
+Запуск: python -m benchmarks.bench_search [--candles 200000] [--trials 8] [--workers 1 2 4]
+"""
+import argparse
+import logging
+import os
+import pickle
+import tempfile
+import time
+import numpy as np
+from app.ml.features import FEATURE_COLUMNS
+from app.ml.model_search import grid_trials, run_search
+from app.ml.training_data import TARGET_SOURCE, build_training_arrays
+from benchmarks.bench_backtest import make_price_candles
+from benchmarks.bench_indicators import format_time
+
+THRESHOLD_PERCENT = 0.02
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--candles", type=int, default=200000)
+    parser.add_argument("--trials", type=int, default=8)
+    parser.add_argument("--workers", type=int, nargs="+", default=None)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    cpus = os.cpu_count() or 1
+    workers_list = args.workers or [w for w in (1, 2, 4, 8, 16, 32) if w <= cpus]
+    
+    candles = make_price_candles(args.candles)
+    start = time.perf_counter()
+    matrix, _ = build_training_arrays(candles, [*FEATURE_COLUMNS, TARGET_SOURCE], THRESHOLD_PERCENT)
+    build_time = time.perf_counter() - start
+    start = time.perf_counter()
+    pickle.loads(pickle.dumps(np.ascontiguousarray(matrix), protocol=pickle.HIGHEST_PROTOCOL))
+    pickle_time = time.perf_counter() - start
+    print(
+        f"{args.candles} candles: feature build {format_time(build_time)}, "
+        f"pickle round trip of {matrix.nbytes / 2**20:.0f}MB {format_time(pickle_time)} "
+        f"(saved per trial by building once and sharing memory)"
+    )
+    
+    # Одинаковые по стоимости попытки, чтобы ускорение не зависело от порядка
+    trials = grid_trials({
+        "threshold_percent": [THRESHOLD_PERCENT + 0.001 * i for i in range(args.trials)],
+        "n_estimators": [20],
+        "max_depth": [8],
+        "min_samples_leaf": [5],
+        "max_features": ["sqrt"],
+    })
+    print(f"\n{cpus} CPU available")
+    print(f"{'workers':>8} {'time':>9} {'trials/s':>9} {'speedup':>8} {'ideal':>6}")
+    baseline = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in workers_list:
+            start = time.perf_counter()
+            run_search(candles, trials, os.path.join(tmp, f"leaderboard-{workers}.jsonl"), workers=workers)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(
+                f"{workers:>8} {format_time(elapsed):>9} {len(trials) / elapsed:>9.2f} "
+                f"{baseline / elapsed:>7.2f}x {min(workers, len(trials)):>5}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Бенчмарк записи сделок ExecutionAgent: commit на каждую сделку против TradeWriter.
+
+Прогоняет одни и те же решения через ExecutionAgent с записью на каждую
+сделку (add/commit) и с пакетной записью в фоне, проверяет, что
+в БД оказались одни и те же сделки, и сравнивает пропускную способность
+(до возврата результата вызывающему и до записи всех сделок на диск) и
+задержку одного вызова process.
+
+Запуск: python -m benchmarks.bench_trade_writer [--trades 5000] [--batch-size 500] [--concurrency 1 16]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from typing import Optional
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.agents.execution_agent import ExecutionAgent
+from app.db_models.db import Base, create_async_db_engine
+from app.db_models.trade_entity import Trade
+from app.services.trade_writer import TradeWriter
+from benchmarks.bench_indicators import format_time
+
+
+def make_decisions(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    actions = rng.choice(["BUY", "SELL", "HOLD"], size=n)
+    confidences = rng.uniform(0.34, 1.0, size=n)
+    prices = 30000 * np.exp(np.cumsum(rng.normal(0, 0.001, n)))
+    return [
+        ({"action": str(action), "confidence": float(confidence)}, {"symbol": "BTCUSDT", "price": float(price)})
+        for action, confidence, price in zip(actions, confidences, prices)
+    ]
+
+
+async def make_session_factory(path: str):
+    engine = create_async_db_engine(f"sqlite:///{path}")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    return engine, async_sessionmaker(engine, expire_on_commit=False, autoflush=False)
+
+
+async def run_agent(session_factory, writer: Optional[TradeWriter], decisions, concurrency: int):
+    """
+    Вызвать process для всех решений concurrency параллельными потоками вызовов.
+    
+    У каждого потока своя сессия, как у каждого запроса в приложении.
+    """
+    latencies = []
+    
+    async def worker(items):
+        async with session_factory() as session:
+            agent = ExecutionAgent(session, writer)
+            for decision, market_data in items:
+                started = time.perf_counter()
+                result = await agent.process(decision, market_data)
+                latencies.append(time.perf_counter() - started)
+                assert result["status"] != "ERROR"
+    
+    await asyncio.gather(*(worker(decisions[i::concurrency]) for i in range(concurrency)))
+    return latencies
+
+
+async def read_trades(session_factory):
+    """Сделки без случайных order_id: статус и цена исполнения."""
+    async with session_factory() as session:
+        return sorted((await session.execute(select(Trade.status, Trade.execution_price))).all())
+
+
+async def bench(decisions, concurrency: int, batch_size: int, tmp: str):
+    rows = []
+    
+    engine, session_factory = await make_session_factory(os.path.join(tmp, f"commit-{concurrency}.db"))
+    started = time.perf_counter()
+    latencies = await run_agent(session_factory, None, decisions, concurrency)
+    elapsed = time.perf_counter() - started
+    rows.append(("per-row commit", elapsed, elapsed, latencies))
+    commit_trades = await read_trades(session_factory)
+    await engine.dispose()
+    
+    engine, session_factory = await make_session_factory(os.path.join(tmp, f"writer-{concurrency}.db"))
+    writer = TradeWriter(session_factory, batch_size=batch_size)
+    await writer.start()
+    started = time.perf_counter()
+    latencies = await run_agent(session_factory, writer, decisions, concurrency)
+    returned = time.perf_counter() - started
+    await writer.stop()
+    durable = time.perf_counter() - started
+    rows.append((f"TradeWriter ({writer.batches} batches)", returned, durable, latencies))
+    writer_trades = await read_trades(session_factory)
+    await engine.dispose()
+    
+    assert len(commit_trades) == len(decisions)
+    assert commit_trades == writer_trades
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trades", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16])
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    
+    decisions = make_decisions(args.trades)
+    print(f"{args.trades} trades, SQLite file")
+    print(
+        f"{'concurrency':>11} {'mode':<28} {'returned/s':>11} {'durable/s':>10} "
+        f"{'p50 call':>9} {'p99 call':>9}"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        for concurrency in args.concurrency:
+            for mode, returned, durable, latencies in asyncio.run(bench(decisions, concurrency, args.batch_size, tmp)):
+                print(
+                    f"{concurrency:>11} {mode:<28} {len(decisions) / returned:>11.0f} {len(decisions) / durable:>10.0f} "
+                    f"{format_time(float(np.percentile(latencies, 50))):>9} "
+                    f"{format_time(float(np.percentile(latencies, 99))):>9}"
+                )
+    print("parity: OK (same trades persisted in both modes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Бенчмарк построения обучающей выборки.
+
+Сравнивает прежний ModelLoader._create_targets (цикл с iloc) с
+векторизованным create_targets и построение X/y целиком с построением по
+блокам (app.ml.training_data.build_training_arrays, результат в np.memmap)
+на 10k, 1M и 10M свечей: время и пик выделенной памяти (tracemalloc).
+Проверяет совпадение таргетов с прежней реализацией и блочного построения
+с построением целиком.
+
+Запуск: python -m benchmarks.bench_training_data [--sizes 10000 1000000 10000000] [--chunk 1000000]
+"""
+import argparse
+import logging
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Tuple
+import numpy as np
+import pandas as pd
+from app.ml.features import FEATURE_COLUMNS
+from app.ml.training_data import build_training_arrays, create_targets, rebalance_targets
+from benchmarks.bench_indicators import format_time, make_candles
+
+THRESHOLD_PERCENT = 0.02
+# Прежний цикл слишком медленный для больших размеров
+LEGACY_MAX_ROWS = 10000
+
+
+def legacy_create_targets(features_df: pd.DataFrame, threshold_percent: float) -> np.ndarray:
+    """Прежний ModelLoader._create_targets."""
+    targets = []
+    for i in range(len(features_df) - 1):
+        current_price = features_df.iloc[i]['sma_10']
+        next_price = features_df.iloc[i + 1]['sma_10']
+        if current_price == 0:
+            targets.append(2)
+            continue
+        price_change_pct = ((next_price - current_price) / current_price) * 100
+        if price_change_pct > threshold_percent:
+            targets.append(0)
+        elif price_change_pct < -threshold_percent:
+            targets.append(1)
+        else:
+            targets.append(2)
+    targets.append(2)
+    
+    if len(np.unique(targets)) < 3:
+        price_changes = features_df['price_change'].abs().values
+        hold_indices = np.argsort(price_changes)[:max(1, len(price_changes) // 5)]
+        for idx in hold_indices:
+            if idx < len(targets):
+                targets[idx] = 2
+    return np.array(targets)
+
+
+def vectorized_create_targets(features_df: pd.DataFrame, threshold_percent: float) -> np.ndarray:
+    targets = create_targets(features_df['sma_10'].to_numpy(), threshold_percent)
+    if len(np.unique(targets)) < 3:
+        rebalance_targets(targets, features_df['price_change'].to_numpy())
+    return targets
+
+
+def measure(fn: Callable) -> Tuple[object, float, int]:
+    """Результат, время и пик памяти, выделенной во время вызова."""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def check_parity(n: int = 5000):
+    candles = make_candles(n)
+    X, _ = build_training_arrays(candles, FEATURE_COLUMNS, THRESHOLD_PERCENT)
+    features_df = pd.DataFrame(X, columns=FEATURE_COLUMNS)
+    # Крупный порог оставляет только HOLD и проверяет перебалансировку
+    for threshold in (THRESHOLD_PERCENT, 0.5, 50.0):
+        np.testing.assert_array_equal(
+            vectorized_create_targets(features_df, threshold),
+            legacy_create_targets(features_df, threshold)
+        )
+    
+    X_chunked, y_chunked = build_training_arrays(candles, FEATURE_COLUMNS, THRESHOLD_PERCENT, chunk_size=700)
+    np.testing.assert_allclose(X_chunked, X, rtol=1e-9, atol=1e-9)
+    y_full = build_training_arrays(candles, FEATURE_COLUMNS, THRESHOLD_PERCENT)[1]
+    print(
+        f"parity: OK (targets == legacy on {n} rows, chunked X within 1e-9, "
+        f"{int(np.sum(y_chunked != y_full))} target mismatches)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 1000000, 10000000])
+    parser.add_argument("--chunk", type=int, default=1000000)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    
+    check_parity()
+    
+    print(f"{'rows':>10} {'legacy targets':>15} {'targets':>10} {'X/y full':>10} {'peak':>9} {'X/y chunked':>12} {'peak':>9}")
+    for n in args.sizes:
+        candles = make_candles(n)
+        X, _ = build_training_arrays(candles, FEATURE_COLUMNS, THRESHOLD_PERCENT, chunk_size=n)
+        features_df = pd.DataFrame(X, columns=FEATURE_COLUMNS)
+        del X
+        
+        legacy = "-"
+        if n <= LEGACY_MAX_ROWS:
+            start = time.perf_counter()
+            legacy_create_targets(features_df, THRESHOLD_PERCENT)
+            legacy = format_time(time.perf_counter() - start)
+        start = time.perf_counter()
+        vectorized_create_targets(features_df, THRESHOLD_PERCENT)
+        targets_time = time.perf_counter() - start
+        del features_df
+        
+        _, full_time, full_peak = measure(
+            lambda: build_training_arrays(candles, FEATURE_COLUMNS, THRESHOLD_PERCENT, chunk_size=n)
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            _, chunked_time, chunked_peak = measure(
+                lambda: build_training_arrays(
+                    candles, FEATURE_COLUMNS, THRESHOLD_PERCENT, chunk_size=args.chunk, out_dir=tmp
+                )
+            )
+        print(
+            f"{n:>10} {legacy:>15} {format_time(targets_time):>10} {format_time(full_time):>10} "
+            f"{full_peak / 2**20:>7.0f}MB {format_time(chunked_time):>12} {chunked_peak / 2**20:>7.0f}MB"
+        )
+        del candles
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+from app.ml.model_loader import ModelLoader
+from app.services.candles import Candles
+
+
+def make_price_candles(n: int, seed: int = 0) -> Candles:
+    """Минутные свечи с геометрическим случайным блужданием цены."""
+    rng = np.random.default_rng(seed)
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.0007, n)))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    return Candles(
+        open_time=1700000000000 + np.arange(n, dtype=np.int64) * 60000,
+        open=open_,
+        high=np.maximum(open_, close) * (1 + rng.uniform(0, 0.0005, n)),
+        low=np.minimum(open_, close) * (1 - rng.uniform(0, 0.0005, n)),
+        close=close,
+        volume=rng.uniform(1, 100, n)
+    )
+
+
+@pytest.fixture(scope="session")
+def price_candles() -> Candles:
+    return make_price_candles(3000)
+
+
+@pytest.fixture(scope="session")
+def trained_loader(price_candles) -> ModelLoader:
+    """Небольшая обученная модель (три класса, скомпилированный лес)."""
+    model_loader = ModelLoader(threshold_percent=0.02, forest_params={"n_estimators": 20, "n_jobs": 1})
+    model_loader.train_model_from_candles(price_candles)
+    assert len(model_loader.classes_) == 3
+    return model_loader
@@ -0,0 +1,148 @@
+import numpy as np
+import pytest
+from app.ml import backtest
+from app.ml.features import FEATURE_COLUMNS, compute_feature_matrix
+from app.ml.model_loader import ModelLoader
+from app.services.candles import Candles
+from tests.conftest import make_price_candles
+
+
+@pytest.mark.parametrize("n, train_size, test_size", [(1000, 300, 200), (1001, 300, 200), (350, 300, 200), (300, 300, 10)])
+def test_windows_cover_history_without_overlap(n, train_size, test_size):
+    windows = backtest.walk_forward_windows(n, train_size, test_size)
+    tested = []
+    for train_start, test_start, test_end in windows:
+        assert test_start - train_start == train_size
+        assert test_start < test_end <= min(n, test_start + test_size)
+        tested.extend(range(test_start, test_end))
+    assert tested == list(range(train_size, n))
+
+
+def test_windows_reject_empty_sizes():
+    with pytest.raises(ValueError):
+        backtest.walk_forward_windows(100, 0, 10)
+
+
+def test_window_task_keeps_offsets(price_candles):
+    for window in backtest.walk_forward_windows(len(price_candles), 500, 700):
+        part, train_start, test_start, test_end = backtest._window_task(price_candles, window)
+        assert not isinstance(part.close, np.memmap)
+        np.testing.assert_array_equal(part.open_time[train_start:test_end], price_candles.open_time[window[0]:window[2]])
+        assert test_start - train_start == window[1] - window[0]
+        # Одна следующая свеча для закрытия позиции, если она есть
+        assert len(part) - test_end == min(1, len(price_candles) - window[2])
+
+
+@pytest.fixture
+def recorded_training(monkeypatch):
+    """Открытия свечей, на которых обучалась модель каждого окна."""
+    seen = []
+    original = ModelLoader.train_model_from_candles
+    
+    def recording(self, candles, *args, **kwargs):
+        seen.append(np.array(candles.open_time))
+        self.forest_params = {**self.forest_params, "n_estimators": 10}
+        return original(self, candles, *args, **kwargs)
+    
+    monkeypatch.setattr(ModelLoader, "train_model_from_candles", recording)
+    return seen
+
+
+def perturbed(candles: Candles, start: int) -> Candles:
+    """Копия свечей, у которой цены с индекса start заменены шумом."""
+    columns = [np.array(column, dtype=float) for column in (candles.open, candles.high, candles.low, candles.close)]
+    rng = np.random.default_rng(99)
+    for column in columns:
+        column[start:] = rng.uniform(100, 200, len(column) - start)
+    return Candles(np.array(candles.open_time), *columns, np.array(candles.volume))
+
+
+def test_run_window_trains_only_on_past(recorded_training):
+    candles = make_price_candles(1500, seed=2)
+    result = backtest.run_window(candles, 200, 1200, 1400, FEATURE_COLUMNS, 0.02)
+    [trained_on] = recorded_training
+    np.testing.assert_array_equal(trained_on, candles.open_time[200:1200])
+    assert result["candles"] == 200
+    assert result["test_start_time"] == candles.open_time[1200]
+    assert result["test_end_time"] == candles.open_time[1399]
+
+
+def test_future_candles_do_not_change_window_result(recorded_training):
+    candles = make_price_candles(1500, seed=2)
+    baseline = backtest.run_window(candles, 200, 1200, 1400, FEATURE_COLUMNS, 0.02)
+    # Свеча 1400 - только цена закрытия последней позиции; все после нее не должно влиять
+    changed = backtest.run_window(perturbed(candles, 1401), 200, 1200, 1400, FEATURE_COLUMNS, 0.02)
+    for key in ("filled", "rejected", "skipped", "hits", "trades"):
+        assert baseline[key] == changed[key]
+    np.testing.assert_array_equal(baseline["returns"], changed["returns"])
+
+
+def test_test_candles_do_not_leak_into_training(recorded_training, monkeypatch):
+    candles = make_price_candles(1500, seed=2)
+    models = []
+    original_predict = ModelLoader.predict_proba
+    
+    def recording_predict(self, X):
+        models.append(self)
+        return original_predict(self, X)
+    
+    monkeypatch.setattr(ModelLoader, "predict_proba", recording_predict)
+    backtest.run_window(candles, 200, 1200, 1400, FEATURE_COLUMNS, 0.02)
+    backtest.run_window(perturbed(candles, 1200), 200, 1200, 1400, FEATURE_COLUMNS, 0.02)
+    
+    X = np.random.default_rng(0).normal(size=(100, len(FEATURE_COLUMNS))) * 20 + 30000
+    assert models[0] is not models[-1]
+    np.testing.assert_array_equal(models[0].predict_proba(X), models[-1].predict_proba(X))
+
+
+def test_test_features_match_full_history(recorded_training, monkeypatch):
+    candles = make_price_candles(2500, seed=4)
+    features = []
+    original_predict = ModelLoader.predict_proba
+    
+    def recording_predict(self, X):
+        features.append(np.array(X))
+        return original_predict(self, X)
+    
+    monkeypatch.setattr(ModelLoader, "predict_proba", recording_predict)
+    backtest.run_window(candles, 900, 1400, 1600, FEATURE_COLUMNS, 0.02)
+    np.testing.assert_allclose(
+        features[-1], compute_feature_matrix(candles, FEATURE_COLUMNS)[1400:1600], rtol=1e-9, atol=1e-9
+    )
+
+
+def test_run_backtest_stitches_windows(recorded_training):
+    candles = make_price_candles(1000, seed=6)
+    report = backtest.run_backtest(candles, train_size=300, test_size=250, workers=1)
+    assert report["windows"] == 3
+    assert report["candles"] == 700
+    assert [window["candles"] for window in report["window_results"]] == [250, 250, 200]
+    assert report["filled"] + report["rejected"] + report["skipped"] == 700
+
+
+def test_forest_threads_depend_on_pool(monkeypatch):
+    n_jobs = []
+    
+    def fake_run_window(*args):
+        n_jobs.append(args[-1])
+        return {"returns": np.zeros(1), "filled": 0, "hits": 0, "rejected": 0, "skipped": 1, "trades": 0,
+                "exposure": 0.0, "candles": 1}
+    
+    monkeypatch.setattr(backtest, "run_window", fake_run_window)
+    candles = make_price_candles(500, seed=7)
+    backtest.run_backtest(candles, train_size=300, test_size=100, workers=1)
+    assert set(n_jobs) == {-1}
+
+
+def test_run_window_trains_single_threaded_by_default(monkeypatch):
+    params = []
+    original = ModelLoader.train_model_from_candles
+    
+    def recording(self, candles, *args, **kwargs):
+        params.append(dict(self.forest_params))
+        self.forest_params["n_estimators"] = 5
+        return original(self, candles, *args, **kwargs)
+    
+    monkeypatch.setattr(ModelLoader, "train_model_from_candles", recording)
+    backtest.run_window(make_price_candles(800, seed=8), 0, 600, 800, FEATURE_COLUMNS, 0.02)
+    assert params[0]["n_jobs"] == 1
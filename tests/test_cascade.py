@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+from app.ml.cascade import CascadeStats, cascade_predict_proba, evaluate_cascade
+
+
+class FixedStage:
+    """Первая ступень с заранее заданными вероятностями по строкам."""
+    
+    def __init__(self, probabilities: np.ndarray):
+        self.probabilities = probabilities
+    
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        return self.probabilities[X[:, 0].astype(int)].copy()
+
+
+FIRST = np.array([
+    [0.90, 0.05, 0.05],
+    [0.80, 0.10, 0.10],
+    [0.7999, 0.1001, 0.1],
+    [0.40, 0.30, 0.30],
+    [0.10, 0.10, 0.80],
+])
+FULL = np.array([
+    [0.20, 0.60, 0.20],
+    [0.20, 0.60, 0.20],
+    [0.20, 0.60, 0.20],
+    [0.20, 0.20, 0.60],
+    [0.60, 0.20, 0.20],
+])
+X = np.arange(len(FIRST), dtype=float).reshape(-1, 1)
+
+
+def full_predict_proba(calls):
+    def predict(X_rows: np.ndarray) -> np.ndarray:
+        calls.append(X_rows[:, 0].astype(int).tolist())
+        return FULL[X_rows[:, 0].astype(int)]
+    return predict
+
+
+def test_rows_at_threshold_stay_on_first_stage():
+    calls = []
+    stats = CascadeStats()
+    probabilities = cascade_predict_proba(FixedStage(FIRST), full_predict_proba(calls), X, 0.8, stats=stats)
+    
+    # 0.8 >= 0.8 остается на первой ступени, 0.7999 уходит в лес
+    assert calls == [[2, 3]]
+    np.testing.assert_array_equal(probabilities[[0, 1, 4]], FIRST[[0, 1, 4]])
+    np.testing.assert_array_equal(probabilities[[2, 3]], FULL[[2, 3]])
+    result = stats.get_stats()
+    assert (result["rows"], result["first_stage_hits"], result["escalations"]) == (5, 3, 2)
+    assert result["agreement_rate"] is None
+
+
+@pytest.mark.parametrize("confidence, escalated", [(0.0, []), (0.85, [1, 2, 3, 4]), (1.01, [0, 1, 2, 3, 4])])
+def test_threshold_controls_escalation(confidence, escalated):
+    calls = []
+    probabilities = cascade_predict_proba(FixedStage(FIRST), full_predict_proba(calls), X, confidence)
+    assert calls == ([escalated] if escalated else [])
+    expected = FIRST.copy()
+    expected[escalated] = FULL[escalated]
+    np.testing.assert_array_equal(probabilities, expected)
+
+
+def test_audit_scores_first_stage_rows_without_changing_answers():
+    calls = []
+    stats = CascadeStats()
+    probabilities = cascade_predict_proba(
+        FixedStage(FIRST), full_predict_proba(calls), X, 0.8, audit_rate=1.0, stats=stats
+    )
+    assert calls == [[2, 3, 0, 1, 4]]
+    np.testing.assert_array_equal(probabilities[[0, 1, 4]], FIRST[[0, 1, 4]])
+    result = stats.get_stats()
+    assert result["audited"] == 3
+    assert result["agreement_rate"] == 0.0
+
+
+def test_evaluate_cascade_curve_uses_inclusive_bounds():
+    classes = np.array([-1, 0, 1])
+    y_true = np.array([-1, 0, 0, 1, -1])
+    report = evaluate_cascade(FIRST, FULL, classes, y_true, bounds=(0.8, 0.95))
+    assert report["full_accuracy"] == pytest.approx(4 / 5)
+    assert report["first_stage_accuracy"] == pytest.approx(1 / 5)
+    at_08, at_095 = report["curve"]
+    assert at_08["coverage"] == pytest.approx(3 / 5)
+    assert at_08["agreement"] == 0.0
+    assert at_08["accuracy"] == pytest.approx(3 / 5)
+    assert at_095 == {"confidence": 0.95, "coverage": 0.0, "agreement": None, "accuracy": pytest.approx(4 / 5)}
@@ -0,0 +1,56 @@
+import numpy as np
+from sklearn.tree import DecisionTreeClassifier
+from app.ml.compiled_forest import PREDICT_BLOCK_ROWS, CompiledForest
+
+
+def random_rows(model_loader, n: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    scaler = model_loader.scaler
+    return scaler.mean_ + rng.normal(size=(n, len(scaler.mean_))) * scaler.scale_ * 1.5
+
+
+def boundary_rows(model_loader, compiled: CompiledForest, n: int = 600, seed: int = 0) -> np.ndarray:
+    """Строки, в которых признак узла равен порогу или соседним с ним double."""
+    rng = np.random.default_rng(seed)
+    rows = random_rows(model_loader, n, seed)
+    internal = np.flatnonzero(np.isfinite(compiled.threshold))
+    nodes = rng.choice(internal, size=n)
+    steps = rng.integers(-2, 3, size=n)
+    for row, node, step in zip(rows, nodes, steps):
+        value = compiled.threshold[node]
+        for _ in range(abs(step)):
+            value = np.nextafter(value, np.inf if step > 0 else -np.inf)
+        row[compiled.feature[node]] = value
+    return rows
+
+
+def sklearn_proba(model_loader, X: np.ndarray) -> np.ndarray:
+    return model_loader.model.predict_proba(model_loader.scaler.transform(X))
+
+
+def test_forest_matches_sklearn_on_random_and_boundary_rows(trained_loader):
+    compiled = CompiledForest.from_sklearn(trained_loader.model, trained_loader.scaler)
+    for X in (random_rows(trained_loader, 2000), boundary_rows(trained_loader, compiled)):
+        np.testing.assert_allclose(compiled.predict_proba(X), sklearn_proba(trained_loader, X), rtol=0, atol=1e-12)
+        np.testing.assert_array_equal(compiled.predict(X), trained_loader.model.predict(trained_loader.scaler.transform(X)))
+
+
+def test_blocked_and_single_row_paths_match(trained_loader):
+    compiled = trained_loader.compiled
+    X = random_rows(trained_loader, PREDICT_BLOCK_ROWS * 2 + 7, seed=1)
+    expected = sklearn_proba(trained_loader, X)
+    np.testing.assert_allclose(compiled.predict_proba(X), expected, rtol=0, atol=1e-12)
+    np.testing.assert_allclose(compiled.predict_proba(X[:1]), expected[:1], rtol=0, atol=1e-12)
+
+
+def test_single_tree_without_scaler():
+    rng = np.random.default_rng(2)
+    X = rng.normal(size=(500, 3))
+    y = (X[:, 0] + X[:, 1] * X[:, 2] > 0).astype(int) + (X[:, 2] > 1)
+    tree = DecisionTreeClassifier(max_depth=5, random_state=0).fit(X, y)
+    compiled = CompiledForest.from_sklearn(tree)
+    
+    X_test = rng.normal(size=(300, 3))
+    np.testing.assert_allclose(compiled.predict_proba(X_test), tree.predict_proba(X_test), rtol=0, atol=1e-12)
+    for row in X_test[:50]:
+        np.testing.assert_allclose(compiled.predict_proba(row[None, :]), tree.predict_proba(row[None, :]), atol=1e-12)
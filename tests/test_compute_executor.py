@@ -0,0 +1,102 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from app.services.compute_executor import ExecutorOverloaded, _BoundedPool
+
+
+def blocking_task(release: threading.Event, value: int) -> int:
+    release.wait(5)
+    return value
+
+
+def failing_task():
+    raise RuntimeError("boom")
+
+
+@pytest.fixture
+def pool():
+    executor = ThreadPoolExecutor(max_workers=2)
+    yield _BoundedPool("test", executor, max_concurrency=2, max_queue=3)
+    executor.shutdown(wait=True, cancel_futures=True)
+
+
+async def wait_until(predicate, timeout: float = 2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.001)
+
+
+async def test_rejects_when_queue_is_full(pool):
+    release = threading.Event()
+    tasks = [asyncio.create_task(pool.run(blocking_task, release, i)) for i in range(5)]
+    await wait_until(lambda: pool.running == 2 and pool.queue_depth == 3)
+    
+    with pytest.raises(ExecutorOverloaded):
+        await pool.run(blocking_task, release, 99)
+    assert pool.rejected == 1
+    
+    release.set()
+    assert await asyncio.gather(*tasks) == list(range(5))
+    stats = pool.get_stats()
+    assert stats["completed"] == 5
+    assert stats["rejected"] == 1
+    assert stats["max_queue_depth"] == 3
+    assert stats["running"] == 0
+    assert stats["queue_depth"] == 0
+
+
+async def test_accepts_again_after_queue_drains(pool):
+    release = threading.Event()
+    tasks = [asyncio.create_task(pool.run(blocking_task, release, i)) for i in range(5)]
+    await wait_until(lambda: pool.queue_depth == 3)
+    release.set()
+    await asyncio.gather(*tasks)
+    
+    assert await pool.run(blocking_task, release, 7) == 7
+    assert pool.rejected == 0
+
+
+async def test_concurrency_never_exceeds_limit(pool):
+    release = threading.Event()
+    observed = []
+    
+    def tracked(value: int) -> int:
+        observed.append(pool.running)
+        return blocking_task(release, value)
+    
+    tasks = [asyncio.create_task(pool.run(tracked, i)) for i in range(5)]
+    await wait_until(lambda: pool.running == 2)
+    release.set()
+    await asyncio.gather(*tasks)
+    assert max(observed) <= pool.max_concurrency
+
+
+async def test_failure_releases_slot(pool):
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            await pool.run(failing_task)
+    assert pool.failed == 3
+    assert pool.running == 0
+    release = threading.Event()
+    release.set()
+    assert await pool.run(blocking_task, release, 1) == 1
+
+
+async def test_cancelled_waiter_leaves_queue(pool):
+    release = threading.Event()
+    running = [asyncio.create_task(pool.run(blocking_task, release, i)) for i in range(2)]
+    await wait_until(lambda: pool.running == 2)
+    waiter = asyncio.create_task(pool.run(blocking_task, release, 2))
+    await wait_until(lambda: pool.queue_depth == 1)
+    
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert pool.queue_depth == 0
+    
+    release.set()
+    await asyncio.gather(*running)
+    assert pool.running == 0
@@ -0,0 +1,60 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
+from app.db_models.db import _async_engine_options, async_database_url
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("sqlite:///./trading.db", "sqlite+aiosqlite:///./trading.db"),
+    ("sqlite://", "sqlite+aiosqlite://"),
+    ("sqlite+pysqlite:///data/t.db", "sqlite+aiosqlite:///data/t.db"),
+    ("postgresql://user:p%40ss@db:5432/trades", "postgresql+asyncpg://user:p%40ss@db:5432/trades"),
+    ("postgres://user:pass@db/trades", "postgresql+asyncpg://user:pass@db/trades"),
+    ("postgresql+psycopg2://user:pass@db/trades", "postgresql+asyncpg://user:pass@db/trades"),
+])
+def test_sync_urls_map_to_async_drivers(url, expected):
+    assert async_database_url(url) == expected
+
+
+@pytest.mark.parametrize("url", [
+    "sqlite+aiosqlite:///./trading.db",
+    "postgresql+asyncpg://user:pass@db/trades",
+])
+def test_async_urls_are_kept(url):
+    assert async_database_url(url) == url
+
+
+def test_unsupported_backend_is_rejected():
+    with pytest.raises(ValueError):
+        async_database_url("mysql://user:pass@db/trades")
+
+
+def test_sqlite_pool_options():
+    assert _async_engine_options("sqlite+aiosqlite://")["poolclass"] is StaticPool
+    options = _async_engine_options("sqlite+aiosqlite:///./trading.db")
+    assert options["poolclass"] is AsyncAdaptedQueuePool
+    assert options["max_overflow"] == 0
+
+
+@pytest.mark.parametrize("url", ["sqlite:///{path}", "sqlite+aiosqlite:///{path}"])
+def test_app_database_imports_with_sync_and_async_urls(tmp_path, url):
+    env = {**os.environ, "DATABASE_URL": url.format(path=tmp_path / "trading.db")}
+    code = (
+        "import asyncio\n"
+        "from app.db_models import db\n"
+        "from app.db_models.trade_entity import Trade\n"
+        "async def main():\n"
+        "    await db.init_db()\n"
+        "    await db.async_engine.dispose()\n"
+        "asyncio.run(main())\n"
+        "print(db.async_engine.url.drivername)\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], env=env, capture_output=True, text=True, cwd=os.getcwd(), timeout=30
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "sqlite+aiosqlite"
+    assert (tmp_path / "trading.db").exists()
@@ -0,0 +1,125 @@
+import numpy as np
+import pytest
+from app.ml.features import FEATURE_COLUMNS, compute_feature_matrix, compute_latest_features, feature_vector
+from app.ml.model_loader import ModelLoader
+from app.services.candles import Candles
+from app.services.indicator_engine import IndicatorEngine
+
+TOLERANCE = dict(rtol=1e-9, atol=1e-7)
+
+
+def make_candles(n: int, seed: int = 0) -> Candles:
+    rng = np.random.default_rng(seed)
+    close = 30000 + np.cumsum(rng.normal(0, 20, n))
+    return Candles(
+        open_time=1700000000000 + np.arange(n, dtype=np.int64) * 60000,
+        open=close.copy(),
+        high=close + 5,
+        low=close - 5,
+        close=close,
+        volume=rng.uniform(1, 100, n)
+    )
+
+
+def reference_sma(close: np.ndarray, window: int) -> float:
+    """SMA по последним window свечам (min_periods=1)."""
+    return float(close[-window:].mean())
+
+
+def reference_rsi(close: np.ndarray, period: int = 14) -> float:
+    """RSI Уайлдера по всей истории: простое среднее за period изменений, затем рекурсия."""
+    deltas = np.diff(close)
+    if len(deltas) < period:
+        return 50.0
+    gains = np.maximum(deltas, 0.0)
+    losses = np.maximum(-deltas, 0.0)
+    avg_gain = gains[:period].mean()
+    avg_loss = losses[:period].mean()
+    for gain, loss in zip(gains[period:], losses[period:]):
+        avg_gain = (avg_gain * (period - 1) + gain) / period
+        avg_loss = (avg_loss * (period - 1) + loss) / period
+    if avg_loss == 0:
+        return 100.0
+    return float(100 - 100 / (1 + avg_gain / avg_loss))
+
+
+def reference_features(candles: Candles) -> dict:
+    close = candles.close
+    return {
+        "sma_10": reference_sma(close, 10),
+        "sma_50": reference_sma(close, 50),
+        "rsi_14": reference_rsi(close, 14),
+        "current_price": float(close[-1]),
+        "price_change_1m": (close[-1] - close[-2]) / close[-2] * 100 if len(close) > 1 else 0.0,
+        "volume": float(candles.volume[-1])
+    }
+
+
+def assert_features_close(actual: dict, expected: dict):
+    assert actual.keys() == expected.keys()
+    for key, value in expected.items():
+        np.testing.assert_allclose(actual[key], value, err_msg=key, **TOLERANCE)
+
+
+def test_engine_matches_batch_reference_candle_by_candle():
+    candles = make_candles(300)
+    engine = IndicatorEngine()
+    for end in range(1, len(candles) + 1):
+        window = candles.slice(0, end)
+        assert_features_close(engine.update("BTCUSDT", "1m", window), reference_features(window))
+
+
+@pytest.mark.parametrize("n", [1, 2, 14, 15, 16, 49, 50, 51, 500])
+def test_engine_matches_batch_reference_from_cold_start(n):
+    candles = make_candles(n, seed=n)
+    assert_features_close(IndicatorEngine().update("BTCUSDT", "1m", candles), reference_features(candles))
+
+
+def test_engine_rebuilds_after_gap():
+    candles = make_candles(200)
+    engine = IndicatorEngine()
+    engine.update("BTCUSDT", "1m", candles.slice(0, 100))
+    window = candles.slice(150, 200)
+    assert_features_close(engine.update("BTCUSDT", "1m", window), reference_features(window))
+
+
+def test_engine_restored_from_snapshot_matches_reference():
+    candles = make_candles(200)
+    engine = IndicatorEngine()
+    engine.update("BTCUSDT", "1m", candles.slice(0, 120))
+    restored = IndicatorEngine()
+    restored.restore(engine.snapshot())
+    window = candles.slice(0, 200)
+    assert_features_close(restored.update("BTCUSDT", "1m", window), reference_features(window))
+
+
+def test_train_latest_and_engine_features_match():
+    """Признаки обучения, инференса и инкрементального движка совпадают на каждой свече."""
+    candles = make_candles(400)
+    matrix = compute_feature_matrix(candles)
+    engine = IndicatorEngine()
+    for end in range(1, len(candles) + 1):
+        window = candles.slice(0, end)
+        latest = feature_vector(compute_latest_features(window))[0]
+        incremental = feature_vector(engine.update("BTCUSDT", "1m", window))[0]
+        np.testing.assert_allclose(latest, matrix[end - 1], err_msg=f"end={end}", **TOLERANCE)
+        np.testing.assert_allclose(incremental, matrix[end - 1], err_msg=f"end={end}", **TOLERANCE)
+
+
+@pytest.mark.parametrize("n", list(range(1, 50)) + [50, 51, 100, 1000])
+def test_train_latest_and_engine_features_match_from_cold_start(n):
+    candles = make_candles(n, seed=n)
+    klines = [
+        [int(t), str(o), str(h), str(l), str(c), str(v), int(t) + 59999, "0", 1, "0", "0", "0"]
+        for t, o, h, l, c, v in zip(
+            candles.open_time, candles.open, candles.high, candles.low, candles.close, candles.volume
+        )
+    ]
+    training = ModelLoader()._prepare_features(klines)[FEATURE_COLUMNS].to_numpy()
+    assert training.shape == (n, len(FEATURE_COLUMNS))
+    np.testing.assert_allclose(training, compute_feature_matrix(candles), **TOLERANCE)
+    
+    latest = feature_vector(compute_latest_features(candles))[0]
+    incremental = feature_vector(IndicatorEngine().update("BTCUSDT", "1m", candles))[0]
+    np.testing.assert_allclose(latest, training[-1], **TOLERANCE)
+    np.testing.assert_allclose(incremental, training[-1], **TOLERANCE)
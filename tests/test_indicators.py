@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+from app.ml.indicators import INDICATORS, compute_indicators, latest_indicators, rolling_mean, rolling_std, rolling_sum
+from app.services.candles import Candles
+
+
+def make_candles(n: int, seed: int = 0) -> Candles:
+    rng = np.random.default_rng(seed)
+    close = 30000 + np.cumsum(rng.normal(0, 20, n))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    return Candles(
+        open_time=1700000000000 + np.arange(n, dtype=np.int64) * 60000,
+        open=open_,
+        high=np.maximum(open_, close) + rng.uniform(0, 15, n),
+        low=np.minimum(open_, close) - rng.uniform(0, 15, n),
+        close=close,
+        volume=rng.uniform(1, 100, n)
+    )
+
+
+@pytest.mark.parametrize("window", [10, 20, 50])
+def test_rolling_windows_match_pandas_on_short_and_long_series(window):
+    rng = np.random.default_rng(window)
+    for n in range(1, 2 * window + 1):
+        values = 30000 + np.cumsum(rng.normal(0, 20, n))
+        series = pd.Series(values).rolling(window, min_periods=1)
+        np.testing.assert_allclose(rolling_sum(values, window), series.sum().to_numpy(), rtol=1e-9, err_msg=f"n={n}")
+        np.testing.assert_allclose(rolling_mean(values, window), series.mean().to_numpy(), rtol=1e-9, err_msg=f"n={n}")
+        np.testing.assert_allclose(
+            rolling_std(values, window), series.std(ddof=0).to_numpy(), rtol=1e-6, atol=1e-6, err_msg=f"n={n}"
+        )
+
+
+def test_rolling_windows_on_empty_series():
+    assert len(rolling_sum(np.empty(0), 10)) == 0
+    assert len(rolling_mean(np.empty(0), 10)) == 0
+    assert len(rolling_std(np.empty(0), 10)) == 0
+
+
+def test_all_indicators_on_short_series():
+    names = list(INDICATORS)
+    for n in range(1, 101):
+        candles = make_candles(n, seed=n)
+        values = compute_indicators(candles, names)
+        assert values.shape == (n, len(names))
+        assert np.isfinite(values).all(), f"n={n}"
+        np.testing.assert_allclose(
+            [latest_indicators(candles, names)[name] for name in names], values[-1], rtol=1e-12, err_msg=f"n={n}"
+        )
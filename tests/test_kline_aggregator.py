@@ -0,0 +1,122 @@
+import numpy as np
+import pytest
+from app.services.kline_aggregator import INTERVAL_MS, KlineAggregator, read_candles
+from app.services.kline_store import KlineStore
+
+MINUTE = INTERVAL_MS["1m"]
+# Начало суток UTC: кратно всем интервалам, включая 4h
+DAY = 1700006400000 - 1700006400000 % (4 * 60 * MINUTE)
+
+
+def minute_klines(start_minute: int, n: int, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    klines = []
+    for i in range(start_minute, start_minute + n):
+        open_time = DAY + i * MINUTE
+        close = 100 + rng.normal()
+        klines.append([
+            open_time, 100.0 + i % 7, 110.0 + rng.uniform(), 90.0 - rng.uniform(), close, float(i % 5 + 1),
+            open_time + MINUTE - 1, float(i % 3), i % 4 + 1, 0.5, 1.5, "0"
+        ])
+    return klines
+
+
+def reference_buckets(klines: list, interval: str, complete_only: bool = True) -> list:
+    """Свечи интервала, собранные перебором минут (только полные, если complete_only)."""
+    interval_ms = INTERVAL_MS[interval]
+    buckets = {}
+    for kline in klines:
+        buckets.setdefault(kline[0] - kline[0] % interval_ms, []).append(kline)
+    rows = []
+    for start, minutes in sorted(buckets.items()):
+        if complete_only and len(minutes) != interval_ms // MINUTE:
+            continue
+        rows.append([
+            start, minutes[0][1], max(k[2] for k in minutes), min(k[3] for k in minutes), minutes[-1][4],
+            sum(k[5] for k in minutes), start + interval_ms - 1, sum(k[7] for k in minutes),
+            sum(k[8] for k in minutes), sum(k[9] for k in minutes), sum(k[10] for k in minutes), "0"
+        ])
+    return rows
+
+
+def assert_klines_equal(actual: list, expected: list):
+    assert [row[0] for row in actual] == [row[0] for row in expected]
+    np.testing.assert_allclose(
+        np.array([row[:11] for row in actual], dtype=float),
+        np.array([row[:11] for row in expected], dtype=float),
+        rtol=1e-12
+    )
+
+
+@pytest.mark.parametrize("interval", ["5m", "15m", "1h"])
+@pytest.mark.parametrize("start_minute", [0, 3, 59])
+def test_incremental_buckets_match_reference(interval, start_minute):
+    klines = minute_klines(start_minute, 300)
+    aggregator = KlineAggregator(intervals=[interval])
+    # Минуты приходят окнами, последняя в окне еще не закрыта
+    for end in range(10, len(klines) + 1, 7):
+        aggregator.update("BTCUSDT", klines[:end])
+    aggregator.update("BTCUSDT", klines)
+    
+    closed = klines[:-1]
+    first_start = closed[0][0] - closed[0][0] % INTERVAL_MS[interval]
+    expected = reference_buckets(
+        [k for k in klines if k[0] >= first_start + (0 if closed[0][0] == first_start else INTERVAL_MS[interval])],
+        interval,
+        complete_only=False
+    )
+    actual = aggregator.get_klines("BTCUSDT", interval, len(expected))
+    assert_klines_equal(actual, expected)
+    # Первая свеча без начала интервала не собирается
+    assert actual[0][0] % INTERVAL_MS[interval] == 0 and actual[0][0] >= closed[0][0]
+
+
+def test_bucket_closes_on_its_last_minute():
+    aggregator = KlineAggregator(intervals=["5m"])
+    klines = minute_klines(0, 6)
+    aggregator.update("BTCUSDT", klines[:5])
+    assert aggregator.get_klines("BTCUSDT", "5m", 1)[0][0] == DAY
+    aggregator.update("BTCUSDT", klines)
+    series = aggregator._series["BTCUSDT"]["5m"]
+    assert [row[0] for row in series.closed] == [DAY]
+    assert series.partial is None
+    # Незакрытая шестая минута открывает следующую свечу только при чтении
+    assert [row[0] for row in aggregator.get_klines("BTCUSDT", "5m", 2)] == [DAY, DAY + 5 * MINUTE]
+
+
+def test_gap_inside_bucket_keeps_series_and_long_gap_resets():
+    aggregator = KlineAggregator(intervals=["15m"])
+    klines = minute_klines(0, 100)
+    aggregator.update("BTCUSDT", klines[:32])
+    aggregator.update("BTCUSDT", klines[35:50])
+    assert aggregator.resets == 0
+    assert aggregator.gaps == 1
+    
+    aggregator.update("BTCUSDT", klines[90:100])
+    assert aggregator.resets == 1
+    assert aggregator.get_klines("BTCUSDT", "15m", 2) is None
+
+
+@pytest.mark.parametrize("interval", ["5m", "4h"])
+def test_store_aggregation_and_seed_match_incremental(tmp_path, interval):
+    klines = minute_klines(7, 3 * 24 * 60)
+    store = KlineStore(str(tmp_path))
+    store.append("BTCUSDT", "1m", klines)
+    
+    candles = read_candles(store, "BTCUSDT", interval)
+    expected = reference_buckets(klines, interval)
+    assert_klines_equal(
+        [[int(t), o, h, l, c, v, 0, 0, 0, 0, 0] for t, o, h, l, c, v in zip(
+            candles.open_time, candles.open, candles.high, candles.low, candles.close, candles.volume
+        )],
+        [row[:6] + [0] * 5 for row in expected]
+    )
+    
+    seeded = KlineAggregator(intervals=[interval])
+    seeded.seed("BTCUSDT", store.read("BTCUSDT", "1m"))
+    incremental = KlineAggregator(intervals=[interval])
+    live = minute_klines(7 + len(klines), 1)
+    incremental.update("BTCUSDT", klines + live)
+    seeded.update("BTCUSDT", live)
+    limit = len(expected) - 1
+    assert_klines_equal(seeded.get_klines("BTCUSDT", interval, limit), incremental.get_klines("BTCUSDT", interval, limit))
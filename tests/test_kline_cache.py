@@ -0,0 +1,71 @@
+import asyncio
+from app.services.kline_cache import KlineCache
+from app.services.market_data_client import KLINES_DELTA_LIMIT, BinanceMarketDataClient
+
+
+def kline(open_time: int, close: float = 1.0) -> list:
+    return [open_time, "1", "1", "1", str(close), "1", open_time + 59999, "0", 1, "0", "0", "0"]
+
+
+def test_merge_replaces_unclosed_candle_and_appends_new():
+    cache = KlineCache(max_candles=5)
+    cache.replace("BTCUSDT", "1m", [kline(t) for t in range(0, 240000, 60000)])
+    cache.merge("BTCUSDT", "1m", [kline(180000, close=2.0), kline(240000), kline(300000)])
+    
+    klines = cache.tail("BTCUSDT", "1m", 10)
+    assert [k[0] for k in klines] == [60000, 120000, 180000, 240000, 300000]
+    assert klines[2][4] == "2.0"
+    assert cache.tail("BTCUSDT", "1m", 2) == klines[-2:]
+
+
+def test_merge_without_series_replaces():
+    cache = KlineCache()
+    cache.merge("BTCUSDT", "1m", [kline(0), kline(60000)])
+    assert [k[0] for k in cache.tail("BTCUSDT", "1m", 10)] == [0, 60000]
+
+
+def test_push_updates_last_candle_and_ignores_old_ones():
+    cache = KlineCache()
+    cache.push("BTCUSDT", "1m", kline(0))
+    assert cache.get("BTCUSDT", "1m") is None
+    cache.replace("BTCUSDT", "1m", [kline(0), kline(60000)])
+    cache.push("BTCUSDT", "1m", kline(60000, close=3.0))
+    cache.push("BTCUSDT", "1m", kline(0, close=9.0))
+    cache.push("BTCUSDT", "1m", kline(120000))
+    klines = cache.tail("BTCUSDT", "1m", 10)
+    assert [k[0] for k in klines] == [0, 60000, 120000]
+    assert klines[0][4] == "1.0" and klines[1][4] == "3.0"
+
+
+def test_lru_eviction_and_tail_of_missing_series():
+    cache = KlineCache(max_series=2)
+    cache.replace("A", "1m", [kline(0)])
+    cache.replace("B", "1m", [kline(0)])
+    cache.get("A", "1m")
+    cache.replace("C", "1m", [kline(0)])
+    assert cache.get("B", "1m") is None
+    assert cache.get("A", "1m") is not None
+    assert cache.tail("B", "1m", 10) == []
+    assert cache.evictions == 1
+
+
+async def test_series_evicted_during_delta_fetch_is_reloaded():
+    client = BinanceMarketDataClient(client=object())
+    client.kline_cache = KlineCache(max_candles=100, max_series=1)
+    history = [kline(t * 60000) for t in range(50)]
+    client.kline_cache.replace("BTCUSDT", "1m", history[:40])
+    requests = []
+    
+    async def fetch_klines(symbol, interval, limit, start_time=None, end_time=None):
+        requests.append((symbol, limit, start_time))
+        if start_time is not None:
+            # Параллельный запрос другой серии вытесняет BTCUSDT
+            client.kline_cache.replace("ETHUSDT", "1m", [kline(0)])
+            await asyncio.sleep(0)
+            return [k for k in history if k[0] >= start_time][:KLINES_DELTA_LIMIT]
+        return history[-limit:]
+    
+    client._fetch_klines = fetch_klines
+    klines = await client.get_recent_klines("BTCUSDT", "1m", limit=30)
+    assert [k[0] for k in klines] == [k[0] for k in history[-30:]]
+    assert requests == [("BTCUSDT", KLINES_DELTA_LIMIT, 39 * 60000), ("BTCUSDT", 30, None)]
@@ -0,0 +1,92 @@
+import json
+import numpy as np
+from app.services.kline_store import KLINE_COLUMNS, KlineStore, backfill_klines
+
+MINUTE = 60000
+START = 1600000000000
+
+
+def kline(i: int) -> list:
+    open_time = START + i * MINUTE
+    return [
+        open_time, f"{100 + i}.5", f"{101 + i}.25", f"{99 + i}.75", f"{100 + i}.0", f"{i}.125",
+        open_time + MINUTE - 1, f"{i * 2}.5", i, "0.5", "1.5", "0"
+    ]
+
+
+def test_append_read_round_trip(tmp_path):
+    store = KlineStore(str(tmp_path))
+    assert store.append("btcusdt", "1m", [kline(i) for i in range(5)]) == 5
+    assert store.append("BTCUSDT", "1m", [kline(i) for i in range(3, 8)]) == 3
+    
+    columns = store.read("BTCUSDT", "1m")
+    assert store.count("BTCUSDT", "1m") == 8
+    assert store.last_open_time("BTCUSDT", "1m") == START + 7 * MINUTE
+    for index, (name, dtype) in enumerate(KLINE_COLUMNS):
+        assert columns[name].dtype == dtype
+        expected = np.array([kline(i)[index] for i in range(8)], dtype=np.float64).astype(dtype)
+        np.testing.assert_array_equal(columns[name], expected)
+    
+    window = store.read("BTCUSDT", "1m", start_time=START + 2 * MINUTE, end_time=START + 4 * MINUTE)
+    assert window["open_time"].tolist() == [START + i * MINUTE for i in (2, 3, 4)]
+
+
+def test_unclosed_candles_are_skipped(tmp_path):
+    store = KlineStore(str(tmp_path))
+    unclosed = kline(0)
+    unclosed[0] = 4102444800000
+    unclosed[6] = unclosed[0] + MINUTE - 1
+    assert store.append("BTCUSDT", "1m", [kline(0), unclosed]) == 1
+    assert store.read("ETHUSDT", "1m")["open_time"].size == 0
+
+
+def test_interrupted_append_tail_is_discarded(tmp_path):
+    store = KlineStore(str(tmp_path))
+    store.append("BTCUSDT", "1m", [kline(i) for i in range(3)])
+    # Прерванная запись: байты в колонке есть, а meta.json не обновлен
+    with open(tmp_path / "BTCUSDT" / "1m" / "close.bin", "ab") as f:
+        np.array([1e9], dtype=np.float64).tofile(f)
+    
+    store.append("BTCUSDT", "1m", [kline(3)])
+    assert store.read("BTCUSDT", "1m")["close"].tolist() == [100.0, 101.0, 102.0, 103.0]
+
+
+def test_meta_ahead_of_column_files_is_truncated(tmp_path):
+    store = KlineStore(str(tmp_path))
+    store.append("BTCUSDT", "1m", [kline(i) for i in range(4)])
+    series_dir = tmp_path / "BTCUSDT" / "1m"
+    # Сбой после записи meta.json: в одной колонке не хватает двух строк
+    with open(series_dir / "volume.bin", "r+b") as f:
+        f.truncate(2 * 8)
+    
+    assert store.count("BTCUSDT", "1m") == 2
+    assert store.last_open_time("BTCUSDT", "1m") == START + MINUTE
+    assert store.read("BTCUSDT", "1m")["volume"].tolist() == [0.125, 1.125]
+    
+    store.append("BTCUSDT", "1m", [kline(i) for i in range(2, 5)])
+    columns = store.read("BTCUSDT", "1m")
+    assert columns["open_time"].tolist() == [START + i * MINUTE for i in range(5)]
+    assert columns["volume"].tolist() == [0.125, 1.125, 2.125, 3.125, 4.125]
+    with open(series_dir / "meta.json") as f:
+        assert json.load(f)["count"] == 5
+
+
+async def test_backfill_pages_and_resumes(tmp_path):
+    store = KlineStore(str(tmp_path))
+    history = [kline(i) for i in range(2500)]
+    pages = []
+    
+    class Client:
+        async def get_klines_range(self, symbol, interval, start_time, end_time, limit):
+            pages.append(start_time)
+            return [k for k in history if start_time <= k[0] <= end_time][:limit]
+    
+    end_time = history[-1][0]
+    assert await backfill_klines(Client(), store, "BTCUSDT", "1m", START, end_time) == 2500
+    assert len(pages) == 3
+    # Повторный запуск продолжает с последней сохраненной свечи
+    history.extend(kline(i) for i in range(2500, 2600))
+    assert await backfill_klines(Client(), store, "BTCUSDT", "1m", START, history[-1][0]) == 100
+    assert pages[-1] == end_time + 1
+    assert await backfill_klines(Client(), store, "BTCUSDT", "1m", START, end_time) == 0
+    assert store.count("BTCUSDT", "1m") == 2600
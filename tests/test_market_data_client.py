@@ -0,0 +1,73 @@
+import asyncio
+from app.services.market_data_client import BinanceMarketDataClient
+
+
+def make_client(body: bytes = b'{"price": "1.5", "levels": [1]}', delay: float = 0.05, ttl: float = 0.0):
+    client = BinanceMarketDataClient(client=object())
+    client.single_flight_ttl = ttl
+    calls = []
+    
+    async def request(path, params):
+        calls.append((path, params))
+        await asyncio.sleep(delay)
+        return body
+    
+    client._request = request
+    return client, calls
+
+
+async def test_concurrent_identical_requests_share_one_call():
+    client, calls = make_client()
+    results = await asyncio.gather(*(client._get("/api/v3/ticker/price", {"symbol": "BTCUSDT"}) for _ in range(5)))
+    
+    assert len(calls) == 1
+    assert all(result == {"price": "1.5", "levels": [1]} for result in results)
+    assert len({id(result) for result in results}) == 5
+    assert client.get_stats()["coalesced_requests"] == 4
+
+
+async def test_different_params_are_not_coalesced():
+    client, calls = make_client()
+    await asyncio.gather(
+        client._get("/api/v3/ticker/price", {"symbol": "BTCUSDT"}),
+        client._get("/api/v3/ticker/price", {"symbol": "ETHUSDT"})
+    )
+    assert len(calls) == 2
+
+
+async def test_waiters_retry_when_leader_is_cancelled():
+    client, calls = make_client()
+    leader = asyncio.create_task(client._get("/p", {"a": 1}))
+    await asyncio.sleep(0.01)
+    waiters = [asyncio.create_task(client._get("/p", {"a": 1})) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    leader.cancel()
+    
+    results = await asyncio.gather(*waiters)
+    assert leader.cancelled()
+    assert all(result == {"price": "1.5", "levels": [1]} for result in results)
+    assert len(calls) == 2
+
+
+async def test_leader_error_reaches_waiters():
+    client = BinanceMarketDataClient(client=object())
+    
+    async def request(path, params):
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream")
+    
+    client._request = request
+    results = await asyncio.gather(*(client._get("/p", {}) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert client._inflight == {}
+
+
+async def test_ttl_serves_private_copies():
+    client, calls = make_client(ttl=10.0)
+    first = await client._get("/p", {})
+    first["levels"].append(2)
+    second = await client._get("/p", {})
+    
+    assert len(calls) == 1
+    assert second["levels"] == [1]
+    assert client.get_stats()["ttl_hits"] == 1
@@ -0,0 +1,112 @@
+import asyncio
+import json
+import time
+import httpx
+import websockets
+from app.services.market_data_client import BinanceMarketDataClient
+from app.services.market_stream import BinanceMarketStream
+
+MINUTE = 60000
+
+
+def kline(open_time: int, close: float) -> list:
+    return [open_time, str(close), str(close), str(close), str(close), "1.0", open_time + MINUTE - 1, "0", 1, "0", "0", "0"]
+
+
+def kline_message(symbol: str, row: list) -> str:
+    return json.dumps({"stream": f"{symbol.lower()}@kline_1m", "data": {
+        "e": "kline", "s": symbol, "k": {
+            "t": row[0], "o": row[1], "h": row[2], "l": row[3], "c": row[4], "v": row[5],
+            "T": row[6], "q": row[7], "n": row[8], "V": row[9], "Q": row[10], "i": "1m"
+        }
+    }})
+
+
+def book_ticker_message(symbol: str, price: float) -> str:
+    return json.dumps({"stream": f"{symbol.lower()}@bookTicker", "data": {
+        "s": symbol, "b": str(price - 0.5), "a": str(price + 0.5)
+    }})
+
+
+class StubBinance:
+    """Локальная заглушка Binance: REST через httpx.MockTransport и WebSocket через websockets.serve."""
+    
+    def __init__(self, candles: int = 120):
+        self.history = [kline(i * MINUTE, 100.0 + i) for i in range(candles)]
+        self.connections = 0
+        self.rest_requests = []
+        self.drop_first_connection = asyncio.Event()
+        self.second_connection = asyncio.Event()
+    
+    def rest(self, request: httpx.Request) -> httpx.Response:
+        params = request.url.params
+        self.rest_requests.append((request.url.path, dict(params)))
+        if request.url.path == "/api/v3/ticker/price":
+            return httpx.Response(200, json={"symbol": params["symbol"], "price": self.history[-1][4]})
+        klines = self.history
+        if "startTime" in params:
+            klines = [row for row in klines if row[0] >= int(params["startTime"])]
+            return httpx.Response(200, json=klines[:int(params["limit"])])
+        return httpx.Response(200, json=klines[-int(params["limit"]):])
+    
+    async def ws_handler(self, websocket, *args):
+        self.connections += 1
+        if self.connections == 1:
+            # Поток отдает новую свечу и цену, затем соединение рвется
+            self.history.append(kline(len(self.history) * MINUTE, 500.0))
+            await websocket.send(kline_message("BTCUSDT", self.history[-1]))
+            await websocket.send(book_ticker_message("BTCUSDT", 500.0))
+            await self.drop_first_connection.wait()
+            # Пока клиент отключен, на бирже закрываются еще две свечи
+            for _ in range(2):
+                self.history.append(kline(len(self.history) * MINUTE, 600.0 + len(self.history)))
+            return
+        self.second_connection.set()
+        await websocket.send(book_ticker_message("BTCUSDT", 700.0))
+        await websocket.wait_closed()
+
+
+async def wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "условие не выполнено"
+        await asyncio.sleep(0.01)
+
+
+async def test_stream_reconnects_backfills_gap_and_goes_stale():
+    stub = StubBinance()
+    market_client = BinanceMarketDataClient(
+        base_url="http://binance.stub",
+        client=httpx.AsyncClient(transport=httpx.MockTransport(stub.rest))
+    )
+    
+    async with websockets.serve(stub.ws_handler, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        stream = BinanceMarketStream(market_client, ["BTCUSDT"], ws_url=f"ws://127.0.0.1:{port}", buffer_size=100)
+        stream.reconnect_max_delay = 0.05
+        stream.stale_after = 0.3
+        await stream.start()
+        try:
+            await wait_for(lambda: stream.get_price("BTCUSDT") == 500.0)
+            assert stream.get_klines("BTCUSDT", "1m", 100)[-1] == stub.history[-1]
+            assert stream.backfills == 1
+            
+            stub.drop_first_connection.set()
+            await asyncio.wait_for(stub.second_connection.wait(), 5)
+            await wait_for(lambda: stream.get_price("BTCUSDT") == 700.0)
+            
+            assert stream.reconnects >= 1
+            assert stream.backfills == 2
+            # Пропущенные за время разрыва свечи догружены через REST
+            klines = stream.get_klines("BTCUSDT", "1m", 100)
+            assert klines == stub.history[-100:]
+            assert any("startTime" in params for path, params in stub.rest_requests if path == "/api/v3/klines")
+            
+            # Поток молчит дольше STREAM_STALE_AFTER: данные считаются устаревшими
+            await asyncio.sleep(0.4)
+            assert stream.connected
+            assert stream.get_price("BTCUSDT") is None
+            assert stream.get_klines("BTCUSDT", "1m", 100) is None
+        finally:
+            await stream.stop()
+            await market_client.close()
@@ -0,0 +1,112 @@
+import json
+
+import numpy as np
+import pytest
+from app.config import settings
+from app.main import check_model_update_settings
+from app.ml.model_artifact import ALIGNMENT, MAGIC, ArtifactError, _PREFIX, is_artifact, load_artifact, save_artifact
+from app.ml.model_loader import ModelLoader
+
+
+@pytest.fixture
+def artifact_path(tmp_path, trained_loader):
+    path = tmp_path / "model.bin"
+    forests = {"model": trained_loader.compiled, "first_stage": trained_loader.first_stage_compiled}
+    save_artifact(str(path), {name: forest for name, forest in forests.items() if forest is not None}, {
+        "feature_columns": trained_loader.feature_columns
+    })
+    return path
+
+
+def read_header(path):
+    with open(path, "rb") as f:
+        _, header_size = _PREFIX.unpack(f.read(_PREFIX.size))
+        return json.loads(f.read(header_size)), _PREFIX.size + header_size
+
+
+def sample_rows(model_loader, n: int = 200) -> np.ndarray:
+    rng = np.random.default_rng(1)
+    return rng.normal(size=(n, len(model_loader.feature_columns))) * 50 + 30000
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_round_trip_matches_compiled_forest(artifact_path, trained_loader, mmap):
+    forests, metadata = load_artifact(str(artifact_path), mmap=mmap)
+    assert is_artifact(str(artifact_path))
+    assert metadata["feature_columns"] == list(trained_loader.feature_columns)
+    X = sample_rows(trained_loader)
+    np.testing.assert_array_equal(forests["model"].predict_proba(X), trained_loader.compiled.predict_proba(X))
+    np.testing.assert_array_equal(forests["model"].classes_, trained_loader.compiled.classes_)
+
+
+def test_arrays_are_aligned(artifact_path):
+    header, data_start = read_header(artifact_path)
+    assert data_start % ALIGNMENT == 0
+    assert header["data_size"] % ALIGNMENT == 0
+    for spec in header["forests"].values():
+        for array in spec["arrays"].values():
+            assert array["offset"] % ALIGNMENT == 0
+    
+    forests, _ = load_artifact(str(artifact_path), mmap=True)
+    for name in ("feature", "threshold", "children", "leaf_proba", "roots"):
+        assert getattr(forests["model"], name).ctypes.data % ALIGNMENT == 0
+
+
+def test_corrupted_data_fails_checksum(artifact_path):
+    _, data_start = read_header(artifact_path)
+    raw = bytearray(artifact_path.read_bytes())
+    raw[data_start + 10] ^= 0xFF
+    artifact_path.write_bytes(bytes(raw))
+    
+    with pytest.raises(ArtifactError, match="контрольная сумма"):
+        load_artifact(str(artifact_path))
+    load_artifact(str(artifact_path), verify=False)
+
+
+def test_truncated_and_foreign_files_are_rejected(artifact_path, tmp_path):
+    raw = artifact_path.read_bytes()
+    artifact_path.write_bytes(raw[:-ALIGNMENT])
+    with pytest.raises(ArtifactError, match="обрезан"):
+        load_artifact(str(artifact_path))
+    
+    foreign = tmp_path / "model.pkl"
+    foreign.write_bytes(b"\x80\x04" + bytes(64))
+    assert not is_artifact(str(foreign))
+    with pytest.raises(ArtifactError):
+        load_artifact(str(foreign))
+    assert MAGIC not in foreign.read_bytes()
+
+
+def test_model_loader_round_trip(tmp_path, trained_loader):
+    path = tmp_path / "loader.bin"
+    trained_loader.save_model(str(path), artifact_format="arrays")
+    loaded = ModelLoader()
+    loaded.load_model(str(path))
+    assert loaded.model is None
+    X = sample_rows(trained_loader)
+    np.testing.assert_array_equal(loaded.predict_proba(X), trained_loader.predict_proba(X))
+
+
+@pytest.mark.parametrize("artifact_format, allow_pickle, model_path, registry_path, allowed", [
+    ("arrays", False, "models/model.bin", None, False),
+    ("arrays", False, None, "models/registry", False),
+    ("pickle", False, "models/model.pkl", None, False),
+    ("pickle", True, "models/model.pkl", "models/registry", True),
+    ("arrays", False, None, None, True),
+])
+def test_model_updates_refused_without_sklearn_artifacts(
+    monkeypatch, artifact_format, allow_pickle, model_path, registry_path, allowed
+):
+    monkeypatch.setattr(settings, "MODEL_UPDATE_INTERVAL", 3600.0)
+    monkeypatch.setattr(settings, "MODEL_ARTIFACT_FORMAT", artifact_format)
+    monkeypatch.setattr(settings, "MODEL_ALLOW_PICKLE", allow_pickle)
+    monkeypatch.setattr(settings, "MODEL_PATH", model_path)
+    monkeypatch.setattr(settings, "MODEL_REGISTRY_PATH", registry_path)
+    if allowed:
+        check_model_update_settings()
+    else:
+        with pytest.raises(ValueError, match="MODEL_UPDATE_INTERVAL"):
+            check_model_update_settings()
+    
+    monkeypatch.setattr(settings, "MODEL_UPDATE_INTERVAL", 0.0)
+    check_model_update_settings()
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from app.ml import model_inference
+from app.ml.features import compute_latest_features, feature_vector
+
+
+@pytest.fixture
+def serving(trained_loader, monkeypatch):
+    monkeypatch.setattr(model_inference, "_prediction_cache", None)
+    monkeypatch.setattr(model_inference, "_model_loader", None)
+    model_inference.initialize_model(trained_loader)
+    return trained_loader
+
+
+def features_for(price_candles, ends):
+    return {f"S{end}": compute_latest_features(price_candles.slice(0, end)) for end in ends}
+
+
+def test_batch_matches_single_predictions(serving, price_candles):
+    features = features_for(price_candles, range(100, 3000, 97))
+    batch = model_inference.predict_actions(features)
+    
+    assert list(batch) == list(features)
+    for symbol, symbol_features in features.items():
+        assert batch[symbol] == model_inference.predict_action(symbol_features)
+
+
+def test_batch_matches_sklearn_forest(serving, price_candles):
+    features = features_for(price_candles, range(100, 3000, 97))
+    batch = model_inference.predict_actions(features)
+    
+    X = np.vstack([feature_vector(f, serving.feature_columns) for f in features.values()])
+    probabilities = serving.model.predict_proba(serving.scaler.transform(X))
+    predictions = serving.model.predict(serving.scaler.transform(X))
+    for row, symbol in enumerate(features):
+        confidence = probabilities[row][list(serving.classes_).index(predictions[row])]
+        assert batch[symbol]["action"] == model_inference.ACTION_MAP[predictions[row]]
+        assert batch[symbol]["confidence"] == pytest.approx(confidence, abs=1e-12)
+
+
+def test_without_model_every_symbol_holds(monkeypatch):
+    monkeypatch.setattr(model_inference, "_model_loader", None)
+    result = model_inference.predict_actions({"BTCUSDT": {}, "ETHUSDT": {}})
+    assert {prediction["action"] for prediction in result.values()} == {"HOLD"}
+    assert model_inference.predict_actions({}) == {}
@@ -0,0 +1,38 @@
+import pickle
+import pytest
+from app.config import settings
+from app.ml.model_loader import ModelLoader
+
+UNPICKLED = []
+
+
+def mark_unpickled():
+    UNPICKLED.append("executed")
+
+
+class Payload:
+    """Объект, который при распаковке выполняет код."""
+    
+    def __reduce__(self):
+        return mark_unpickled, ()
+
+
+def test_pickle_model_is_refused_by_default(tmp_path):
+    path = tmp_path / "model.pkl"
+    path.write_bytes(pickle.dumps({"model": Payload(), "scaler": None}))
+    UNPICKLED.clear()
+    
+    with pytest.raises(ValueError, match="MODEL_ALLOW_PICKLE"):
+        ModelLoader().load_model(str(path))
+    assert UNPICKLED == []
+
+
+def test_pickle_model_loads_when_allowed(tmp_path, monkeypatch):
+    path = tmp_path / "model.pkl"
+    path.write_bytes(pickle.dumps({"model": Payload(), "scaler": None}))
+    UNPICKLED.clear()
+    monkeypatch.setattr(settings, "MODEL_ALLOW_PICKLE", True)
+    
+    with pytest.raises(AttributeError):
+        ModelLoader().load_model(str(path))
+    assert UNPICKLED == ["executed"]
@@ -0,0 +1,114 @@
+import copy
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api import routes_models
+from app.config import settings
+from app.ml import model_inference
+from app.ml.model_registry import ACTIVE_FILE, ModelRegistry
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_inference, "_model_loader", None)
+    monkeypatch.setattr(model_inference, "_prediction_cache", None)
+    return ModelRegistry(str(tmp_path / "registry"), max_resident=1)
+
+
+def register_copy(registry: ModelRegistry, model_loader, **metadata) -> str:
+    # register проставляет version загрузчику: общий session-фикстур не трогаем
+    return registry.register(copy.copy(model_loader), metadata)
+
+
+def test_register_writes_version_with_metadata(registry, trained_loader):
+    version = register_copy(registry, trained_loader, symbol="BTCUSDT")
+    
+    [record] = registry.list_versions()
+    assert record["version"] == version
+    assert record["symbol"] == "BTCUSDT"
+    assert record["feature_columns"] == list(trained_loader.feature_columns)
+    assert record["classes"] == [int(c) for c in trained_loader.classes_]
+    assert not [path for path in registry.root.iterdir() if path.name.startswith(".")]
+    assert registry.read_active() is None
+
+
+def test_load_from_disk_predicts_like_original(registry, trained_loader):
+    first = register_copy(registry, trained_loader)
+    register_copy(registry, trained_loader)
+    
+    loaded = registry.load(first)
+    assert registry.disk_loads == 1
+    assert loaded.version == first
+    X = np.random.default_rng(0).normal(size=(50, len(trained_loader.feature_columns))) * 100 + 30000
+    np.testing.assert_allclose(
+        loaded.predict_proba(X), trained_loader.predict_proba(X), rtol=1e-12
+    )
+
+
+def test_promote_writes_active_without_loading(registry, trained_loader):
+    version = register_copy(registry, trained_loader)
+    registry.promote(version)
+    assert (registry.root / ACTIVE_FILE).read_text() == version
+    assert registry.active is None
+    with pytest.raises(FileNotFoundError):
+        registry.promote("missing")
+
+
+async def test_activate_and_rollback_swap_inference_model(registry, trained_loader):
+    first = register_copy(registry, trained_loader)
+    second = register_copy(registry, trained_loader)
+    
+    result = await registry.activate(first)
+    assert result["previous"] is None
+    assert model_inference.get_model_loader().version == first
+    
+    result = await registry.activate(second)
+    assert result == {**result, "version": second, "previous": first}
+    assert registry.read_active() == second
+    
+    result = await registry.rollback()
+    assert result["version"] == first
+    assert model_inference.get_model_loader().version == first
+    assert registry.read_active() == first
+    with pytest.raises(ValueError):
+        await registry.rollback()
+
+
+async def test_activate_rejects_unknown_and_escaping_versions(registry):
+    for version in ("missing", "../registry", ".ACTIVE.tmp"):
+        with pytest.raises(FileNotFoundError):
+            await registry.activate(version)
+
+
+@pytest.fixture
+def admin_client(registry):
+    app = FastAPI()
+    app.include_router(routes_models.router)
+    app.state.model_registry = registry
+    with TestClient(app) as client:
+        yield client
+
+
+def test_admin_endpoints_disabled_without_key(admin_client, registry, trained_loader, monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", None)
+    version = register_copy(registry, trained_loader)
+    assert admin_client.get("/admin/models").status_code == 200
+    assert admin_client.post(f"/admin/models/{version}/activate").status_code == 403
+    assert admin_client.post("/admin/models/rollback", headers={"X-API-Key": ""}).status_code == 403
+    assert registry.active is None
+
+
+def test_admin_endpoints_require_matching_key(admin_client, registry, trained_loader, monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", "secret")
+    version = register_copy(registry, trained_loader)
+    
+    assert admin_client.post(f"/admin/models/{version}/activate").status_code == 401
+    assert admin_client.post(f"/admin/models/{version}/activate", headers={"X-API-Key": "wrong"}).status_code == 401
+    assert registry.active is None
+    
+    response = admin_client.post(f"/admin/models/{version}/activate", headers={"X-API-Key": "secret"})
+    assert response.status_code == 200
+    assert registry.active == version
+    assert admin_client.post("/admin/models/rollback", headers={"X-API-Key": "secret"}).status_code == 409
@@ -0,0 +1,74 @@
+import copy
+import logging
+import threading
+
+import pytest
+from app import main
+from app.config import settings
+from app.ml import model_inference
+from app.ml.model_loader import ModelLoader
+from app.ml.model_registry import ModelRegistry
+from app.ml.model_warmup import ModelWarmup
+
+
+@pytest.fixture
+def warmup(monkeypatch, trained_loader):
+    monkeypatch.setattr(model_inference, "_model_loader", None)
+    monkeypatch.setattr(model_inference, "_prediction_cache", None)
+    trained = copy.copy(trained_loader)
+    
+    async def fake_train_model(model_loader, market_client, executor, model_warmup=None):
+        return trained
+    
+    monkeypatch.setattr(main, "train_model", fake_train_model)
+    model_warmup = ModelWarmup()
+    model_warmup.start()
+    return model_warmup, trained
+
+
+async def test_model_file_is_loaded_off_the_event_loop(warmup, monkeypatch, tmp_path):
+    model_warmup, trained = warmup
+    threads = []
+    
+    def fake_load_model(self, model_path):
+        threads.append(threading.current_thread())
+        raise FileNotFoundError(model_path)
+    
+    monkeypatch.setattr(ModelLoader, "load_model", fake_load_model)
+    monkeypatch.setattr(settings, "MODEL_PATH", str(tmp_path / "model.bin"))
+    
+    await main.initialize_model_state(model_warmup, None, None, None)
+    assert threads and threads[0] is not threading.main_thread()
+    assert model_inference.get_model_loader() is trained
+    assert (tmp_path / "model.bin").exists()
+
+
+async def test_trained_model_is_served_when_save_fails(warmup, monkeypatch, tmp_path, caplog):
+    model_warmup, trained = warmup
+    monkeypatch.setattr(settings, "MODEL_PATH", str(tmp_path / "model.bin"))
+    
+    def failing_save_model(self, model_path, artifact_format=None):
+        raise OSError("read-only file system")
+    
+    monkeypatch.setattr(ModelLoader, "save_model", failing_save_model)
+    with caplog.at_level(logging.ERROR, logger="app.main"):
+        await main.initialize_model_state(model_warmup, None, None, None)
+    assert model_inference.get_model_loader() is trained
+    assert "read-only file system" in caplog.text
+    assert not (tmp_path / "model.bin").exists()
+
+
+async def test_trained_model_is_served_when_register_fails(warmup, monkeypatch, tmp_path, caplog):
+    model_warmup, trained = warmup
+    monkeypatch.setattr(settings, "MODEL_PATH", None)
+    registry = ModelRegistry(str(tmp_path / "registry"))
+    
+    def failing_register(model_loader, metadata=None):
+        raise OSError("disk full")
+    
+    monkeypatch.setattr(registry, "register", failing_register)
+    with caplog.at_level(logging.ERROR, logger="app.main"):
+        await main.initialize_model_state(model_warmup, registry, None, None)
+    assert model_inference.get_model_loader() is trained
+    assert registry.active is None
+    assert "disk full" in caplog.text
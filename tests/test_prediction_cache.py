@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from app.config import settings
+from app.ml.features import FEATURE_COLUMNS
+from app.ml.prediction_cache import PredictionCache
+
+
+@pytest.fixture
+def cache():
+    return PredictionCache(
+        significant_digits=settings.PREDICTION_CACHE_SIGNIFICANT_DIGITS,
+        default_significant_digits=settings.PREDICTION_CACHE_DEFAULT_SIGNIFICANT_DIGITS
+    )
+
+
+def test_distinct_low_priced_vectors_do_not_collide(cache):
+    first = np.array([0.004312, 0.004298, 48.2, 0.35, 1250000.0])
+    second = np.array([0.004371, 0.004255, 48.2, 0.35, 1250000.0])
+    first_key = cache.make_key(1, FEATURE_COLUMNS, first)
+    second_key = cache.make_key(1, FEATURE_COLUMNS, second)
+    assert first_key != second_key
+    assert all(value != 0.0 for value in first_key[1])
+    
+    cache.put(first_key, "BUY")
+    assert cache.get(second_key) is None
+
+
+@pytest.mark.parametrize("scale", [1e-6, 1e-3, 1.0, 3e4])
+def test_key_resolution_is_relative_to_price(cache, scale):
+    base = np.array([1.0, 1.0, 50.0, 0.1, 100.0])
+    base[:2] *= scale
+    nearby = base.copy()
+    nearby[:2] *= 1 + 1e-9
+    shifted = base.copy()
+    shifted[:2] *= 1 + 1e-4
+    assert cache.make_key(1, FEATURE_COLUMNS, base) == cache.make_key(1, FEATURE_COLUMNS, nearby)
+    assert cache.make_key(1, FEATURE_COLUMNS, base) != cache.make_key(1, FEATURE_COLUMNS, shifted)
+
+
+def test_zero_and_non_finite_values_are_kept(cache):
+    vector = np.array([0.0, -0.0, np.inf, -np.inf, 0.0])
+    _, quantized = cache.make_key(1, FEATURE_COLUMNS, vector)
+    assert quantized[:4] == (0.0, 0.0, np.inf, -np.inf)
+
+
+def test_new_model_version_clears_entries(cache):
+    vector = np.array([30000.0, 29950.0, 55.0, 0.01, 12.5])
+    cache.put(cache.make_key(1, FEATURE_COLUMNS, vector), "BUY")
+    assert cache.get(cache.make_key(1, FEATURE_COLUMNS, vector)) == "BUY"
+    cache.put(cache.make_key(2, FEATURE_COLUMNS, vector), "SELL")
+    assert cache.get(cache.make_key(1, FEATURE_COLUMNS, vector)) is None
+    assert cache.get_stats()["invalidations"] == 1
@@ -0,0 +1,120 @@
+import asyncio
+import time
+import httpx
+import pytest
+from app.services.market_data_client import BinanceMarketDataClient
+from app.services.rate_limiter import RateLimitExceeded, RateLimitScheduler
+
+
+def make_client(handler, **limiter) -> BinanceMarketDataClient:
+    """Клиент Binance поверх локальной заглушки (httpx.MockTransport)."""
+    client = BinanceMarketDataClient(
+        base_url="http://binance.stub",
+        client=httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    )
+    client.kline_cache = None
+    client.rate_limiter = RateLimitScheduler(**{"backoff_base": 0.001, "backoff_max": 0.01, **limiter})
+    return client
+
+
+def test_used_weight_header_syncs_tokens():
+    scheduler = RateLimitScheduler(weight_limit=1000, safety_margin=1.0)
+    scheduler.update_from_response(200, {"x-mbx-used-weight-1m": "700"})
+    assert scheduler.used_weight == 700
+    assert scheduler.tokens == pytest.approx(300, abs=1)
+    
+    # Заголовок не увеличивает бюджет, если локально израсходовано больше
+    scheduler.tokens = 100
+    scheduler.update_from_response(200, {"x-mbx-used-weight-1m": "10"})
+    assert scheduler.tokens == pytest.approx(100, abs=1)
+
+
+@pytest.mark.parametrize("status_code", [418, 429])
+def test_throttled_response_sets_ban_from_retry_after(status_code):
+    scheduler = RateLimitScheduler()
+    before = time.monotonic()
+    scheduler.update_from_response(status_code, {"retry-after": "30"})
+    assert scheduler.banned_until == pytest.approx(before + 30, abs=0.5)
+    assert scheduler.throttled == 1
+    
+    scheduler.update_from_response(status_code, {"retry-after": "garbage"})
+    assert scheduler.banned_until == pytest.approx(before + 30, abs=0.5)
+    assert scheduler.get_stats()["banned_for_seconds"] > 29
+
+
+async def test_acquire_waits_for_ban_to_expire():
+    scheduler = RateLimitScheduler()
+    scheduler.update_from_response(429, {"retry-after": "0.1"})
+    started = time.monotonic()
+    await scheduler.acquire(1)
+    assert time.monotonic() - started >= 0.09
+
+
+async def test_sheds_when_wait_exceeds_max_wait():
+    scheduler = RateLimitScheduler(max_wait=1.0)
+    scheduler.update_from_response(429, {"retry-after": "5"})
+    with pytest.raises(RateLimitExceeded):
+        await scheduler.acquire(1)
+    assert scheduler.shed == 1
+
+
+async def test_sheds_when_queue_is_full():
+    scheduler = RateLimitScheduler(max_queue=2)
+    scheduler.update_from_response(429, {"retry-after": "0.1"})
+    waiting = [asyncio.create_task(scheduler.acquire(1)) for _ in range(2)]
+    await asyncio.sleep(0.01)
+    with pytest.raises(RateLimitExceeded):
+        await scheduler.acquire(1)
+    await asyncio.gather(*waiting)
+    assert scheduler.shed == 1
+    assert scheduler.max_queue_depth == 2
+
+
+async def test_request_retries_throttled_response_and_honours_retry_after():
+    responses = [
+        httpx.Response(429, headers={"Retry-After": "0.1", "X-MBX-USED-WEIGHT-1M": "120"}),
+        httpx.Response(200, json={"symbol": "BTCUSDT", "price": "30000.5"}, headers={"X-MBX-USED-WEIGHT-1M": "12"}),
+    ]
+    seen = []
+    
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append((time.monotonic(), request.url.path))
+        return responses.pop(0)
+    
+    client = make_client(handler)
+    assert await client.get_current_price("BTCUSDT") == 30000.5
+    assert len(seen) == 2
+    assert seen[1][0] - seen[0][0] >= 0.09
+    stats = client.get_stats()["rate_limiter"]
+    assert stats["retries"] == 1
+    assert stats["throttled_responses"] == 1
+    assert stats["used_weight_1m"] == 12
+
+
+async def test_request_retries_server_and_network_errors_then_gives_up():
+    calls = []
+    
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        if len(calls) == 1:
+            raise httpx.ConnectError("stub down", request=request)
+        return httpx.Response(503)
+    
+    client = make_client(handler)
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.get_current_price("BTCUSDT")
+    assert len(calls) == client.max_retries + 1
+    assert client.rate_limiter.retries == client.max_retries
+
+
+async def test_request_does_not_retry_client_errors():
+    calls = []
+    
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(400, json={"code": -1121, "msg": "Invalid symbol."})
+    
+    client = make_client(handler)
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.get_current_price("NOPE")
+    assert len(calls) == 1
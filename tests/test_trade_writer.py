@@ -0,0 +1,182 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.db_models.db import Base, create_async_db_engine
+from app.db_models.trade_entity import Trade
+from app.services.trade_writer import TradeWriter
+
+
+@pytest.fixture
+async def session_factory(tmp_path):
+    engine = create_async_db_engine(f"sqlite:///{tmp_path / 'trades.db'}")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, expire_on_commit=False, autoflush=False)
+    await engine.dispose()
+
+
+def make_row(i: int) -> dict:
+    return {
+        "order_id": f"ORD-{i:08d}",
+        "symbol": "BTCUSDT",
+        "action": "BUY",
+        "price": 30000.0 + i,
+        "execution_price": 30003.0 + i,
+        "status": "FILLED",
+        "timestamp": datetime(2024, 1, 1, 12, 0, i % 60, tzinfo=timezone.utc)
+    }
+
+
+async def stored_order_ids(session_factory) -> list:
+    async with session_factory() as session:
+        result = await session.execute(select(Trade.order_id).order_by(Trade.order_id))
+        return list(result.scalars())
+
+
+async def failing_insert(batch):
+    raise OSError("database is locked")
+
+
+async def test_stop_writes_everything_queued(session_factory):
+    writer = TradeWriter(session_factory, batch_size=500, flush_interval=10.0)
+    await writer.start()
+    for i in range(1200):
+        await writer.submit(make_row(i))
+    await writer.stop()
+    
+    assert len(await stored_order_ids(session_factory)) == 1200
+    assert writer.get_stats()["written"] == 1200
+    with pytest.raises(RuntimeError):
+        await writer.submit(make_row(5000))
+
+
+async def test_stop_includes_submits_waiting_for_space(session_factory):
+    writer = TradeWriter(session_factory, max_queue=5, batch_size=2, flush_interval=0.01)
+    await writer.start()
+    submits = [asyncio.create_task(writer.submit(make_row(i))) for i in range(40)]
+    await asyncio.sleep(0)
+    await asyncio.gather(*submits)
+    await writer.stop()
+    assert len(await stored_order_ids(session_factory)) == 40
+
+
+async def test_flush_returns_under_continuous_submits(session_factory):
+    writer = TradeWriter(session_factory, batch_size=50, flush_interval=0.01)
+    await writer.start()
+    producing = True
+    
+    async def produce():
+        i = 0
+        while producing:
+            await writer.submit(make_row(i))
+            i += 1
+            await asyncio.sleep(0)
+    
+    producer = asyncio.create_task(produce())
+    await asyncio.sleep(0.05)
+    watermark = writer.enqueued
+    assert await writer.flush(timeout=5.0)
+    assert len(await stored_order_ids(session_factory)) >= watermark
+    producing = False
+    await producer
+    await writer.stop()
+
+
+async def test_flush_times_out_while_database_is_stuck(session_factory):
+    writer = TradeWriter(session_factory, flush_interval=0.01)
+    release = asyncio.Event()
+    insert = writer._insert
+    
+    async def stuck_insert(batch):
+        await release.wait()
+        await insert(batch)
+    
+    writer._insert = stuck_insert
+    await writer.start()
+    await writer.submit(make_row(1))
+    assert not await writer.flush(timeout=0.05)
+    
+    release.set()
+    assert await writer.flush(timeout=5.0)
+    await writer.stop()
+    assert await stored_order_ids(session_factory) == ["ORD-00000001"]
+
+
+async def test_failed_batch_is_spilled_and_replayed(session_factory, tmp_path):
+    spill_path = tmp_path / "spill" / "trades.jsonl"
+    writer = TradeWriter(session_factory, flush_interval=0.01, max_retries=1, spill_path=str(spill_path))
+    writer._insert = failing_insert
+    await writer.start()
+    for i in range(3):
+        await writer.submit(make_row(i))
+    assert await writer.flush(timeout=5.0)
+    await writer.stop()
+    
+    stats = writer.get_stats()
+    assert (stats["spilled"], stats["dropped"], stats["written"]) == (3, 0, 0)
+    assert len(spill_path.read_text().splitlines()) == 3
+    assert await stored_order_ids(session_factory) == []
+    
+    restarted = TradeWriter(session_factory, flush_interval=0.01, spill_path=str(spill_path))
+    await restarted.start()
+    await restarted.stop()
+    assert restarted.get_stats()["replayed"] == 3
+    assert await stored_order_ids(session_factory) == ["ORD-00000000", "ORD-00000001", "ORD-00000002"]
+    assert not spill_path.exists()
+    assert not spill_path.with_name(spill_path.name + ".replay").exists()
+    
+    async with session_factory() as session:
+        trade = (await session.execute(select(Trade).where(Trade.order_id == "ORD-00000002"))).scalar_one()
+    assert trade.execution_price == 30005.0
+    assert trade.timestamp.replace(tzinfo=timezone.utc) == make_row(2)["timestamp"]
+
+
+async def test_interrupted_replay_skips_written_rows(session_factory, tmp_path):
+    spill_path = tmp_path / "trades.jsonl"
+    writer = TradeWriter(session_factory, flush_interval=0.01, max_retries=0, spill_path=str(spill_path))
+    writer._insert = failing_insert
+    await writer.start()
+    for i in range(4):
+        await writer.submit(make_row(i))
+    await writer.stop()
+    
+    # Прошлый повтор успел записать часть сделок и оборвался на середине строки
+    replay_path = spill_path.with_name(spill_path.name + ".replay")
+    spill_path.rename(replay_path)
+    with open(replay_path, "a") as f:
+        f.write('{"order_id": "ORD-999')
+    async with session_factory() as session:
+        session.add(Trade(**make_row(0)))
+        await session.commit()
+    
+    restarted = TradeWriter(session_factory, flush_interval=0.01, spill_path=str(spill_path))
+    await restarted.start()
+    await restarted.stop()
+    assert restarted.get_stats()["replayed"] == 3
+    assert await stored_order_ids(session_factory) == [f"ORD-{i:08d}" for i in range(4)]
+    assert not replay_path.exists()
+
+
+async def test_failed_batch_without_spill_path_is_dropped(session_factory):
+    writer = TradeWriter(session_factory, flush_interval=0.01, max_retries=0)
+    writer._insert = failing_insert
+    await writer.start()
+    await writer.submit(make_row(1))
+    assert await writer.flush(timeout=5.0)
+    await writer.stop()
+    assert writer.get_stats()["dropped"] == 1
+
+
+async def test_database_row_count_matches_stats(session_factory):
+    writer = TradeWriter(session_factory, batch_size=7, flush_interval=0.001)
+    await writer.start()
+    for i in range(50):
+        await writer.submit(make_row(i))
+    assert await writer.flush()
+    async with session_factory() as session:
+        count = (await session.execute(select(func.count()).select_from(Trade))).scalar_one()
+    await writer.stop()
+    assert count == writer.written == 50
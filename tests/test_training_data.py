@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+from app.ml.features import FEATURE_COLUMNS, compute_feature_matrix
+from app.ml.training_data import (
+    TARGET_BUY, TARGET_HOLD, TARGET_SELL, build_training_arrays, create_targets, rebalance_targets
+)
+from tests.conftest import make_price_candles
+
+
+def reference_targets(sma: np.ndarray, threshold_percent: float) -> np.ndarray:
+    """Прежний построчный цикл ModelLoader._create_targets."""
+    targets = []
+    for i in range(len(sma) - 1):
+        current_price = sma[i]
+        next_price = sma[i + 1]
+        if current_price == 0:
+            targets.append(2)
+            continue
+        price_change_pct = ((next_price - current_price) / current_price) * 100
+        if price_change_pct > threshold_percent:
+            targets.append(0)
+        elif price_change_pct < -threshold_percent:
+            targets.append(1)
+        else:
+            targets.append(2)
+    targets.append(2)
+    return np.array(targets[:len(sma)])
+
+
+def reference_rebalance(targets: np.ndarray, price_changes: np.ndarray) -> np.ndarray:
+    targets = list(targets)
+    hold_indices = np.argsort(np.abs(price_changes))[:max(1, len(price_changes) // 5)]
+    for idx in hold_indices:
+        if idx < len(targets):
+            targets[idx] = 2
+    return np.array(targets)
+
+
+def test_target_labels_keep_old_values():
+    assert (TARGET_BUY, TARGET_SELL, TARGET_HOLD) == (0, 1, 2)
+
+
+@pytest.mark.parametrize("threshold_percent", [0.0, 0.01, 0.02, 0.1])
+def test_create_targets_matches_loop(price_candles, threshold_percent):
+    sma = compute_feature_matrix(price_candles, ["sma_10"])[:, 0]
+    np.testing.assert_array_equal(create_targets(sma, threshold_percent), reference_targets(sma, threshold_percent))
+
+
+def test_create_targets_edge_cases():
+    for sma in (np.array([]), np.array([100.0])):
+        np.testing.assert_array_equal(create_targets(sma, 0.02), reference_targets(sma, 0.02))
+    # Ноль, точное попадание в порог и отрицательные значения
+    sma = np.array([0.0, 100.0, 100.02, 100.0, 0.0, -5.0, -5.5, 100.0])
+    np.testing.assert_array_equal(create_targets(sma, 0.02), reference_targets(sma, 0.02))
+
+
+def test_rebalance_matches_loop():
+    rng = np.random.default_rng(3)
+    for n in (1, 4, 5, 37, 500):
+        targets = rng.integers(0, 2, n)
+        price_changes = rng.normal(0, 0.1, n + 1)
+        expected = reference_rebalance(targets, price_changes)
+        np.testing.assert_array_equal(rebalance_targets(targets.copy(), price_changes), expected)
+
+
+@pytest.mark.parametrize("chunk_size", [7, 97, 1000, 5000])
+def test_chunked_arrays_match_single_pass(price_candles, chunk_size):
+    columns = list(FEATURE_COLUMNS)
+    matrix = compute_feature_matrix(price_candles, columns)
+    X, y = build_training_arrays(price_candles, columns, 0.02, chunk_size=chunk_size)
+    np.testing.assert_allclose(X, matrix, rtol=1e-9, atol=1e-9)
+    np.testing.assert_array_equal(y, create_targets(matrix[:, columns.index("sma_10")], 0.02))
+
+
+def test_arrays_written_to_disk(tmp_path):
+    candles = make_price_candles(300, seed=5)
+    X, y = build_training_arrays(candles, FEATURE_COLUMNS, 0.02, chunk_size=64, out_dir=str(tmp_path))
+    np.testing.assert_array_equal(np.load(tmp_path / "X.npy"), X)
+    np.testing.assert_array_equal(np.load(tmp_path / "y.npy"), y)